@@ -0,0 +1,150 @@
+"""公司行动复权：根据拆股与分红记录向量化计算累计复权因子，批量改写 adjusted_close。"""
+
+import logging
+from typing import Iterable
+
+import numpy as np
+
+from stock_tracker.database.db_manager import Changes, DatabaseManager
+from stock_tracker.database.price_query import read_price_bars
+from stock_tracker.utils.helpers import date_to_int
+
+logger = logging.getLogger(__name__)
+
+# 组合排序键 (标的编码 << 32) | YYYYMMDD，使多个标的的 K 线与事件可以一次 searchsorted
+_KEY_SHIFT = 32
+
+
+def adjustment_factors(
+    bar_codes: np.ndarray,
+    bar_dates: np.ndarray,
+    close: np.ndarray,
+    action_codes: np.ndarray,
+    action_dates: np.ndarray,
+    action_types: np.ndarray,
+    action_values: np.ndarray,
+) -> np.ndarray:
+    """计算每根 K 线的累计复权因子（后复权到最新价格口径），adjusted_close = close * 因子。
+
+    K 线需按 (标的编码, 日期) 排序。每个事件只影响同一标的除权日之前的 K 线：拆股因子为 1 / 比例，
+    分红因子为 1 - 每股分红 / 除权日前一交易日收盘价。K 线的因子是其之后全部事件因子的乘积，
+    通过按组合键排序后的对数后缀和一次求出。
+    """
+    bar_codes = np.asarray(bar_codes, dtype=np.int64)
+    bar_keys = (bar_codes << _KEY_SHIFT) | np.asarray(bar_dates, dtype=np.int64)
+    factors = np.ones(len(bar_keys))
+    if not len(action_codes) or not len(bar_keys):
+        return factors
+
+    action_codes = np.asarray(action_codes, dtype=np.int64)
+    action_keys = (action_codes << _KEY_SHIFT) | np.asarray(action_dates, dtype=np.int64)
+    order = np.argsort(action_keys, kind="stable")
+    action_codes, action_keys = action_codes[order], action_keys[order]
+    action_types = np.asarray(action_types)[order]
+    action_values = np.asarray(action_values, dtype=np.float64)[order]
+
+    ratios = np.ones(len(action_keys))
+    split = action_types == "split"
+    ratios[split] = 1.0 / action_values[split]
+    # 除权日前一交易日必须属于同一标的，否则该分红之前没有 K 线，无需调整
+    previous = np.searchsorted(bar_keys, action_keys, side="left") - 1
+    dividend = (action_types == "dividend") & (previous >= 0)
+    dividend[dividend] &= bar_codes[previous[dividend]] == action_codes[dividend]
+    ratios[dividend] = 1.0 - action_values[dividend] / close[previous[dividend]]
+    invalid = ~(ratios > 0)
+    if invalid.any():
+        logger.warning("%s 条分红不小于前收盘价或前收盘价缺失，已忽略", int(invalid.sum()))
+        ratios[invalid] = 1.0
+
+    # suffix[i] 为第 i 个及之后所有事件的对数因子之和；同一标的的区间乘积为两个后缀和之差
+    suffix = np.append(np.cumsum(np.log(ratios)[::-1])[::-1], 0.0)
+    first = np.searchsorted(action_keys, bar_keys, side="right")
+    group_end = np.searchsorted(action_keys, (bar_codes + 1) << _KEY_SHIFT, side="left")
+    return np.exp(suffix[first] - suffix[group_end])
+
+
+class AdjustmentEngine:
+    """维护 price_bars.adjusted_close。
+
+    attach() 后，保存公司行动会重算对应标的的全部历史；写入早于已有除权日的 K 线（如历史回填）
+    也会触发该标的重算。只改写与结果不一致的行，改写本身再作为 prices 变更通知 MetricsEngine 等监听器。
+    """
+
+    def __init__(self, db_manager: DatabaseManager, rtol: float = 1e-9) -> None:
+        self.db_manager = db_manager
+        self.rtol = rtol
+
+    def attach(self) -> "AdjustmentEngine":
+        """注册为写入监听器。"""
+        self.db_manager.add_commit_listener(self._on_commit)
+        return self
+
+    def detach(self) -> None:
+        """取消注册。"""
+        self.db_manager.remove_commit_listener(self._on_commit)
+
+    def _on_commit(self, changes: Changes) -> None:
+        symbols = set(changes.get("corporate_actions", {}))
+        # 自身的 adjusted_close 改写不再触发重算
+        own = changes.get("price_adjustments", {})
+        prices = {symbol: since for symbol, since in changes.get("prices", {}).items() if symbol not in own}
+        if prices:
+            symbols |= self._symbols_with_later_actions(prices)
+        if symbols:
+            self.update(symbols)
+
+    def _symbols_with_later_actions(self, since_by_symbol: dict[str, str]) -> set[str]:
+        """返回在变更日之后仍有除权日的标的，只有它们的新 K 线需要复权。"""
+        with self.db_manager.get_read_connection() as conn:
+            latest = dict(
+                conn.execute(
+                    """
+                    SELECT s.symbol, MAX(a.ex_date)
+                    FROM corporate_actions a
+                    JOIN symbols s ON s.symbol_id = a.symbol_id
+                    GROUP BY a.symbol_id
+                    """
+                ).fetchall()
+            )
+        return {
+            symbol
+            for symbol, since in since_by_symbol.items()
+            if symbol in latest and latest[symbol] > date_to_int(since)
+        }
+
+    def update(self, symbols: Iterable[str]) -> int:
+        """重算指定标的的 adjusted_close，返回改写行数。"""
+        symbols = sorted(set(symbols))
+        if not symbols:
+            return 0
+        with self.db_manager.get_read_connection() as conn:
+            names, codes, dates, values = read_price_bars(conn, symbols, None, None, ["close", "adjusted_close"])
+        actions = self.db_manager.get_corporate_actions(names)
+        position = {symbol: i for i, symbol in enumerate(names)}
+
+        close, stored = values[:, 0], values[:, 1]
+        factors = adjustment_factors(
+            codes,
+            dates,
+            close,
+            actions["symbol"].map(position).to_numpy(dtype=np.int64),
+            np.array([date_to_int(value) for value in actions["ex_date"]], dtype=np.int64),
+            actions["action_type"].to_numpy(),
+            actions["value"].to_numpy(dtype=np.float64),
+        )
+        adjusted = close * factors
+        changed = ~np.isclose(adjusted, stored, rtol=self.rtol, atol=0.0, equal_nan=True)
+        if not changed.any():
+            return 0
+        written = self.db_manager.update_adjusted_close(
+            np.asarray(names)[codes[changed]], dates[changed], adjusted[changed]
+        )
+        logger.info("重算 %s 个标的的复权价，改写 %s 行", len(symbols), written)
+        return written
+
+    def rebuild(self, symbols: Iterable[str] | None = None) -> int:
+        """全量重算指定标的（默认全部）的复权价。"""
+        if symbols is None:
+            with self.db_manager.get_read_connection() as conn:
+                symbols = [row[0] for row in conn.execute("SELECT symbol FROM symbols").fetchall()]
+        return self.update(symbols)
@@ -0,0 +1,7 @@
+"""分析模块导出。"""
+
+from stock_tracker.analytics.adjustments import AdjustmentEngine
+from stock_tracker.analytics.metrics import MetricsEngine
+from stock_tracker.analytics.valuation import PortfolioValuator
+
+__all__ = ["AdjustmentEngine", "MetricsEngine", "PortfolioValuator"]
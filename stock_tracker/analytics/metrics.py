@@ -0,0 +1,191 @@
+"""收益率与滚动指标的物化维护：写入新 K 线后只重算受影响的尾部窗口。"""
+
+import logging
+import math
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from stock_tracker.database.db_manager import Changes, DatabaseManager
+from stock_tracker.database.migrations import DATE_TEXT_SQL
+from stock_tracker.utils.helpers import date_to_int
+
+logger = logging.getLogger(__name__)
+
+MA_WINDOWS = (20, 60)
+VOLATILITY_WINDOW = 20
+TRADING_DAYS = 252
+METRIC_COLUMNS = ("daily_return", "ma_20", "ma_60", "volatility_20", "peak_close", "drawdown")
+
+# 重算尾部时需要向前带上的历史收盘价数量
+_CONTEXT_ROWS = max(max(MA_WINDOWS), VOLATILITY_WINDOW + 1)
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    if values.size >= window:
+        result[window - 1 :] = sliding_window_view(values, window).mean(axis=1)
+    return result
+
+
+def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    if values.size >= window:
+        result[window - 1 :] = sliding_window_view(values, window).std(axis=1, ddof=1)
+    return result
+
+
+def compute_metrics(close: np.ndarray, previous_peak: float = np.nan) -> dict[str, np.ndarray]:
+    """对一段连续收盘价向量化计算全部指标；previous_peak 为这段之前的历史最高价。"""
+    close = np.asarray(close, dtype=np.float64)
+    daily_return = np.full(close.shape, np.nan)
+    if close.size > 1:
+        daily_return[1:] = close[1:] / close[:-1] - 1
+    peak = np.fmax.accumulate(np.concatenate([[previous_peak], close]))[1:]
+    return {
+        "daily_return": daily_return,
+        "ma_20": _rolling_mean(close, 20),
+        "ma_60": _rolling_mean(close, 60),
+        "volatility_20": _rolling_std(daily_return, VOLATILITY_WINDOW) * math.sqrt(TRADING_DAYS),
+        "peak_close": peak,
+        "drawdown": close / peak - 1,
+    }
+
+
+class MetricsEngine:
+    """维护 price_metrics 表。
+
+    attach() 后每次 save_prices 提交都会触发增量更新：对每个受影响的标的，只取最早变更日
+    之前的 _CONTEXT_ROWS 条收盘价作为滚动窗口上下文，并沿用已存的 peak_close 作为回撤状态，
+    从变更日开始重算并覆盖写入。
+    """
+
+    def __init__(self, db_manager: DatabaseManager) -> None:
+        self.db_manager = db_manager
+
+    def attach(self) -> "MetricsEngine":
+        """注册为写入监听器。"""
+        self.db_manager.add_commit_listener(self._on_commit)
+        return self
+
+    def detach(self) -> None:
+        """取消注册。"""
+        self.db_manager.remove_commit_listener(self._on_commit)
+
+    def _on_commit(self, changes: Changes) -> None:
+        prices = changes.get("prices")
+        if prices:
+            self.update(prices)
+
+    def update(self, since_by_symbol: dict[str, str]) -> int:
+        """从每个标的给定日期起重算指标，返回写入行数。"""
+        total = 0
+        if not since_by_symbol:
+            return total
+        with self.db_manager.get_connection() as conn:
+            ids = dict(
+                conn.execute(
+                    f"SELECT symbol, symbol_id FROM symbols WHERE symbol IN ({','.join('?' * len(since_by_symbol))})",
+                    list(since_by_symbol),
+                ).fetchall()
+            )
+            for symbol, since in since_by_symbol.items():
+                symbol_id = ids.get(symbol)
+                if symbol_id is not None:
+                    total += self._update_symbol(conn, symbol_id, date_to_int(since))
+        logger.debug("更新 %s 个标的的派生指标 %s 行", len(since_by_symbol), total)
+        return total
+
+    def rebuild(self, symbols: Iterable[str] | None = None) -> int:
+        """全量重算指定标的（默认全部）的指标。"""
+        with self.db_manager.get_read_connection() as conn:
+            if symbols is None:
+                rows = conn.execute("SELECT symbol FROM symbols").fetchall()
+                symbols = [row[0] for row in rows]
+        return self.update({symbol: "0000-01-01" for symbol in symbols})
+
+    def _update_symbol(self, conn, symbol_id: int, since: int) -> int:
+        context = conn.execute(
+            """
+            SELECT trade_date, COALESCE(adjusted_close, close) FROM price_bars
+            WHERE symbol_id = ? AND trade_date < ?
+            ORDER BY trade_date DESC LIMIT ?
+            """,
+            (symbol_id, since, _CONTEXT_ROWS),
+        ).fetchall()[::-1]
+        tail = conn.execute(
+            """
+            SELECT trade_date, COALESCE(adjusted_close, close) FROM price_bars
+            WHERE symbol_id = ? AND trade_date >= ?
+            ORDER BY trade_date
+            """,
+            (symbol_id, since),
+        ).fetchall()
+        if not tail:
+            return 0
+
+        previous_peak = np.nan
+        if context:
+            row = conn.execute(
+                "SELECT peak_close FROM price_metrics WHERE symbol_id = ? AND trade_date = ?",
+                (symbol_id, context[-1][0]),
+            ).fetchone()
+            if row is None or row[0] is None:
+                # 上一段尚未计算过，回退为全量重算该标的
+                return self._update_symbol(conn, symbol_id, 0)
+            previous_peak = row[0]
+
+        start = len(context)
+        dates = np.array([row[0] for row in context + tail], dtype=np.int64)
+        close = np.array([row[1] for row in context + tail], dtype=np.float64)
+        metrics = compute_metrics(close)
+        # 回撤状态沿用已存的历史最高价，只在尾部继续累积
+        tail_metrics = compute_metrics(close[start:], previous_peak)
+        metrics["peak_close"][start:] = tail_metrics["peak_close"]
+        metrics["drawdown"][start:] = tail_metrics["drawdown"]
+
+        columns = [np.full(len(tail), symbol_id), dates[start:]]
+        columns += [metrics[name][start:] for name in METRIC_COLUMNS]
+        rows = list(zip(*(column.tolist() for column in columns)))
+        conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO price_metrics (symbol_id, trade_date, {', '.join(METRIC_COLUMNS)})
+            VALUES (?, ?, {', '.join('?' * len(METRIC_COLUMNS))})
+            """,
+            rows,
+        )
+        return len(rows)
+
+    def get_metrics(
+        self,
+        symbols: Iterable[str],
+        start: str | None = None,
+        end: str | None = None,
+        columns: Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """批量查询多个标的的指标，返回长表（symbol, trade_date, 指标列）。"""
+        symbols = list(symbols)
+        selected = list(columns or METRIC_COLUMNS)
+        unknown = set(selected) - set(METRIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知指标列: {sorted(unknown)}")
+
+        conditions = [f"s.symbol IN ({','.join('?' * len(symbols))})"]
+        params: list[object] = list(symbols)
+        if start:
+            conditions.append("m.trade_date >= ?")
+            params.append(date_to_int(start))
+        if end:
+            conditions.append("m.trade_date <= ?")
+            params.append(date_to_int(end))
+        query = f"""
+            SELECT s.symbol, {DATE_TEXT_SQL.format(col="m.trade_date")} AS trade_date,
+                   {', '.join(f'm.{name}' for name in selected)}
+            FROM symbols s
+            JOIN price_metrics m ON m.symbol_id = s.symbol_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY s.symbol, m.trade_date
+        """
+        return self.db_manager.query_dataframe(query, tuple(params))
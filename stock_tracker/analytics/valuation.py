@@ -0,0 +1,168 @@
+"""持仓估值引擎：按最新收盘价（或实时报价）向量化计算市值与浮动盈亏。"""
+
+import logging
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from stock_tracker.database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# 组合键 symbol_id * _KEY_SCALE + YYYYMMDD，保证同一标的的日期连续有序
+_KEY_SCALE = 100_000_000
+# 向前回看一年（YYYYMMDD 整数减 10000）寻找最近收盘价
+_LOOKBACK = 10_000
+
+
+class PortfolioValuator:
+    """用 NumPy 对整批持仓做 as-of 价格匹配并批量回写估值列。"""
+
+    def __init__(self, db_manager: DatabaseManager) -> None:
+        self.db_manager = db_manager
+
+    def value_snapshot(self, snapshot_date: str, quotes: dict[str, float | None] | None = None) -> int:
+        """估值单日持仓快照；quotes 中的有效报价优先于库内收盘价。返回更新行数。"""
+        return self.revalue(snapshot_date, snapshot_date, quotes)
+
+    def revalue(
+        self,
+        start: str | None = None,
+        end: str | None = None,
+        quotes: dict[str, float | None] | None = None,
+    ) -> int:
+        """批量重估 [start, end] 内所有持仓快照，每行使用快照日当天或之前最近的收盘价。"""
+        positions = self._load_positions(start, end)
+        if positions["symbol"].size == 0:
+            return 0
+
+        prices = self._prices_for(positions, quotes)
+        market_value = positions["quantity"] * prices
+        unrealized_pnl = market_value - positions["quantity"] * positions["avg_cost"]
+        updated = self.db_manager.update_position_values(
+            {
+                "market_value": market_value,
+                "unrealized_pnl": unrealized_pnl,
+                "account_id": positions["account_id"],
+                "symbol": positions["symbol"],
+                "snapshot_date": positions["snapshot_date"],
+            }
+        )
+        missing = int(np.isnan(prices).sum())
+        if missing:
+            logger.warning("%s 条持仓缺少价格，估值置空", missing)
+        logger.info("完成持仓估值 %s 条", updated)
+        return updated
+
+    def value_positions(
+        self,
+        frame: pd.DataFrame,
+        snapshot_date: str,
+        quotes: dict[str, float | None] | None = None,
+    ) -> pd.DataFrame:
+        """为内存中的持仓（如 get_position_snapshot 的重建结果）计算估值列，不写回数据库。"""
+        result = frame.copy()
+        symbols = result["symbol"].to_numpy(dtype=object)
+        if symbols.size == 0:
+            return result.assign(market_value=pd.Series(dtype=float), unrealized_pnl=pd.Series(dtype=float))
+
+        with self.db_manager.get_read_connection() as conn:
+            ids = dict(
+                conn.execute(
+                    f"SELECT symbol, symbol_id FROM symbols WHERE symbol IN ({','.join('?' * len(set(symbols)))})",
+                    list(set(symbols)),
+                ).fetchall()
+            )
+        positions = {
+            "symbol": symbols,
+            "symbol_id": np.array([ids.get(symbol, -1) for symbol in symbols], dtype=np.int64),
+            "snapshot_key": np.full(symbols.size, int(snapshot_date[:10].replace("-", "")), dtype=np.int64),
+        }
+        quantity = result["quantity"].to_numpy(dtype=np.float64)
+        result["market_value"] = quantity * self._prices_for(positions, quotes)
+        result["unrealized_pnl"] = result["market_value"] - quantity * result["avg_cost"].to_numpy(dtype=np.float64)
+        return result
+
+    def _prices_for(self, positions: dict[str, np.ndarray], quotes: dict[str, float | None] | None) -> np.ndarray:
+        """as-of 收盘价，有效实时报价优先。"""
+        prices = self._asof_close(positions["symbol_id"], positions["snapshot_key"])
+        if quotes:
+            live = np.array([_as_price(quotes.get(symbol)) for symbol in positions["symbol"]], dtype=np.float64)
+            prices = np.where(np.isnan(live), prices, live)
+        return prices
+
+    def _load_positions(self, start: str | None, end: str | None) -> dict[str, np.ndarray]:
+        """读取持仓并转换为列数组，标的映射为 symbol_id（无价格的标的为 -1）。"""
+        conditions, params = [], []
+        if start:
+            conditions.append("p.snapshot_date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("p.snapshot_date <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT
+                p.account_id,
+                p.symbol,
+                CAST(p.snapshot_date AS TEXT),
+                COALESCE(s.symbol_id, -1),
+                p.quantity,
+                p.avg_cost
+            FROM positions p
+            LEFT JOIN symbols s ON s.symbol = p.symbol
+            {where}
+        """
+        with self.db_manager.get_read_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        columns = list(zip(*rows)) if rows else [()] * 6
+        snapshot_date = np.array(columns[2], dtype=object)
+        return {
+            "account_id": np.array(columns[0], dtype=object),
+            "symbol": np.array(columns[1], dtype=object),
+            "snapshot_date": snapshot_date,
+            "snapshot_key": np.array([int(value[:10].replace("-", "")) for value in snapshot_date], dtype=np.int64),
+            "symbol_id": np.array(columns[3], dtype=np.int64),
+            "quantity": np.array(columns[4], dtype=np.float64),
+            "avg_cost": np.array(columns[5], dtype=np.float64),
+        }
+
+    def _asof_close(self, symbol_ids: np.ndarray, date_keys: np.ndarray) -> np.ndarray:
+        """对每个 (symbol_id, 日期) 取当日或之前最近的收盘价，找不到时为 NaN。"""
+        known = np.unique(symbol_ids[symbol_ids >= 0])
+        result = np.full(symbol_ids.shape, np.nan)
+        if known.size == 0:
+            return result
+
+        placeholders = ",".join("?" * known.size)
+        with self.db_manager.get_read_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT symbol_id, trade_date, close FROM price_bars
+                WHERE symbol_id IN ({placeholders})
+                  AND trade_date BETWEEN ? AND ?
+                  AND close IS NOT NULL
+                ORDER BY symbol_id, trade_date
+                """,
+                [*known.tolist(), int(date_keys.min()) - _LOOKBACK, int(date_keys.max())],
+            ).fetchall()
+        if not rows:
+            return result
+
+        price_ids, price_dates, closes = (np.array(column) for column in zip(*rows))
+        price_keys = price_ids.astype(np.int64) * _KEY_SCALE + price_dates.astype(np.int64)
+        query_keys = symbol_ids * _KEY_SCALE + date_keys
+        index = np.searchsorted(price_keys, query_keys, side="right") - 1
+        safe = np.clip(index, 0, None)
+        matched = (index >= 0) & (price_ids[safe] == symbol_ids) & (symbol_ids >= 0)
+        result[matched] = closes.astype(np.float64)[safe[matched]]
+        return result
+
+
+def _as_price(value: Any) -> float:
+    if value is None:
+        return np.nan
+    price = float(value)
+    return price if price > 0 else np.nan
@@ -0,0 +1,72 @@
+"""基准测试用的合成数据生成器，按块产出列式数据，千万级行数也不会一次性占满内存。"""
+
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+
+def symbol_names(count: int) -> list[str]:
+    """生成固定宽度的合成标的代码，如 S00001。"""
+    width = max(5, len(str(count)))
+    return [f"S{i:0{width}d}" for i in range(1, count + 1)]
+
+
+def generate_prices(
+    rows: int,
+    symbols: int,
+    start: str = "2000-01-03",
+    chunk_size: int = 100_000,
+    seed: int = 0,
+) -> Iterator[dict[str, np.ndarray]]:
+    """按 (symbol, 交易日) 顺序产出 rows 行日线价格，每块为可直接传给 save_prices 的列字典。
+
+    每个标的分到 rows // symbols 个连续工作日（余数分给前几个标的），收盘价为带噪声的有界周期走势。
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(symbol_names(symbols), dtype=object)
+    per_symbol = np.full(symbols, rows // symbols, dtype=np.int64)
+    per_symbol[: rows % symbols] += 1
+    calendar = pd.bdate_range(start, periods=int(per_symbol.max())).to_numpy().astype("datetime64[D]")
+    offsets = np.concatenate([[0], np.cumsum(per_symbol)])
+
+    for chunk_start in range(0, rows, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, rows)
+        index = np.arange(chunk_start, chunk_stop)
+        symbol_index = np.searchsorted(offsets, index, side="right") - 1
+        day_index = index - offsets[symbol_index]
+
+        base = 10.0 + symbol_index % 490
+        close = base * np.exp(0.2 * np.sin(day_index / 40.0) + rng.normal(0.0, 0.01, size=index.size))
+        spread = np.abs(rng.normal(0.0, 0.01, size=index.size)) * close
+        yield {
+            "symbol": names[symbol_index],
+            "trade_date": calendar[day_index],
+            "open": close + rng.normal(0.0, 0.005, size=index.size) * close,
+            "high": close + spread,
+            "low": close - spread,
+            "close": close,
+            "volume": rng.integers(1_000, 10_000_000, size=index.size),
+            "adjusted_close": close,
+        }
+
+
+def generate_positions(
+    accounts: int,
+    symbols_per_account: int,
+    snapshot_date: str,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """生成单日持仓快照的列字典（数组列，以及广播到每行的标量列）。"""
+    rng = np.random.default_rng(seed)
+    names = np.array(symbol_names(symbols_per_account), dtype=object)
+    rows = accounts * symbols_per_account
+    return {
+        "account_id": np.repeat([f"DU{i:06d}" for i in range(accounts)], symbols_per_account).astype(object),
+        "symbol": np.tile(names, accounts),
+        "quantity": rng.integers(1, 1_000, size=rows).astype(np.float64),
+        "avg_cost": rng.uniform(10.0, 500.0, size=rows),
+        "market_value": None,
+        "unrealized_pnl": None,
+        "snapshot_date": snapshot_date,
+    }
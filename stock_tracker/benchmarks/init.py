@@ -0,0 +1,6 @@
+"""基准测试模块导出。"""
+
+from stock_tracker.benchmarks.generators import generate_positions, generate_prices
+from stock_tracker.benchmarks.runner import compare, run_suite
+
+__all__ = ["compare", "generate_positions", "generate_prices", "run_suite"]
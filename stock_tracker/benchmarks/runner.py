@@ -0,0 +1,293 @@
+"""基准测试运行器：测量写入、查询、导出热路径并与基线比较。
+
+用法：
+    python -m stock_tracker.benchmarks.runner --rows 1000000 --symbols 2000 --output bench.json
+    python -m stock_tracker.benchmarks.runner --rows 1000000 --symbols 2000 --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from stock_tracker.benchmarks.generators import generate_prices, symbol_names
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.exporter.csv_exporter import CSVExporter
+from stock_tracker.exporter.excel_exporter import ExcelExporter
+from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
+from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.ib_connector.pacing import PacingLimiter
+from stock_tracker.ib_connector.simulator import SimulatedIB
+from stock_tracker.scheduler.tasks import EXPORT_QUERIES
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def peak_rss_mb() -> float:
+    """当前进程的 RSS 峰值（MB），平台不支持时为 NaN。"""
+    if resource is None:  # pragma: no cover
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / _MB if sys.platform == "darwin" else peak / 1024
+
+
+def _timed(func: Callable[[], Any], trace_memory: bool) -> tuple[float, dict[str, float]]:
+    """执行 func 并返回耗时与该阶段的 Python 分配峰值（trace_memory 时）。
+
+    RSS 峰值是进程级的单调值，按阶段记录只会重复之前的最大值，因此只在整次运行结束时记录一次。
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    memory: dict[str, float] = {}
+    if trace_memory:
+        memory["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / _MB, 2)
+        tracemalloc.stop()
+    return seconds, memory
+
+
+def _latencies(func: Callable[[Any], Any], args: list[Any]) -> dict[str, float]:
+    samples = np.empty(len(args))
+    for i, arg in enumerate(args):
+        started = time.perf_counter()
+        func(arg)
+        samples[i] = (time.perf_counter() - started) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "queries": len(args),
+    }
+
+
+def run_suite(
+    workdir: str,
+    rows: int,
+    symbols: int,
+    queries: int = 200,
+    excel_rows: int = 100_000,
+    seed: int = 0,
+    trace_memory: bool = False,
+) -> dict[str, Any]:
+    """在 workdir 下建库并依次执行全部基准项，返回可序列化为 JSON 的结果。"""
+    workdir_path = Path(workdir)
+    workdir_path.mkdir(parents=True, exist_ok=True)
+    db_path = workdir_path / "bench.db"
+    if db_path.exists():
+        db_path.unlink()
+    results: dict[str, dict[str, float]] = {}
+
+    # 关闭查询缓存，测量的是实际读路径
+    with DatabaseManager(str(db_path), cache_bytes=0) as db:
+        def ingest() -> None:
+            for chunk in generate_prices(rows, symbols, seed=seed):
+                db.save_prices(chunk)
+
+        seconds, memory = _timed(ingest, trace_memory)
+        results["ingest"] = {"rows": rows, "seconds": round(seconds, 3), "rows_per_s": round(rows / seconds), **memory}
+        logger.info("写入基准: %s", results["ingest"])
+
+        rng = np.random.default_rng(seed)
+        names = symbol_names(symbols)
+        sample = db.query_dataframe("SELECT MIN(trade_date) AS first, MAX(trade_date) AS last FROM prices").iloc[0]
+        first, last = str(sample["first"]), str(sample["last"])
+        picks = [names[i] for i in rng.integers(0, symbols, size=queries)]
+
+        # 经 get_prices 读 price_bars，日期条件落在主键上；prices 视图的日期为计算列，无法走索引
+        results["point_query"] = _latencies(lambda symbol: db.get_prices([symbol], first, first), picks)
+        results["range_query"] = _latencies(lambda symbol: db.get_prices([symbol], first, last), picks)
+        logger.info("查询基准: 点查 %s, 范围 %s", results["point_query"], results["range_query"])
+
+        csv_exporter = CSVExporter(str(workdir_path / "bench_prices.csv"))
+        seconds, memory = _timed(
+            lambda: csv_exporter.export_from_query(db, EXPORT_QUERIES["prices"]),
+            trace_memory,
+        )
+        results["csv_export"] = {
+            "rows": csv_exporter.rows_written,
+            "seconds": round(seconds, 3),
+            "mb_per_s": round(csv_exporter.bytes_written / _MB / seconds, 2),
+            **memory,
+        }
+
+        excel_exporter = ExcelExporter(str(workdir_path / "bench_prices.xlsx"))
+        paths: list[Path] = []
+        seconds, memory = _timed(
+            lambda: paths.extend(
+                excel_exporter.export_from_query(
+                    db, f"{EXPORT_QUERIES['prices']} LIMIT ?", (excel_rows,)
+                )
+            ),
+            trace_memory,
+        )
+        excel_bytes = sum(path.stat().st_size for path in paths)
+        results["excel_export"] = {
+            "rows": excel_exporter.rows_written,
+            "seconds": round(seconds, 3),
+            "mb_per_s": round(excel_bytes / _MB / seconds, 2),
+            **memory,
+        }
+        logger.info("导出基准: CSV %s, Excel %s", results["csv_export"], results["excel_export"])
+
+    # 整次运行的 RSS 峰值，作为一项结果参与基线比较
+    results["memory"] = {"peak_rss_mb": round(peak_rss_mb(), 2)}
+
+    return {
+        "meta": {
+            "rows": rows,
+            "symbols": symbols,
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def run_fetch_benchmark(
+    symbols: int,
+    latency: float = 0.05,
+    jitter: float = 0.02,
+    max_concurrency: int = 6,
+    error_rate: float = 0.0,
+    duration: str = "1 Y",
+    seed: int = 0,
+) -> dict[str, float]:
+    """对模拟网关并发抓取历史数据，测量请求吞吐；关闭节流以测量纯并发能力。"""
+
+    async def fetch_all() -> tuple[int, int]:
+        ib = SimulatedIB(latency=latency, jitter=jitter, pacing_limit=None, error_rate=error_rate, seed=seed)
+        client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+        fetcher = IBDataFetcher(client, pacing=PacingLimiter(max_requests=symbols + 1, identical_interval=0))
+        rows = failed = 0
+        async for _, data in fetcher.get_historical_data_many(
+            symbol_names(symbols), duration=duration, max_concurrency=max_concurrency, as_frame=True
+        ):
+            rows += len(data)
+            failed += len(data) == 0
+        return rows, failed
+
+    started = time.perf_counter()
+    rows, failed = asyncio.run(fetch_all())
+    seconds = time.perf_counter() - started
+    return {
+        "requests": symbols,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "requests_per_s": round(symbols / seconds, 2),
+        "rows_per_s": round(rows / seconds),
+    }
+
+
+def _higher_is_better(metric: str) -> bool | None:
+    if metric.endswith("_per_s"):
+        return True
+    if metric.endswith("_ms") or metric.endswith("_mb"):
+        return False
+    return None
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.1) -> list[dict[str, Any]]:
+    """与基线逐项比较，返回变差超过 threshold（相对比例）的指标。"""
+    regressions = []
+    for case, metrics in current["results"].items():
+        base_metrics = baseline.get("results", {}).get(case, {})
+        for metric, value in metrics.items():
+            higher_is_better = _higher_is_better(metric)
+            base = base_metrics.get(metric)
+            if higher_is_better is None or not base:
+                continue
+            change = (value - base) / base
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    {"case": case, "metric": metric, "baseline": base, "current": value, "change": round(change, 4)}
+                )
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器。"""
+    parser = argparse.ArgumentParser(description="Stock Tracker 基准测试")
+    parser.add_argument("--rows", type=int, default=100_000, help="合成价格行数（1k ~ 50M）")
+    parser.add_argument("--symbols", type=int, default=1000, help="标的数量")
+    parser.add_argument("--queries", type=int, default=200, help="点查 / 范围查询次数")
+    parser.add_argument("--excel-rows", type=int, default=100_000, help="Excel 导出行数上限")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="数据库与导出文件目录，默认临时目录")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=None, help="基线 JSON 路径，指定后输出回归项")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定回归的相对变化阈值")
+    parser.add_argument("--tracemalloc", action="store_true", help="额外记录 Python 分配峰值（会变慢）")
+    parser.add_argument("--fetch-symbols", type=int, default=0, help="对模拟 IB 网关抓取的标的数，0 表示跳过")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="模拟网关单次请求延迟（秒）")
+    parser.add_argument("--fetch-concurrency", type=int, default=6, help="抓取并发数")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """命令行入口，存在回归时返回 1。"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = build_parser().parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="stock_tracker_bench_") as tmp:
+        report = run_suite(
+            args.workdir or tmp,
+            rows=args.rows,
+            symbols=args.symbols,
+            queries=args.queries,
+            excel_rows=args.excel_rows,
+            seed=args.seed,
+            trace_memory=args.tracemalloc,
+        )
+    if args.fetch_symbols:
+        report["results"]["fetch"] = run_fetch_benchmark(
+            args.fetch_symbols,
+            latency=args.fetch_latency,
+            max_concurrency=args.fetch_concurrency,
+            seed=args.seed,
+        )
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        report["regressions"] = compare(report, baseline, args.threshold)
+        for item in report["regressions"]:
+            logger.warning(
+                "性能回归 %s.%s: %s -> %s (%+.1f%%)",
+                item["case"],
+                item["metric"],
+                item["baseline"],
+                item["current"],
+                item["change"] * 100,
+            )
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
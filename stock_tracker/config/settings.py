@@ -17,12 +17,42 @@ class Settings(BaseSettings):
     ib_host: str = Field(default="127.0.0.1", alias="IB_HOST")
     ib_port: int = Field(default=7497, alias="IB_PORT")
     client_id: int = Field(default=1, alias="CLIENT_ID")
+    ib_simulated: bool = Field(default=False, alias="IB_SIMULATED")
+    scheduler_mode: str = Field(default="blocking", alias="SCHEDULER_MODE")
+    ib_heartbeat_interval: float = 30.0
     db_path: str = Field(default="stock_tracker.db", alias="DB_PATH")
     export_dir: str = Field(default="exports", alias="EXPORT_DIR")
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    log_file: str = "logs/stock_tracker.log"
+    log_format: str = Field(default="text", alias="LOG_FORMAT")
+    log_rate_limit: int = Field(default=20, alias="LOG_RATE_LIMIT")
+    log_rate_period: float = 60.0
+    log_rate_limit_level: str = Field(default="INFO", alias="LOG_RATE_LIMIT_LEVEL")
+    metrics_file: str = Field(default="logs/metrics.prom", alias="METRICS_FILE")
+    job_profile: bool = Field(default=False, alias="JOB_PROFILE")
+    profile_dir: str = "logs/profiles"
+
+    db_write_behind: bool = Field(default=False, alias="DB_WRITE_BEHIND")
+    db_cache_mb: int = Field(default=256, alias="DB_CACHE_MB")
 
     position_snapshot_hour: int = 4
     position_snapshot_minute: int = 30
+    position_storage: str = Field(default="full", alias="POSITION_STORAGE")
+    position_keyframe_days: int = 30
+
+    price_backfill_duration: str = "10 Y"
+    price_update_overlap_days: int = 5
+    backfill_chunk_duration: str = "1 Y"
+    intraday_bar_size: str = Field(default="1 min", alias="INTRADAY_BAR_SIZE")
+    intraday_duration: str = "1 D"
+    hist_max_concurrency: int = 6
+    contract_refresh_days: int = 30
+    max_market_data_lines: int = 100
+    valuation_live_quotes: bool = False
+    metrics_auto_update: bool = True
+    price_adjustment_auto_update: bool = True
+    export_chunk_size: int = 50000
+    export_formats: str = Field(default="excel,csv", alias="EXPORT_FORMATS")
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,121 @@
+"""查询结果缓存：按查询与参数缓存 DataFrame，按内存占用做 LRU 淘汰。"""
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+import pandas as pd
+
+Tag = tuple[str, str]
+
+
+def _copy_on_write() -> bool:
+    """pandas 3 起写时复制始终开启；pandas 2 取决于 mode.copy_on_write 选项（默认关闭）。"""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.options.mode.copy_on_write is True
+
+
+def _detached(frame: pd.DataFrame) -> pd.DataFrame:
+    """返回与缓存条目互不影响的副本：写时复制开启时浅拷贝即可，否则深拷贝。"""
+    return frame.copy(deep=not _copy_on_write())
+
+
+class QueryCache:
+    """线程安全的 DataFrame LRU 缓存。
+
+    每个条目带一组标签（如 ("prices", "AAPL")），写入时按标签精确失效。
+    put 与 get 都复制一份，调用方原地修改传入或取回的结果不会影响缓存；
+    写时复制开启时（pandas 3 起默认）是浅拷贝，pandas 2 默认配置下是深拷贝。
+
+    每个标签维护一个失效代数：查询前用 version() 记下代数，put 时若其间发生过失效则拒绝写入，
+    避免读到旧数据的查询在写入失效之后才把结果放进缓存。
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[pd.DataFrame, int, frozenset[Tag]]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generations: dict[Tag, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> pd.DataFrame | None:
+        """命中时返回缓存结果并标记为最近使用。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _detached(entry[0])
+
+    def version(self, tags: Iterable[Tag]) -> tuple[int, ...]:
+        """返回一组标签当前的失效代数，在执行查询前调用并传给 put。"""
+        with self._lock:
+            return self._version(tags)
+
+    def _version(self, tags: Iterable[Tag]) -> tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in sorted(set(tags)))
+
+    def put(
+        self,
+        key: Hashable,
+        frame: pd.DataFrame,
+        tags: Iterable[Tag],
+        version: tuple[int, ...] | None = None,
+    ) -> bool:
+        """写入缓存，返回是否写入；结果超过容量上限，或 version 之后标签已失效时不缓存。"""
+        tags = frozenset(tags)
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if version is not None and self._version(tags) != version:
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (_detached(frame), size, tags)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def invalidate(self, tags: Iterable[Tag]) -> int:
+        """删除带有任一给定标签的条目，返回删除数量。"""
+        targets = set(tags)
+        if not targets:
+            return 0
+        with self._lock:
+            for tag in targets:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if entry_tags & targets]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        """清空缓存。"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """返回命中、未命中、淘汰、失效次数与当前占用。"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
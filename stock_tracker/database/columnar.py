@@ -0,0 +1,130 @@
+"""行式 / 列式写入数据的统一转换，生成可直接 executemany 的位置参数元组。"""
+
+from operator import itemgetter
+from typing import Any, Iterator, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ("symbol", "trade_date", "open", "high", "low", "close", "volume", "adjusted_close")
+POSITION_COLUMNS = (
+    "account_id",
+    "symbol",
+    "quantity",
+    "avg_cost",
+    "market_value",
+    "unrealized_pnl",
+    "snapshot_date",
+)
+
+RowsOrColumns = Union[Sequence[Mapping[str, Any]], pd.DataFrame, Mapping[str, Any]]
+
+
+def _to_python(values: Any) -> list[Any]:
+    """把一段数组转换成 sqlite3 可绑定的 Python 对象列表。"""
+    array = np.asarray(values)
+    if array.dtype.kind == "M":
+        return np.datetime_as_string(array, unit="D").tolist()
+    return array.tolist()
+
+
+def _column_length(columns: Mapping[str, Any], names: Sequence[str]) -> int:
+    for name in names:
+        value = columns[name]
+        if not np.isscalar(value) and value is not None:
+            return len(value)
+    return 1
+
+
+def iter_row_batches(
+    data: RowsOrColumns,
+    columns: Sequence[str],
+    batch_size: int = 5000,
+) -> Iterator[list[tuple[Any, ...]]]:
+    """按批产出位置参数元组。
+
+    data 可以是字典列表、DataFrame，或列名到 NumPy 数组 / 标量的映射（标量按行广播）。
+    列式数据每批只把对应切片转换为 Python 对象，峰值内存与批大小成正比。
+    """
+    if isinstance(data, pd.DataFrame):
+        data = {name: data[name].to_numpy() for name in columns}
+    elif not isinstance(data, Mapping):
+        getter = itemgetter(*columns)
+        for i in range(0, len(data), batch_size):
+            yield [getter(row) for row in data[i : i + batch_size]]
+        return
+
+    total = _column_length(data, columns)
+    for start in range(0, total, batch_size):
+        stop = min(start + batch_size, total)
+        values = []
+        for name in columns:
+            column = data[name]
+            if column is None or np.isscalar(column):
+                values.append([column] * (stop - start))
+            else:
+                values.append(_to_python(column[start:stop]))
+        yield list(zip(*values))
+
+
+def row_count(data: RowsOrColumns) -> int:
+    """返回行式或列式数据的行数。"""
+    if isinstance(data, Mapping):
+        return _column_length(data, list(data))
+    return len(data)
+
+
+def distinct_values(data: RowsOrColumns, column: str) -> set[str]:
+    """返回某一列去重后的字符串值，用于确定写入影响的标的或日期。"""
+    if isinstance(data, pd.DataFrame):
+        values: Any = data[column].to_numpy()
+    elif isinstance(data, Mapping):
+        values = data[column]
+        if values is None or np.isscalar(values):
+            return {str(values)}
+    else:
+        return {str(row.get(column)) for row in data}
+    return {str(value) for value in set(_to_python(values))}
+
+
+def date_ints(values: Any) -> np.ndarray:
+    """把日期列（datetime64 或 YYYY-MM-DD 文本）向量化转换为 YYYYMMDD 整数数组。"""
+    array = np.asarray(values)
+    if array.dtype.kind != "M":
+        array = pd.to_datetime(pd.Series(array, dtype=str).str[:10], format="%Y-%m-%d").to_numpy()
+    days = pd.DatetimeIndex(array)
+    return (days.year * 10000 + days.month * 100 + days.day).to_numpy(dtype=np.int64)
+
+
+def int_dates_to_datetime64(values: Any) -> np.ndarray:
+    """把 YYYYMMDD 整数数组向量化转换为 datetime64[ns]，是 date_ints 的逆运算。"""
+    ints = np.asarray(values, dtype=np.int64)
+    months = (ints // 10000 - 1970) * 12 + ints // 100 % 100 - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (ints % 100 - 1)
+    return days.astype("datetime64[ns]")
+
+
+def earliest_by_key(data: RowsOrColumns, key_column: str, date_column: str) -> dict[str, str]:
+    """按键列分组返回最早的日期（YYYY-MM-DD 字符串），用于确定写入影响的起始位置。"""
+    if isinstance(data, (pd.DataFrame, Mapping)):
+        total = len(data) if isinstance(data, pd.DataFrame) else _column_length(data, (key_column, date_column))
+        columns = {}
+        for name in (key_column, date_column):
+            column = data[name]
+            if isinstance(data, pd.DataFrame):
+                column = column.to_numpy()
+            if column is None or np.isscalar(column):
+                columns[name] = [str(column)] * total
+            else:
+                columns[name] = [str(value) for value in _to_python(column)]
+        if total == 0:
+            return {}
+        frame = pd.DataFrame(columns)
+        return frame.groupby(key_column, sort=False)[date_column].min().str[:10].to_dict()
+
+    earliest: dict[str, str] = {}
+    for row in data:
+        key, value = str(row.get(key_column)), str(row.get(date_column))[:10]
+        if key not in earliest or value < earliest[key]:
+            earliest[key] = value
+    return earliest
@@ -1,45 +1,216 @@
 """SQLite 数据库管理器，提供初始化、写入、查询能力。"""
 
+import logging
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from datetime import date
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterator, Mapping, Sequence
 
+import numpy as np
 import pandas as pd
 
-from stock_tracker.database.models import CREATE_TABLES_SQL, INDEX_SQL
+from stock_tracker.database.columnar import (
+    POSITION_COLUMNS,
+    PRICE_COLUMNS,
+    RowsOrColumns,
+    date_ints,
+    distinct_values,
+    earliest_by_key,
+    iter_row_batches,
+    row_count,
+)
+from stock_tracker.database.cache import QueryCache
+from stock_tracker.database.migrations import (
+    DATE_TEXT_SQL,
+    LATEST_VERSION,
+    PRICE_ROWS_SQL,
+    apply_migrations,
+    current_version,
+)
+from stock_tracker.database.models import CREATE_TABLES_SQL, INDEX_SQL, PARQUET_TABLES
+from stock_tracker.database.pool import ConnectionPool
+from stock_tracker.database.price_query import read_price_bars, to_long_frame, to_wide_frame, validate_price_columns
+from stock_tracker.database.position_delta import (
+    POSITION_EVENT_COLUMNS,
+    POSITION_KEYS,
+    POSITION_VALUE_DTYPES,
+    position_changes,
+    reconstruct_positions,
+)
+from stock_tracker.database.write_behind import WriteBehindWriter
+from stock_tracker.utils.helpers import int_to_date_str, to_date_str
+from stock_tracker.utils.instrumentation import get_recorder
+
+logger = logging.getLogger(__name__)
+
+# 表名 -> {受影响的键: 该键最早受影响的日期}
+Changes = dict[str, dict[str, str]]
+
+# corporate_actions.action_type 的取值
+ACTION_TYPES = ("split", "dividend")
+
+# 批量导入的暂存表：无索引、无约束，只在写连接上存在
+PRICE_STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS price_bars_staging (
+    symbol_id INTEGER,
+    trade_date INTEGER,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    adjusted_close REAL
+);
+"""
 
 
 class DatabaseManager:
     """数据库管理类。"""
 
-    def __init__(self, db_path: str) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        max_readers: int = 4,
+        write_behind: bool = False,
+        cache_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
         self.db_path = db_path
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(db_path, max_readers=max_readers)
+        self.cache = QueryCache(cache_bytes) if cache_bytes > 0 else None
+        self._listeners: list[Callable[[Changes], None]] = []
+        self._deferred: Changes | None = None
+        self._deferred_lock = threading.Lock()
         self.init_database()
+        self.write_behind = WriteBehindWriter(self) if write_behind else None
 
     @contextmanager
-    def get_connection(self) -> Iterable[sqlite3.Connection]:
-        """数据库连接上下文管理器。"""
-        conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-        try:
-            conn.execute("PRAGMA journal_mode=WAL;")
-            conn.execute("PRAGMA synchronous=NORMAL;")
+    def get_connection(self) -> Iterator[sqlite3.Connection]:
+        """写连接上下文管理器，退出时提交，异常时回滚。"""
+        with self.pool.writer() as conn:
+            yield conn
+
+    @contextmanager
+    def get_read_connection(self) -> Iterator[sqlite3.Connection]:
+        """只读连接上下文管理器，用于查询与导出。"""
+        with self.pool.reader() as conn:
             yield conn
-            conn.commit()
-        except sqlite3.Error:
-            conn.rollback()
-            raise
+
+    def health_check(self) -> bool:
+        """检查连接池中的连接是否可用。"""
+        return self.pool.health_check()
+
+    def _write(self, handler: Callable[[sqlite3.Connection], Any], changes: Changes | None = None) -> None:
+        """执行写操作：写后台模式下入队由写线程合并提交，否则立即在写连接上执行并提交。
+
+        changes 描述受影响的表、键及每个键最早受影响的日期（如 {"prices": {"AAPL": "2026-01-02"}}），
+        提交后据此使缓存失效并通知监听器。
+        """
+        if self.write_behind is not None:
+            self.write_behind.submit(handler, changes)
+            return
+        self._write_now(handler, changes)
+
+    def _write_now(self, handler: Callable[[sqlite3.Connection], Any], changes: Changes | None = None) -> None:
+        """绕过写后台队列，直接在写连接上执行并提交。
+
+        供监听器内的派生写入使用：监听器运行在写线程上，向自身的有界队列入队会在队列满时死锁。
+        """
+        started = time.perf_counter()
+        with self.get_connection() as conn:
+            handler(conn)
+        get_recorder().observe("db_commit_seconds", time.perf_counter() - started, mode="sync")
+        self._on_committed(changes)
+
+    def _on_committed(self, changes: Changes | None) -> None:
+        """写入提交后的回调：按表与键精确失效缓存，再依次通知监听器。"""
+        if not changes:
+            return
+        with self._deferred_lock:
+            if self._deferred is not None:
+                for table, keys in changes.items():
+                    merged = self._deferred.setdefault(table, {})
+                    for key, since in keys.items():
+                        if key not in merged or since < merged[key]:
+                            merged[key] = since
+                return
+        if self.cache is not None:
+            tags = {(table, "*") for table in changes}
+            tags.update((table, key) for table, keys in changes.items() for key in keys)
+            self.cache.invalidate(tags)
+        for listener in list(self._listeners):
+            try:
+                listener(changes)
+            except Exception as exc:
+                logger.exception("写入监听器 %r 执行失败: %s", listener, exc)
+
+    def add_commit_listener(self, listener: Callable[[Changes], None]) -> None:
+        """注册写入提交后的监听器，用于维护派生数据。"""
+        self._listeners.append(listener)
+
+    def remove_commit_listener(self, listener: Callable[[Changes], None]) -> None:
+        """移除写入监听器。"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @contextmanager
+    def deferred_maintenance(self) -> Iterator[None]:
+        """批量写入期间暂缓缓存失效与派生数据监听器，退出时按合并后的变更统一通知一次。
+
+        price_bars 自迁移 2 起只有聚簇主键、没有二级索引，批量导入期间主要的额外开销是
+        每次提交后监听器（如 MetricsEngine）重算派生指标，在这里推迟到导入结束。
+        """
+        with self._deferred_lock:
+            if self._deferred is not None:
+                raise RuntimeError("deferred_maintenance 不支持嵌套")
+            self._deferred = {}
+        try:
+            yield
         finally:
-            conn.close()
+            try:
+                self.flush()
+            finally:
+                with self._deferred_lock:
+                    changes, self._deferred = self._deferred, None
+                self._on_committed(changes)
+
+    def cache_stats(self) -> dict[str, int]:
+        """返回查询缓存的命中统计。"""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def flush(self) -> None:
+        """等待写后台队列中的数据全部落盘；未启用写后台时为空操作。"""
+        if self.write_behind is not None:
+            self.write_behind.flush()
+
+    def close(self) -> None:
+        """落盘剩余写入并关闭连接池。"""
+        if self.write_behind is not None:
+            self.write_behind.close()
+        self.pool.close()
 
-    def init_database(self) -> None:
-        """初始化数据库结构。"""
+    def __enter__(self) -> "DatabaseManager":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def init_database(self) -> list[int]:
+        """初始化数据库结构：新库先建基线表，再按版本执行未应用的迁移。"""
+        # 已是最新版本时只在读连接上检查一次版本号，不执行 DDL、不占用写连接
+        with self.get_read_connection() as conn:
+            if current_version(conn) == LATEST_VERSION:
+                return []
         with self.get_connection() as conn:
-            for sql in CREATE_TABLES_SQL:
-                conn.execute(sql)
-            for sql in INDEX_SQL:
-                conn.execute(sql)
+            if current_version(conn) == 0:
+                for sql in CREATE_TABLES_SQL:
+                    conn.execute(sql)
+                for sql in INDEX_SQL:
+                    conn.execute(sql)
+            return apply_migrations(conn)
 
     def save_accounts(self, accounts: list[dict[str, Any]]) -> None:
         """批量保存账户数据。"""
@@ -50,41 +221,142 @@ class DatabaseManager:
             account_name = excluded.account_name,
             currency = excluded.currency;
         """
-        with self.get_connection() as conn:
-            conn.executemany(sql, accounts)
+        self._write(lambda conn: conn.executemany(sql, accounts))
 
-    def save_positions(self, positions: list[dict[str, Any]]) -> None:
-        """批量保存持仓快照。"""
+    def save_positions(self, positions: RowsOrColumns, batch_size: int = 5000) -> None:
+        """批量保存持仓快照，支持字典列表或列式数据（DataFrame / NumPy 数组字典）。"""
         sql = """
         INSERT INTO positions (
             account_id, symbol, quantity, avg_cost,
             market_value, unrealized_pnl, snapshot_date
         )
-        VALUES (
-            :account_id, :symbol, :quantity, :avg_cost,
-            :market_value, :unrealized_pnl, :snapshot_date
-        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(account_id, symbol, snapshot_date) DO UPDATE SET
             quantity = excluded.quantity,
             avg_cost = excluded.avg_cost,
             market_value = excluded.market_value,
             unrealized_pnl = excluded.unrealized_pnl;
         """
-        with self.get_connection() as conn:
-            conn.executemany(sql, positions)
 
-    def save_prices(self, prices: list[dict[str, Any]], batch_size: int = 5000) -> None:
-        """分批保存股价历史。"""
+        def write(conn: sqlite3.Connection) -> None:
+            for batch in iter_row_batches(positions, POSITION_COLUMNS, batch_size):
+                conn.executemany(sql, batch)
+
+        dates = distinct_values(positions, "snapshot_date")
+        self._write(write, {"positions": {value: value for value in dates}})
+        get_recorder().incr("db_rows_written", row_count(positions), table="positions")
+
+    def update_position_values(self, values: RowsOrColumns, batch_size: int = 5000) -> int:
+        """批量回写持仓估值列，values 需包含市值、浮盈及定位持仓的三个键列。返回行数。"""
+        sql = """
+        UPDATE positions
+        SET market_value = ?, unrealized_pnl = ?
+        WHERE account_id = ? AND symbol = ? AND snapshot_date = ?;
+        """
+        columns = ("market_value", "unrealized_pnl", "account_id", "symbol", "snapshot_date")
+
+        def write(conn: sqlite3.Connection) -> None:
+            for batch in iter_row_batches(values, columns, batch_size):
+                conn.executemany(sql, batch)
+
+        dates = distinct_values(values, "snapshot_date")
+        self._write(write, {"positions": {value: value for value in dates}})
+        return len(values["symbol"]) if isinstance(values, Mapping) else len(values)
+
+    def save_position_snapshot(
+        self,
+        positions: RowsOrColumns,
+        snapshot_date: str,
+        keyframe_days: int = 30,
+    ) -> None:
+        """以增量方式保存某日的完整持仓：只记录相对前一日的开仓、平仓与变化。
+
+        距上一个关键帧满 keyframe_days 天（或尚无关键帧）时写入全量关键帧。
+        快照需按日期顺序写入；重复写入最近一日会先删除该日记录再重新计算。
+        """
+        snapshot_date = to_date_str(snapshot_date)[:10]
+        rows = [row for batch in iter_row_batches(positions, POSITION_EVENT_COLUMNS) for row in batch]
+        frame = pd.DataFrame(rows, columns=list(POSITION_EVENT_COLUMNS)).astype(POSITION_VALUE_DTYPES)
+        frame = frame.drop_duplicates(list(POSITION_KEYS), keep="last")
+
+        def write(conn: sqlite3.Connection) -> None:
+            latest = conn.execute(
+                """
+                SELECT MAX(snapshot_date) FROM (
+                    SELECT snapshot_date FROM position_keyframes
+                    UNION ALL
+                    SELECT snapshot_date FROM position_events
+                )
+                """
+            ).fetchone()[0]
+            if latest is not None and latest > snapshot_date:
+                raise ValueError(f"增量持仓需按日期顺序写入，已有 {latest}，不能写入 {snapshot_date}")
+            conn.execute("DELETE FROM position_events WHERE snapshot_date = ?", (snapshot_date,))
+            conn.execute("DELETE FROM position_keyframes WHERE snapshot_date = ?", (snapshot_date,))
+
+            last_keyframe = conn.execute(
+                "SELECT MAX(snapshot_date) FROM position_keyframes WHERE snapshot_date < ?",
+                (snapshot_date,),
+            ).fetchone()[0]
+            is_keyframe = (
+                last_keyframe is None
+                or (date.fromisoformat(snapshot_date) - date.fromisoformat(last_keyframe)).days >= keyframe_days
+            )
+            if is_keyframe:
+                events = frame.assign(change_type="K")
+                conn.execute("INSERT INTO position_keyframes (snapshot_date) VALUES (?)", (snapshot_date,))
+            else:
+                events = position_changes(reconstruct_positions(conn, snapshot_date, inclusive=False), frame)
+            events = events[["account_id", "symbol", "change_type", "quantity", "avg_cost"]]
+            rows = events.astype(object).where(events.notna(), None).itertuples(index=False)
+            conn.executemany(
+                """
+                INSERT INTO position_events (
+                    snapshot_date, account_id, symbol, change_type, quantity, avg_cost
+                )
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [(snapshot_date, *row) for row in rows],
+            )
+            logger.info(
+                "增量保存 %s 持仓：%s 条记录（%s）",
+                snapshot_date,
+                len(events),
+                "关键帧" if is_keyframe else "变更",
+            )
+
+        self._write(write, {"positions": {snapshot_date: snapshot_date}})
+
+    def get_position_snapshot(self, snapshot_date: str) -> pd.DataFrame:
+        """从最近的关键帧与其后的变更重建某日的完整持仓。"""
+        snapshot_date = to_date_str(snapshot_date)[:10]
+        # 任一日期的写入都可能影响之后所有日期的重建结果
+        tags = [("positions", "*")]
+        if self.cache is not None:
+            key = ("position_snapshot", snapshot_date)
+            frame = self.cache.get(key)
+            if frame is not None:
+                return frame
+            version = self.cache.version(tags)
+        with self.get_read_connection() as conn:
+            frame = reconstruct_positions(conn, snapshot_date).assign(snapshot_date=snapshot_date)
+        if self.cache is not None:
+            self.cache.put(key, frame, tags, version)
+        return frame
+
+    def save_prices(self, prices: RowsOrColumns, batch_size: int = 5000) -> None:
+        """分批保存股价历史，支持字典列表或列式数据（DataFrame / NumPy 数组字典）。"""
         sql = """
-        INSERT INTO prices (
-            symbol, trade_date, open, high, low,
+        INSERT INTO price_bars (
+            symbol_id, trade_date, open, high, low,
             close, volume, adjusted_close
         )
         VALUES (
-            :symbol, :trade_date, :open, :high, :low,
-            :close, :volume, :adjusted_close
+            (SELECT symbol_id FROM symbols WHERE symbol = ?),
+            CAST(replace(substr(?, 1, 10), '-', '') AS INTEGER),
+            ?, ?, ?, ?, ?, ?
         )
-        ON CONFLICT(symbol, trade_date) DO UPDATE SET
+        ON CONFLICT(symbol_id, trade_date) DO UPDATE SET
             open = excluded.open,
             high = excluded.high,
             low = excluded.low,
@@ -93,40 +365,354 @@ class DatabaseManager:
             adjusted_close = excluded.adjusted_close;
         """
 
-        with self.get_connection() as conn:
-            for i in range(0, len(prices), batch_size):
-                conn.executemany(sql, prices[i : i + batch_size])
+        def write(conn: sqlite3.Connection) -> None:
+            for batch in iter_row_batches(prices, PRICE_COLUMNS, batch_size):
+                conn.executemany(
+                    "INSERT OR IGNORE INTO symbols (symbol) VALUES (?)",
+                    {(row[0],) for row in batch},
+                )
+                conn.executemany(sql, batch)
 
-    def log_fetch(self, fetch_type: str, symbol: str, status: str, error_message: str | None = None) -> None:
-        """记录数据抓取日志。"""
-        with self.get_connection() as conn:
+        self._write(write, {"prices": earliest_by_key(prices, "symbol", "trade_date")})
+        get_recorder().incr("db_rows_written", row_count(prices), table="prices")
+
+    def bulk_load_prices(
+        self,
+        prices: RowsOrColumns,
+        checkpoint: Mapping[str, Any] | None = None,
+        batch_size: int = 50000,
+    ) -> int:
+        """批量导入股价：先写入无索引的暂存表，再用一条 INSERT ... SELECT 按主键顺序合并进 price_bars。
+
+        checkpoint 为 backfill_progress 的一行（symbol、target_start、next_end、status、chunks、rows），
+        与数据在同一事务中提交，中断后可从断点继续。返回导入行数。
+        """
+        frame = prices if isinstance(prices, pd.DataFrame) else pd.DataFrame(prices, columns=list(PRICE_COLUMNS))
+        total = len(frame)
+        # 日期与标的 id 在写入前向量化转换，暂存表只绑定数值，合并时无需逐行解析与子查询
+        symbols = frame["symbol"].astype(str).to_numpy()
+        trade_dates = date_ints(frame["trade_date"].to_numpy()) if total else np.empty(0, dtype=np.int64)
+        values = [frame[name].to_numpy() for name in PRICE_COLUMNS[2:]]
+
+        def write(conn: sqlite3.Connection) -> None:
+            conn.execute(PRICE_STAGING_SQL)
+            names, codes = np.unique(symbols, return_inverse=True)
+            conn.executemany("INSERT OR IGNORE INTO symbols (symbol) VALUES (?)", [(name,) for name in names.tolist()])
+            symbol_ids = dict(conn.execute("SELECT symbol, symbol_id FROM symbols").fetchall())
+            ids = np.array([symbol_ids[name] for name in names.tolist()], dtype=np.int64)[codes]
+            for start in range(0, total, batch_size):
+                stop = start + batch_size
+                columns = [ids[start:stop].tolist(), trade_dates[start:stop].tolist()]
+                columns += [column[start:stop].tolist() for column in values]
+                conn.executemany(
+                    "INSERT INTO temp.price_bars_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    zip(*columns),
+                )
             conn.execute(
                 """
-                INSERT INTO fetch_logs (fetch_type, symbol, status, error_message)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO price_bars (
+                    symbol_id, trade_date, open, high, low, close, volume, adjusted_close
+                )
+                SELECT symbol_id, trade_date, open, high, low, close, volume, adjusted_close
+                FROM temp.price_bars_staging
+                WHERE true
+                ORDER BY symbol_id, trade_date
+                ON CONFLICT(symbol_id, trade_date) DO UPDATE SET
+                    open = excluded.open,
+                    high = excluded.high,
+                    low = excluded.low,
+                    close = excluded.close,
+                    volume = excluded.volume,
+                    adjusted_close = excluded.adjusted_close
+                """
+            )
+            conn.execute("DELETE FROM temp.price_bars_staging")
+            if checkpoint is not None:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO backfill_progress (
+                        symbol, target_start, next_end, status, chunks, rows, updated_at
+                    )
+                    VALUES (:symbol, :target_start, :next_end, :status, :chunks, :rows, CURRENT_TIMESTAMP)
+                    """,
+                    checkpoint,
+                )
+
+        earliest = pd.Series(trade_dates).groupby(symbols, sort=False).min()
+        changes = {"prices": {symbol: int_to_date_str(value) for symbol, value in earliest.items()}} if total else None
+        self._write(write, changes)
+        get_recorder().incr("db_rows_written", total, table="prices")
+        return total
+
+    def get_backfill_progress(self) -> dict[str, dict[str, Any]]:
+        """返回每个标的的回填断点。"""
+        columns = ("symbol", "target_start", "next_end", "status", "chunks", "rows")
+        with self.get_read_connection() as conn:
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM backfill_progress").fetchall()
+        return {row[0]: dict(zip(columns, row)) for row in rows}
+
+    def save_corporate_actions(self, actions: RowsOrColumns) -> None:
+        """保存拆股与分红记录（symbol、ex_date、action_type、value），同一标的同日同类型覆盖写入。"""
+        columns = ("symbol", "ex_date", "action_type", "value")
+        batch = next(iter_row_batches(actions, columns, max(row_count(actions), 1)), [])
+        for symbol, ex_date, action_type, value in batch:
+            if action_type not in ACTION_TYPES:
+                raise ValueError(f"未知公司行动类型: {action_type}")
+            if value is None or not value > 0:
+                raise ValueError(f"{symbol} {ex_date} 的 {action_type} 数值必须为正: {value}")
+
+        def write(conn: sqlite3.Connection) -> None:
+            conn.executemany("INSERT OR IGNORE INTO symbols (symbol) VALUES (?)", {(row[0],) for row in batch})
+            conn.executemany(
+                """
+                INSERT INTO corporate_actions (symbol_id, ex_date, action_type, value)
+                VALUES (
+                    (SELECT symbol_id FROM symbols WHERE symbol = ?),
+                    CAST(replace(substr(?, 1, 10), '-', '') AS INTEGER),
+                    ?, ?
+                )
+                ON CONFLICT(symbol_id, ex_date, action_type) DO UPDATE SET value = excluded.value
+                """,
+                batch,
+            )
+
+        self._write(write, {"corporate_actions": earliest_by_key(actions, "symbol", "ex_date")} if batch else None)
+
+    def get_corporate_actions(self, symbols: Sequence[str] | None = None) -> pd.DataFrame:
+        """返回公司行动记录（symbol, ex_date, action_type, value），按标的与除权日排序。"""
+        condition = f"WHERE s.symbol IN ({','.join('?' * len(symbols))})" if symbols is not None else ""
+        query = f"""
+            SELECT s.symbol, {DATE_TEXT_SQL.format(col="a.ex_date")} AS ex_date, a.action_type, a.value
+            FROM corporate_actions a
+            JOIN symbols s ON s.symbol_id = a.symbol_id
+            {condition}
+            ORDER BY s.symbol, a.ex_date, a.action_type
+        """
+        return self.query_dataframe(query, tuple(symbols) if symbols is not None else None)
+
+    def update_adjusted_close(
+        self,
+        symbols: np.ndarray,
+        trade_dates: np.ndarray,
+        adjusted: np.ndarray,
+        batch_size: int = 50000,
+    ) -> int:
+        """按 (标的, YYYYMMDD 日期) 批量改写 adjusted_close，提交后按每个标的最早改写日期通知监听器。
+
+        变更同时以 prices 与 price_adjustments 两个表名发布：前者驱动缓存失效与派生指标，后者标明来源。
+        与 MetricsEngine 一样直接写写连接，不经写后台队列，返回时改写已提交。
+        """
+        total = len(symbols)
+        if not total:
+            return 0
+        symbols = np.asarray(symbols).astype(str)
+        trade_dates = np.asarray(trade_dates, dtype=np.int64)
+
+        def write(conn: sqlite3.Connection) -> None:
+            names, codes = np.unique(symbols, return_inverse=True)
+            symbol_ids = dict(conn.execute("SELECT symbol, symbol_id FROM symbols").fetchall())
+            ids = np.array([symbol_ids[name] for name in names.tolist()], dtype=np.int64)[codes]
+            for start in range(0, total, batch_size):
+                stop = start + batch_size
+                conn.executemany(
+                    "UPDATE price_bars SET adjusted_close = ? WHERE symbol_id = ? AND trade_date = ?",
+                    zip(adjusted[start:stop].tolist(), ids[start:stop].tolist(), trade_dates[start:stop].tolist()),
+                )
+
+        earliest = pd.Series(trade_dates).groupby(symbols, sort=False).min()
+        since = {symbol: int_to_date_str(value) for symbol, value in earliest.items()}
+        # price_adjustments 标记这是复权改写，AdjustmentEngine 据此跳过自身产生的变更
+        self._write_now(write, {"prices": since, "price_adjustments": dict(since)})
+        get_recorder().incr("db_rows_written", total, table="prices")
+        return total
+
+    def get_latest_trade_dates(self) -> dict[str, str]:
+        """一次查询返回每个标的已入库的最新交易日。"""
+        with self.get_read_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT s.symbol, MAX(b.trade_date)
+                FROM price_bars b
+                JOIN symbols s ON s.symbol_id = b.symbol_id
+                GROUP BY b.symbol_id
+                """
+            ).fetchall()
+        return {symbol: int_to_date_str(last_date) for symbol, last_date in rows}
+
+    def log_fetch(
+        self,
+        fetch_type: str,
+        symbol: str,
+        status: str,
+        error_message: str | None = None,
+        latency_ms: float | None = None,
+    ) -> None:
+        """记录数据抓取日志。"""
+        self._write(
+            lambda conn: conn.execute(
+                """
+                INSERT INTO fetch_logs (fetch_type, symbol, status, error_message, latency_ms)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (fetch_type, symbol, status, error_message, latency_ms),
+            )
+        )
+
+    def save_job_metrics(self, rows: list[tuple[Any, ...]]) -> None:
+        """保存任务性能指标，行格式为 (run_id, job, stage, metric, value, labels)。"""
+        self._write(
+            lambda conn: conn.executemany(
+                """
+                INSERT INTO job_metrics (run_id, job, stage, metric, value, labels)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
-                (fetch_type, symbol, status, error_message),
+                rows,
             )
+        )
 
     def query_dataframe(self, query: str, params: tuple[Any, ...] | None = None) -> pd.DataFrame:
         """执行查询并返回 DataFrame。"""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             return pd.read_sql_query(query, conn, params=params)
 
+    def _cached_query(
+        self,
+        query: str,
+        params: tuple[Any, ...],
+        tag: tuple[str, str],
+        date_columns: Sequence[str] = (),
+    ) -> pd.DataFrame:
+        """带缓存的查询，tag 用于写入后的精确失效；date_columns 中的 YYYY-MM-DD 文本列转为 date 对象。"""
+        if self.cache is None:
+            return self._query_with_dates(query, params, date_columns)
+        key = (query, params)
+        frame = self.cache.get(key)
+        if frame is None:
+            # 先记下失效代数再查询，查询期间有写入提交时不缓存这份可能过期的结果
+            version = self.cache.version([tag])
+            frame = self._query_with_dates(query, params, date_columns)
+            self.cache.put(key, frame, [tag], version)
+        return frame
+
+    def _query_with_dates(self, query: str, params: tuple[Any, ...], date_columns: Sequence[str]) -> pd.DataFrame:
+        frame = self.query_dataframe(query, params)
+        for column in date_columns:
+            frame[column] = pd.to_datetime(frame[column]).dt.date
+        return frame
+
     def get_positions_dataframe(self, snapshot_date: str | None = None) -> pd.DataFrame:
         """读取持仓 DataFrame。"""
         if snapshot_date:
-            return self.query_dataframe(
+            return self._cached_query(
                 "SELECT * FROM positions WHERE snapshot_date = ? ORDER BY account_id, symbol",
                 (snapshot_date,),
+                ("positions", str(snapshot_date)),
             )
-        return self.query_dataframe("SELECT * FROM positions ORDER BY snapshot_date DESC, account_id, symbol")
+        return self._cached_query(
+            "SELECT * FROM positions ORDER BY snapshot_date DESC, account_id, symbol",
+            (),
+            ("positions", "*"),
+        )
 
     def get_prices_dataframe(self, symbol: str | None = None) -> pd.DataFrame:
-        """读取价格 DataFrame。"""
+        """读取价格 DataFrame，trade_date 为 date 对象。
+
+        直接按 price_bars 主键中的整数日期排序，不经 prices 视图的文本日期列。
+        """
         if symbol:
-            return self.query_dataframe(
-                "SELECT * FROM prices WHERE symbol = ? ORDER BY trade_date",
+            return self._cached_query(
+                f"{PRICE_ROWS_SQL} WHERE s.symbol = ? ORDER BY b.trade_date",
                 (symbol,),
+                ("prices", symbol),
+                date_columns=["trade_date"],
             )
-        return self.query_dataframe("SELECT * FROM prices ORDER BY symbol, trade_date")
+        return self._cached_query(
+            f"{PRICE_ROWS_SQL} ORDER BY s.symbol, b.trade_date",
+            (),
+            ("prices", "*"),
+            date_columns=["trade_date"],
+        )
+
+    def get_prices(
+        self,
+        symbols: Sequence[str] | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        columns: Sequence[str] | None = None,
+        wide: bool = False,
+        float32: bool = False,
+        chunk_size: int = 100_000,
+    ) -> pd.DataFrame:
+        """按标的、日期区间与列读取价格。
+
+        返回长表（symbol 为 category、trade_date 为 datetime64），或 wide=True 时返回单列的
+        交易日 × 标的宽矩阵（由单个二维数组支撑，缺失为 NaN）；float32=True 时价格列使用 float32。
+        symbols 为 None 时读取全部标的。结果按涉及的标的打缓存标签，写入时精确失效。
+        """
+        selected = validate_price_columns(columns)
+        if wide and len(selected) != 1:
+            raise ValueError("宽矩阵只支持单个价格列")
+        requested = None if symbols is None else list(dict.fromkeys(symbols))
+        key = (
+            "get_prices",
+            None if requested is None else tuple(requested),
+            start,
+            end,
+            tuple(selected),
+            wide,
+            float32,
+        )
+        tags = [("prices", "*")] if requested is None else [("prices", symbol) for symbol in requested]
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            version = self.cache.version(tags)
+
+        with self.get_read_connection() as conn:
+            names, codes, dates, values = read_price_bars(conn, requested, start, end, selected, chunk_size)
+        if wide:
+            frame = to_wide_frame(names, codes, dates, values, float32)
+        else:
+            frame = to_long_frame(names, codes, dates, values, selected, float32)
+
+        if self.cache is not None:
+            self.cache.put(key, frame, tags, version)
+        return frame
+
+    def read_parquet(
+        self,
+        dataset_dir: str,
+        table: str = "prices",
+        symbols: list[str] | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        columns: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """读取 ParquetExporter 写出的分区数据集，symbol 与日期过滤下推到分区裁剪和行组统计。"""
+        try:
+            import pyarrow.dataset as ds
+        except ImportError as exc:  # pragma: no cover
+            raise RuntimeError("pyarrow 未安装，无法读取 Parquet。") from exc
+
+        date_column = PARQUET_TABLES[table]["date_column"]
+        dataset = ds.dataset(str(Path(dataset_dir) / table), format="parquet", partitioning="hive")
+        conditions = []
+        if symbols:
+            conditions.append(ds.field("symbol").isin(symbols))
+        if start:
+            start_date = date.fromisoformat(start)
+            conditions.append(ds.field("year") >= start_date.year)
+            conditions.append(ds.field(date_column) >= start_date)
+        if end:
+            end_date = date.fromisoformat(end)
+            conditions.append(ds.field("year") <= end_date.year)
+            conditions.append(ds.field(date_column) <= end_date)
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        frame = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        if columns is None:
+            frame = frame.drop(columns=["year"]).sort_values(["symbol", date_column], ignore_index=True)
+        return frame
@@ -1,5 +1,7 @@
 """数据库模块初始化导出。"""
 
 from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.database.pool import ConnectionPool
+from stock_tracker.database.write_behind import WriteBehindWriter
 
-__all__ = ["DatabaseManager"]
+__all__ = ["DatabaseManager", "ConnectionPool", "WriteBehindWriter"]
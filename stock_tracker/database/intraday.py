@@ -0,0 +1,354 @@
+"""分钟线存储引擎：按 (标的, 周期, UTC 月份) 分区的压缩列式数据块，只追加写入。
+
+每个数据块保存一段按时间递增的 bar：时间戳为 UTC epoch 秒并做差分编码，各列按字节重排
+（byte shuffle）后整体 zlib 压缩。读取时按月份分区做主键范围扫描，再按时间区间过滤，
+需要更粗的周期时在内存中向量化聚合。
+"""
+
+import logging
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Iterable, Mapping, TypeAlias
+
+import numpy as np
+import pandas as pd
+
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.utils.instrumentation import get_recorder
+
+logger = logging.getLogger(__name__)
+
+INTRADAY_COLUMNS = ("symbol", "ts", "open", "high", "low", "close", "volume")
+_PRICE_FIELDS = ("open", "high", "low", "close")
+_BAR_UNITS = {"min": 60, "mins": 60, "hour": 3600, "hours": 3600}
+
+TimeLike: TypeAlias = str | datetime | pd.Timestamp | int
+
+
+def bar_size_seconds(bar_size: str) -> int:
+    """把 IB barSizeSetting（如 "1 min"、"5 mins"、"1 hour"）换算为秒数，只支持 1 分钟到 1 小时。"""
+    try:
+        value, unit = bar_size.split()
+        seconds = int(value) * _BAR_UNITS[unit.lower()]
+    except (KeyError, ValueError):
+        raise ValueError(f"不支持的分钟线周期: {bar_size}") from None
+    if not 60 <= seconds <= 3600:
+        raise ValueError(f"不支持的分钟线周期: {bar_size}")
+    return seconds
+
+
+def to_epoch_seconds(value: TimeLike) -> int:
+    """把时间转换为 UTC epoch 秒，未带时区的时间按 UTC 处理。"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize("UTC")
+    return int(stamp.value // 1_000_000_000)
+
+
+def month_of(ts: np.ndarray) -> np.ndarray:
+    """epoch 秒所在的 UTC 月份，返回 YYYYMM 整数。"""
+    months = np.asarray(ts, dtype=np.int64).astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    return (months // 12 + 1970) * 100 + months % 12 + 1
+
+
+def _shuffle(array: np.ndarray) -> bytes:
+    return np.ascontiguousarray(array).view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+
+
+def _unshuffle(data: memoryview, dtype: type, rows: int) -> np.ndarray:
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, rows).T.copy().view(dtype).ravel()
+
+
+def encode_block(ts: np.ndarray, columns: Mapping[str, np.ndarray], level: int = 6) -> bytes:
+    """把一段递增的 bar 编码为压缩数据块：差分时间戳 + 各列 byte shuffle + zlib。"""
+    parts = [_shuffle(np.diff(ts.astype(np.int64), prepend=ts[0]))]
+    parts += [_shuffle(np.asarray(columns[name], dtype=np.float64)) for name in _PRICE_FIELDS]
+    parts.append(_shuffle(np.asarray(columns["volume"], dtype=np.int64)))
+    return zlib.compress(b"".join(parts), level)
+
+
+def decode_block(payload: bytes, start_ts: int, rows: int) -> dict[str, np.ndarray]:
+    """解码数据块，返回 ts 与各价格列数组。"""
+    raw = memoryview(zlib.decompress(payload))
+    size = rows * 8
+    block = {"ts": start_ts + np.cumsum(_unshuffle(raw[:size], np.int64, rows))}
+    for i, name in enumerate(_PRICE_FIELDS, start=1):
+        block[name] = _unshuffle(raw[i * size : (i + 1) * size], np.float64, rows)
+    block["volume"] = _unshuffle(raw[5 * size : 6 * size], np.int64, rows)
+    return block
+
+
+def downsample(
+    codes: np.ndarray,
+    data: dict[str, np.ndarray],
+    seconds: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """把按 (标的, 时间) 排序的 bar 聚合为 seconds 周期（按 UTC 整点对齐）：开盘取首、收盘取尾、高低取极值、量求和。"""
+    buckets = data["ts"] - data["ts"] % seconds
+    if not len(buckets):
+        return codes, {**data, "ts": buckets}
+    boundary = np.ones(len(buckets), dtype=bool)
+    boundary[1:] = (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(buckets)) - 1
+    return codes[starts], {
+        "ts": buckets[starts],
+        "open": data["open"][starts],
+        "high": np.maximum.reduceat(data["high"], starts),
+        "low": np.minimum.reduceat(data["low"], starts),
+        "close": data["close"][ends],
+        "volume": np.add.reduceat(data["volume"], starts),
+    }
+
+
+class IntradayStore:
+    """分钟线读写入口。
+
+    append 只接受比该标的已存最新时间戳更新的 bar，每次写入按 (标的, 月份) 追加新数据块；
+    同一分区的数据块超过 max_blocks 个时自动合并为一个。盘中抓取时最后一根 bar 还在形成，
+    append 丢弃周期尚未结束的 bar，留到下一次写入，避免把不完整的 bar 永久写入只追加的存储。
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_blocks: int = 16, level: int = 6) -> None:
+        self.db_manager = db_manager
+        self.max_blocks = max_blocks
+        self.level = level
+
+    def append(
+        self,
+        bars: pd.DataFrame | Mapping[str, Any],
+        bar_size: str = "1 min",
+        now: TimeLike | None = None,
+    ) -> int:
+        """追加写入分钟线（列：symbol、ts（UTC epoch 秒）、open、high、low、close、volume），返回写入行数。
+
+        ts 为 bar 的开始时间；结束时间晚于 now（默认当前时间）的 bar 尚未收完，不写入。
+        """
+        seconds = bar_size_seconds(bar_size)
+        if isinstance(bars, pd.DataFrame):
+            bars = {name: bars[name].to_numpy() for name in INTRADAY_COLUMNS}
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        symbols = np.broadcast_to(np.asarray(bars["symbol"], dtype=object), ts.shape).astype(str)
+        columns = {
+            name: np.broadcast_to(np.asarray(bars[name], dtype=np.int64 if name == "volume" else np.float64), ts.shape)
+            for name in (*_PRICE_FIELDS, "volume")
+        }
+        closed = ts + seconds <= (int(time.time()) if now is None else to_epoch_seconds(now))
+        if not closed.all():
+            ts, symbols = ts[closed], symbols[closed]
+            columns = {name: values[closed] for name, values in columns.items()}
+        if not len(ts):
+            return 0
+        names, codes = np.unique(symbols, return_inverse=True)
+        # 按 (标的, 时间) 稳定排序，同一时间戳重复时保留最后一条
+        order = np.lexsort((ts, codes))
+        codes, ts = codes[order], ts[order]
+        last = np.append((codes[1:] != codes[:-1]) | (ts[1:] != ts[:-1]), True)
+        order, codes, ts = order[last], codes[last], ts[last]
+        columns = {name: values[order] for name, values in columns.items()}
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+
+        written = 0
+        with self.db_manager.get_connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO symbols (symbol) VALUES (?)", [(name,) for name in names.tolist()])
+            symbol_ids = dict(conn.execute("SELECT symbol, symbol_id FROM symbols").fetchall())
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(ts)]):
+                symbol_id = symbol_ids[names[codes[lo]]]
+                # 只追加写入，最后一个数据块的 end_ts 就是该标的已存的最新时间戳
+                latest = conn.execute(
+                    """
+                    SELECT end_ts FROM intraday_blocks WHERE symbol_id = ? AND bar_seconds = ?
+                    ORDER BY month DESC, block DESC LIMIT 1
+                    """,
+                    (symbol_id, seconds),
+                ).fetchone()
+                symbol_ts = ts[lo:hi]
+                keep = symbol_ts > (latest[0] if latest else -1)
+                if not keep.any():
+                    continue
+                symbol_ts = symbol_ts[keep]
+                symbol_columns = {name: values[lo:hi][keep] for name, values in columns.items()}
+                months = month_of(symbol_ts)
+                for month in np.unique(months).tolist():
+                    in_month = months == month
+                    written += self._append_block(
+                        conn,
+                        symbol_id,
+                        seconds,
+                        month,
+                        symbol_ts[in_month],
+                        {name: values[in_month] for name, values in symbol_columns.items()},
+                    )
+        get_recorder().incr("db_rows_written", written, table="intraday_blocks")
+        return written
+
+    def _append_block(
+        self,
+        conn: sqlite3.Connection,
+        symbol_id: int,
+        seconds: int,
+        month: int,
+        ts: np.ndarray,
+        columns: Mapping[str, np.ndarray],
+    ) -> int:
+        next_block, blocks = conn.execute(
+            """
+            SELECT COALESCE(MAX(block), -1) + 1, COUNT(*) FROM intraday_blocks
+            WHERE symbol_id = ? AND bar_seconds = ? AND month = ?
+            """,
+            (symbol_id, seconds, month),
+        ).fetchone()
+        conn.execute(
+            "INSERT INTO intraday_blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                symbol_id,
+                seconds,
+                month,
+                next_block,
+                int(ts[0]),
+                int(ts[-1]),
+                len(ts),
+                encode_block(ts, columns, self.level),
+            ),
+        )
+        if blocks + 1 > self.max_blocks:
+            self._compact_partition(conn, symbol_id, seconds, month)
+        return len(ts)
+
+    def _compact_partition(self, conn: sqlite3.Connection, symbol_id: int, seconds: int, month: int) -> None:
+        rows = conn.execute(
+            """
+            SELECT start_ts, rows, payload FROM intraday_blocks
+            WHERE symbol_id = ? AND bar_seconds = ? AND month = ?
+            ORDER BY block
+            """,
+            (symbol_id, seconds, month),
+        ).fetchall()
+        decoded = [decode_block(payload, start_ts, count) for start_ts, count, payload in rows]
+        merged = {name: np.concatenate([block[name] for block in decoded]) for name in decoded[0]}
+        conn.execute(
+            "DELETE FROM intraday_blocks WHERE symbol_id = ? AND bar_seconds = ? AND month = ?",
+            (symbol_id, seconds, month),
+        )
+        conn.execute(
+            "INSERT INTO intraday_blocks VALUES (?, ?, ?, 0, ?, ?, ?, ?)",
+            (
+                symbol_id,
+                seconds,
+                month,
+                int(merged["ts"][0]),
+                int(merged["ts"][-1]),
+                len(merged["ts"]),
+                encode_block(merged["ts"], merged, self.level),
+            ),
+        )
+
+    def compact(self) -> int:
+        """把所有含多个数据块的分区合并为单个数据块，返回合并的分区数。"""
+        with self.db_manager.get_connection() as conn:
+            partitions = conn.execute(
+                """
+                SELECT symbol_id, bar_seconds, month FROM intraday_blocks
+                GROUP BY symbol_id, bar_seconds, month HAVING COUNT(*) > 1
+                """
+            ).fetchall()
+            for symbol_id, seconds, month in partitions:
+                self._compact_partition(conn, symbol_id, seconds, month)
+        return len(partitions)
+
+    def latest_timestamps(self, bar_size: str = "1 min") -> dict[str, int]:
+        """返回每个标的已存分钟线的最新时间戳（UTC epoch 秒）。"""
+        with self.db_manager.get_read_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT s.symbol, MAX(b.end_ts) FROM intraday_blocks b
+                JOIN symbols s ON s.symbol_id = b.symbol_id
+                WHERE b.bar_seconds = ?
+                GROUP BY b.symbol_id
+                """,
+                (bar_size_seconds(bar_size),),
+            ).fetchall()
+        return dict(rows)
+
+    def get_bars(
+        self,
+        symbols: Iterable[str],
+        start: TimeLike,
+        end: TimeLike,
+        bar_size: str = "1 min",
+    ) -> pd.DataFrame:
+        """读取 [start, end) 区间的分钟线，bar_size 比已存周期更粗时按需聚合。
+
+        返回长表：symbol（category）、timestamp（UTC datetime64）、open、high、low、close、volume。
+        """
+        names = list(dict.fromkeys(symbols))
+        target = bar_size_seconds(bar_size)
+        start_ts, end_ts = to_epoch_seconds(start), to_epoch_seconds(end)
+
+        fields = ("ts", *_PRICE_FIELDS, "volume")
+        parts: list[tuple[np.ndarray, dict[str, np.ndarray]]] = []
+        with self.db_manager.get_read_connection() as conn:
+            symbol_ids = dict(conn.execute("SELECT symbol, symbol_id FROM symbols").fetchall())
+            first_month, last_month = month_of(np.array([start_ts, end_ts - 1])).tolist()
+            for code, name in enumerate(names):
+                if name not in symbol_ids:
+                    continue
+                symbol_id = symbol_ids[name]
+                stored = [
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT DISTINCT bar_seconds FROM intraday_blocks WHERE symbol_id = ?", (symbol_id,)
+                    )
+                ]
+                # 每个标的各自选可整除目标周期的最粗已存周期作为数据源
+                sources = [seconds for seconds in stored if seconds <= target and target % seconds == 0]
+                if not sources:
+                    continue
+                source = max(sources)
+                rows = conn.execute(
+                    """
+                    SELECT start_ts, rows, payload FROM intraday_blocks
+                    WHERE symbol_id = ? AND bar_seconds = ? AND month BETWEEN ? AND ?
+                      AND end_ts >= ? AND start_ts < ?
+                    ORDER BY month, block
+                    """,
+                    (symbol_id, source, first_month, last_month, start_ts, end_ts),
+                ).fetchall()
+                if not rows:
+                    continue
+                blocks = [decode_block(payload, block_start, count) for block_start, count, payload in rows]
+                data = {field: np.concatenate([block[field] for block in blocks]) for field in fields}
+                in_range = (data["ts"] >= start_ts) & (data["ts"] < end_ts)
+                data = {field: values[in_range] for field, values in data.items()}
+                codes = np.full(len(data["ts"]), code, dtype=np.int32)
+                if target > source:
+                    codes, data = downsample(codes, data, target)
+                parts.append((codes, data))
+
+        if parts:
+            codes = np.concatenate([part_codes for part_codes, _ in parts])
+            data = {field: np.concatenate([part[field] for _, part in parts]) for field in fields}
+        else:
+            codes = np.empty(0, dtype=np.int32)
+            data = {name: np.empty(0, dtype=np.int64 if name in ("ts", "volume") else np.float64) for name in fields}
+
+        return pd.DataFrame(
+            {
+                "symbol": pd.Categorical.from_codes(codes, categories=names),
+                "timestamp": pd.to_datetime(data["ts"], unit="s", utc=True),
+                **{name: data[name] for name in (*_PRICE_FIELDS, "volume")},
+            }
+        )
+
+    def storage_stats(self) -> dict[str, float]:
+        """返回分钟线的总行数、数据块数、压缩后字节数与每行平均字节数。"""
+        with self.db_manager.get_read_connection() as conn:
+            rows, blocks, size = conn.execute(
+                "SELECT COALESCE(SUM(rows), 0), COUNT(*), COALESCE(SUM(length(payload)), 0) FROM intraday_blocks"
+            ).fetchone()
+        return {"rows": rows, "blocks": blocks, "bytes": size, "bytes_per_row": round(size / rows, 2) if rows else 0.0}
@@ -0,0 +1,285 @@
+"""版本化数据库迁移。
+
+schema_version 表记录已执行的版本号，init_database 按版本顺序执行尚未应用的迁移；
+每个迁移在单独的事务中执行，失败时整体回滚。models.py 中的建表语句是版本 0 的基线结构。
+"""
+
+import logging
+import sqlite3
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# 整数日期 YYYYMMDD 还原为 YYYY-MM-DD 文本
+DATE_TEXT_SQL = "printf('%04d-%02d-%02d', {col} / 10000, {col} / 100 % 100, {col} % 100)"
+
+# prices 视图的行：日期还原为文本。视图的 trade_date 是计算列，按它过滤或排序用不上主键；
+# 需要按日期取范围或排序的查询直接拼接本语句，条件与排序写在 b.trade_date（YYYYMMDD 整数）上
+PRICE_ROWS_SQL = f"""
+SELECT
+    s.symbol AS symbol,
+    {DATE_TEXT_SQL.format(col="b.trade_date")} AS trade_date,
+    b.open AS open,
+    b.high AS high,
+    b.low AS low,
+    b.close AS close,
+    b.volume AS volume,
+    b.adjusted_close AS adjusted_close
+FROM symbols s
+JOIN price_bars b ON b.symbol_id = s.symbol_id
+"""
+
+PRICES_VIEW_SQL = f"CREATE VIEW IF NOT EXISTS prices AS{PRICE_ROWS_SQL.rstrip()};"
+
+
+def _add_fetch_latency(conn: sqlite3.Connection) -> None:
+    """fetch_logs 增加 latency_ms 列（新库建表时已包含）。"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(fetch_logs)")}
+    if "latency_ms" not in existing:
+        conn.execute("ALTER TABLE fetch_logs ADD COLUMN latency_ms REAL")
+
+
+def _compact_prices(conn: sqlite3.Connection) -> None:
+    """prices 迁移为按 (symbol_id, trade_date) 聚簇的 WITHOUT ROWID 表。
+
+    标的改为整数 id，日期改为 YYYYMMDD 整数，去掉自增主键、created_at 与重复索引；
+    原表名保留为只读视图，查询语句无需修改。
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS symbols (
+            symbol_id INTEGER PRIMARY KEY,
+            symbol TEXT NOT NULL UNIQUE
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS price_bars (
+            symbol_id INTEGER NOT NULL,
+            trade_date INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            adjusted_close REAL,
+            PRIMARY KEY (symbol_id, trade_date)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.execute("INSERT OR IGNORE INTO symbols (symbol) SELECT DISTINCT symbol FROM prices ORDER BY symbol")
+    conn.execute(
+        """
+        INSERT INTO price_bars (
+            symbol_id, trade_date, open, high, low, close, volume, adjusted_close
+        )
+        SELECT
+            s.symbol_id,
+            CAST(replace(substr(p.trade_date, 1, 10), '-', '') AS INTEGER),
+            p.open, p.high, p.low, p.close, p.volume, p.adjusted_close
+        FROM prices p
+        JOIN symbols s ON s.symbol = p.symbol
+        ORDER BY s.symbol_id, 2
+        """
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_prices_symbol_date")
+    conn.execute("DROP TABLE prices")
+    conn.execute(PRICES_VIEW_SQL)
+
+
+def _create_price_metrics(conn: sqlite3.Connection) -> None:
+    """新增派生指标表，与 price_bars 同样按 (symbol_id, trade_date) 聚簇。"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS price_metrics (
+            symbol_id INTEGER NOT NULL,
+            trade_date INTEGER NOT NULL,
+            daily_return REAL,
+            ma_20 REAL,
+            ma_60 REAL,
+            volatility_20 REAL,
+            peak_close REAL,
+            drawdown REAL,
+            PRIMARY KEY (symbol_id, trade_date)
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _create_position_events(conn: sqlite3.Connection) -> None:
+    """新增增量持仓存储：变更事件表与关键帧日期表。
+
+    change_type 取值：K 关键帧全量行，O 新开仓，M 数量或成本变化，C 平仓。
+    position_keyframes 单独记录关键帧日期，使空仓日也能作为关键帧。
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS position_events (
+            snapshot_date TEXT NOT NULL,
+            account_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            change_type TEXT NOT NULL CHECK (change_type IN ('K', 'O', 'M', 'C')),
+            quantity REAL,
+            avg_cost REAL,
+            PRIMARY KEY (snapshot_date, account_id, symbol)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS position_keyframes (
+            snapshot_date TEXT PRIMARY KEY
+        );
+        """
+    )
+
+
+def _create_job_metrics(conn: sqlite3.Connection) -> None:
+    """新增任务性能指标表（长表：每行一个指标值）。"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            job TEXT NOT NULL,
+            stage TEXT NOT NULL DEFAULT '',
+            metric TEXT NOT NULL,
+            value REAL,
+            labels TEXT,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_metrics_job_time ON job_metrics(job, recorded_at)")
+
+
+def _create_backfill_progress(conn: sqlite3.Connection) -> None:
+    """新增历史回填断点表：每个标的从 next_end 继续向前回填，直到 target_start。"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            symbol TEXT PRIMARY KEY,
+            target_start TEXT NOT NULL,
+            next_end TEXT NOT NULL,
+            status TEXT NOT NULL CHECK (status IN ('running', 'done')),
+            chunks INTEGER NOT NULL DEFAULT 0,
+            rows INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _create_intraday_blocks(conn: sqlite3.Connection) -> None:
+    """新增分钟线数据块表：每行是一个 (标的, 周期, 月份) 分区内的压缩列式数据块。
+
+    数据块较大，使用普通 rowid 表而非 WITHOUT ROWID，主键单独建唯一索引。
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS intraday_blocks (
+            symbol_id INTEGER NOT NULL,
+            bar_seconds INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            block INTEGER NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (symbol_id, bar_seconds, month, block)
+        );
+        """
+    )
+
+
+def _create_corporate_actions(conn: sqlite3.Connection) -> None:
+    """新增公司行动表：拆股 value 为拆分比例（如 4 表示 1 拆 4），分红 value 为每股现金金额。"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS corporate_actions (
+            symbol_id INTEGER NOT NULL,
+            ex_date INTEGER NOT NULL,
+            action_type TEXT NOT NULL CHECK (action_type IN ('split', 'dividend')),
+            value REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol_id, ex_date, action_type)
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _add_contract_registry(conn: sqlite3.Connection) -> None:
+    """symbols_config 增加 IB 合约解析结果列，作为合约注册表。"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(symbols_config)")}
+    for column, column_type in (
+        ("con_id", "INTEGER"),
+        ("primary_exchange", "TEXT"),
+        ("trading_hours", "TEXT"),
+        ("time_zone", "TEXT"),
+        ("qualified_at", "TIMESTAMP"),
+    ):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE symbols_config ADD COLUMN {column} {column_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_symbols_config_con_id ON symbols_config(con_id)")
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "fetch_logs 增加 latency_ms", _add_fetch_latency),
+    (2, "prices 改为 WITHOUT ROWID 聚簇存储", _compact_prices),
+    (3, "新增 price_metrics 派生指标表", _create_price_metrics),
+    (4, "新增 position_events 增量持仓存储", _create_position_events),
+    (5, "新增 job_metrics 任务性能指标表", _create_job_metrics),
+    (6, "新增 backfill_progress 回填断点表", _create_backfill_progress),
+    (7, "新增 intraday_blocks 分钟线存储", _create_intraday_blocks),
+    (8, "新增 corporate_actions 公司行动表", _create_corporate_actions),
+    (9, "symbols_config 增加合约注册信息", _add_contract_registry),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """返回数据库当前结构版本，未建 schema_version 表时为 0。"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0] or 0)
+
+
+def apply_migrations(conn: sqlite3.Connection) -> list[int]:
+    """按顺序执行未应用的迁移，返回本次执行的版本号。"""
+    conn.execute(SCHEMA_VERSION_SQL)
+    conn.commit()
+    version = current_version(conn)
+    applied: list[int] = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        try:
+            migrate(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (number, description),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("数据库迁移 %s（%s）失败", number, description)
+            raise
+        logger.info("已应用数据库迁移 %s: %s", number, description)
+        applied.append(number)
+    return applied
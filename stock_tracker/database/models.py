@@ -1,4 +1,6 @@
-"""数据库建表语句定义。"""
+"""数据库建表语句定义（版本 0 基线结构，后续结构变更见 migrations.py）。"""
+
+from typing import TypedDict
 
 CREATE_TABLES_SQL = [
     """
@@ -56,6 +58,7 @@ CREATE_TABLES_SQL = [
         symbol TEXT,
         status TEXT,
         error_message TEXT,
+        latency_ms REAL,
         fetch_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """,
@@ -65,3 +68,27 @@ INDEX_SQL = [
     "CREATE INDEX IF NOT EXISTS idx_positions_account_date ON positions(account_id, snapshot_date);",
     "CREATE INDEX IF NOT EXISTS idx_prices_symbol_date ON prices(symbol, trade_date);",
 ]
+
+
+class ParquetTableSpec(TypedDict):
+    """Parquet 分区数据集的表定义。"""
+
+    date_column: str
+    value_columns: list[str]
+
+
+# Parquet 分区数据集：按 symbol + 日期列年份分区，value_columns 参与分区变更指纹
+PARQUET_TABLES: dict[str, ParquetTableSpec] = {
+    "prices": {
+        "date_column": "trade_date",
+        "value_columns": ["open", "high", "low", "close", "volume", "adjusted_close"],
+    },
+    "positions": {
+        "date_column": "snapshot_date",
+        "value_columns": ["quantity", "avg_cost", "market_value", "unrealized_pnl"],
+    },
+    "position_events": {
+        "date_column": "snapshot_date",
+        "value_columns": ["quantity", "avg_cost"],
+    },
+}
@@ -0,0 +1,168 @@
+"""SQLite 连接池：一个可复用的写连接加若干读连接。"""
+
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# 每个连接创建时执行一次
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-65536;",
+    "PRAGMA mmap_size=268435456;",
+    "PRAGMA temp_store=MEMORY;",
+]
+
+
+class PoolClosedError(RuntimeError):
+    """连接池已关闭时继续使用。"""
+
+
+class ConnectionPool:
+    """线程安全的 SQLite 连接池。
+
+    写操作串行使用同一个连接（可重入，嵌套使用时只在最外层提交）；
+    读操作从最多 max_readers 个只读连接中借用，WAL 模式下读写互不阻塞。
+    """
+
+    def __init__(self, db_path: str, max_readers: int = 4, timeout: float = 30.0) -> None:
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._idle_readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """创建新连接并设置连接级 PRAGMA。"""
+        conn = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=self.timeout,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only=ON;")
+        return conn
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise PoolClosedError(f"连接池已关闭: {self.db_path}")
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """借用写连接，最外层退出时提交，异常时回滚。"""
+        with self._writer_lock:
+            self._check_open()
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            self._writer_depth += 1
+            try:
+                yield conn
+                if self._writer_depth == 1:
+                    conn.commit()
+            except BaseException:
+                if self._writer_depth == 1:
+                    conn.rollback()
+                raise
+            finally:
+                self._writer_depth -= 1
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """借用只读连接，用完归还连接池。"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle_readers.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        self._check_open()
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                try:
+                    return self._connect(read_only=True)
+                except sqlite3.Error:
+                    self._reader_count -= 1
+                    raise
+        try:
+            return self._idle_readers.get(timeout=self.timeout)
+        except queue.Empty as exc:
+            raise TimeoutError(f"等待读连接超时（{self.timeout}s）") from exc
+
+    def health_check(self) -> bool:
+        """检查空闲连接是否可用，损坏的连接被丢弃并在下次使用时重建。"""
+        self._check_open()
+        healthy = True
+        with self._writer_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute("SELECT 1").fetchone()
+                except sqlite3.Error as exc:
+                    logger.warning("写连接不可用，将重建: %s", exc)
+                    self._discard(self._writer)
+                    self._writer = None
+                    healthy = False
+
+        checked: list[sqlite3.Connection] = []
+        while True:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.execute("SELECT 1").fetchone()
+                checked.append(conn)
+            except sqlite3.Error as exc:
+                logger.warning("读连接不可用，将重建: %s", exc)
+                self._discard(conn)
+                with self._reader_lock:
+                    self._reader_count -= 1
+                healthy = False
+        for conn in checked:
+            self._idle_readers.put(conn)
+        return healthy
+
+    @staticmethod
+    def _discard(conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        """关闭所有连接；借出中的读连接在归还时关闭。"""
+        with self._writer_lock:
+            self._closed = True
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
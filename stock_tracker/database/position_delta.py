@@ -0,0 +1,55 @@
+"""增量持仓编码：关键帧 + 变更事件的差分与重建。"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+POSITION_KEYS = ("account_id", "symbol")
+POSITION_EVENT_COLUMNS = ("account_id", "symbol", "quantity", "avg_cost")
+# 空快照构造出的 DataFrame 数值列为 object，差分前统一转换为 float64
+POSITION_VALUE_DTYPES = {"quantity": np.float64, "avg_cost": np.float64}
+
+
+def position_changes(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """比较前后两日的完整持仓，返回带 change_type（O / M / C）的变更行。"""
+    merged = previous.merge(current, on=list(POSITION_KEYS), how="outer", suffixes=("_old", ""), indicator=True)
+    opened = merged["_merge"] == "right_only"
+    closed = merged["_merge"] == "left_only"
+    both = merged["_merge"] == "both"
+    modified = both & ~(
+        np.isclose(merged["quantity_old"], merged["quantity"], equal_nan=True)
+        & np.isclose(merged["avg_cost_old"], merged["avg_cost"], equal_nan=True)
+    )
+
+    merged["change_type"] = np.select([opened, closed, modified], ["O", "C", "M"], default="")
+    merged.loc[closed, ["quantity", "avg_cost"]] = np.nan
+    return merged.loc[merged["change_type"] != "", [*POSITION_EVENT_COLUMNS, "change_type"]]
+
+
+def reconstruct_positions(conn: sqlite3.Connection, snapshot_date: str, inclusive: bool = True) -> pd.DataFrame:
+    """取不晚于 snapshot_date 的最近关键帧，顺序回放其后的变更，得到当日完整持仓。
+
+    inclusive=False 时重建 snapshot_date 之前（不含当日）的最新状态。
+    """
+    operator = "<=" if inclusive else "<"
+    keyframe = conn.execute(
+        f"SELECT MAX(snapshot_date) FROM position_keyframes WHERE snapshot_date {operator} ?",
+        (snapshot_date,),
+    ).fetchone()[0]
+    if keyframe is None:
+        return pd.DataFrame(columns=list(POSITION_EVENT_COLUMNS)).astype(POSITION_VALUE_DTYPES)
+
+    rows = conn.execute(
+        f"""
+        SELECT account_id, symbol, quantity, avg_cost, change_type
+        FROM position_events
+        WHERE snapshot_date >= ? AND snapshot_date {operator} ?
+        ORDER BY snapshot_date
+        """,
+        (keyframe, snapshot_date),
+    ).fetchall()
+    events = pd.DataFrame(rows, columns=[*POSITION_EVENT_COLUMNS, "change_type"]).astype(POSITION_VALUE_DTYPES)
+    latest = events.drop_duplicates(list(POSITION_KEYS), keep="last")
+    latest = latest[latest["change_type"] != "C"]
+    return latest[list(POSITION_EVENT_COLUMNS)].sort_values(list(POSITION_KEYS), ignore_index=True)
@@ -0,0 +1,132 @@
+"""按标的、日期区间与列投影读取 price_bars，产出紧凑类型的长表或宽矩阵。"""
+
+import sqlite3
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from stock_tracker.database.columnar import int_dates_to_datetime64
+from stock_tracker.utils.helpers import date_to_int
+
+PRICE_VALUE_COLUMNS = ("open", "high", "low", "close", "volume", "adjusted_close")
+
+# 单条语句中 IN 列表的标的 id 上限，避免超出 SQLite 参数个数限制
+_SYMBOL_BATCH = 500
+
+
+def validate_price_columns(columns: Sequence[str] | None) -> list[str]:
+    """校验并返回投影列，默认全部价格列。"""
+    selected = list(columns or PRICE_VALUE_COLUMNS)
+    unknown = set(selected) - set(PRICE_VALUE_COLUMNS)
+    if unknown:
+        raise ValueError(f"未知价格列: {sorted(unknown)}")
+    return selected
+
+
+def read_price_bars(
+    conn: sqlite3.Connection,
+    symbols: Sequence[str] | None,
+    start: str | None,
+    end: str | None,
+    columns: Sequence[str],
+    chunk_size: int = 100_000,
+) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """读取指定标的与区间的价格，返回 (标的列表, 标的编码, YYYYMMDD 日期, 数值矩阵)。
+
+    查询按 (symbol_id, trade_date) 主键做范围扫描，只取投影列；游标按 chunk_size 分批取回，
+    每批直接转为 float64 数组。标的编码是返回的标的列表中的位置，结果按 (标的, 日期) 排序。
+    """
+    if symbols is None:
+        id_rows = conn.execute("SELECT symbol_id, symbol FROM symbols ORDER BY symbol").fetchall()
+        names = [symbol for _, symbol in id_rows]
+        id_batches: list[list[int] | None] = [None]
+    else:
+        names = list(dict.fromkeys(symbols))
+        id_rows = []
+        for i in range(0, len(names), _SYMBOL_BATCH):
+            batch = names[i : i + _SYMBOL_BATCH]
+            id_rows += conn.execute(
+                f"SELECT symbol_id, symbol FROM symbols WHERE symbol IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+        ids = sorted(symbol_id for symbol_id, _ in id_rows)
+        id_batches = [ids[i : i + _SYMBOL_BATCH] for i in range(0, len(ids), _SYMBOL_BATCH)]
+
+    position = {symbol: i for i, symbol in enumerate(names)}
+    lookup = np.full(max((symbol_id for symbol_id, _ in id_rows), default=0) + 1, -1, dtype=np.int32)
+    for symbol_id, symbol in id_rows:
+        lookup[symbol_id] = position[symbol]
+
+    range_conditions: list[str] = []
+    range_params: list[int] = []
+    if start:
+        range_conditions.append("trade_date >= ?")
+        range_params.append(date_to_int(start))
+    if end:
+        range_conditions.append("trade_date <= ?")
+        range_params.append(date_to_int(end))
+
+    chunks: list[np.ndarray] = []
+    for batch_ids in id_batches:
+        conditions = list(range_conditions)
+        params: list[int] = []
+        if batch_ids is not None:
+            conditions.insert(0, f"symbol_id IN ({','.join('?' * len(batch_ids))})")
+            params += batch_ids
+        params += range_params
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = conn.execute(
+            f"SELECT symbol_id, trade_date, {', '.join(columns)} FROM price_bars {where} "
+            "ORDER BY symbol_id, trade_date",
+            params,
+        )
+        while rows := cursor.fetchmany(chunk_size):
+            chunks.append(np.array(rows, dtype=np.float64))
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(columns) + 2))
+    codes = lookup[data[:, 0].astype(np.int64)]
+    dates = data[:, 1].astype(np.int64)
+    order = np.lexsort((dates, codes))
+    return names, codes[order], dates[order], data[order, 2:]
+
+
+def to_long_frame(
+    names: list[str],
+    codes: np.ndarray,
+    dates: np.ndarray,
+    values: np.ndarray,
+    columns: Sequence[str],
+    float32: bool = False,
+) -> pd.DataFrame:
+    """组装长表：symbol 为 category，trade_date 为 datetime64，价格列可选 float32。"""
+    frame = {
+        "symbol": pd.Categorical.from_codes(codes, categories=names),
+        "trade_date": int_dates_to_datetime64(dates),
+    }
+    price_dtype = np.float32 if float32 else np.float64
+    for i, name in enumerate(columns):
+        column = values[:, i]
+        if name == "volume":
+            frame[name] = column if np.isnan(column).any() else column.astype(np.int64)
+        else:
+            frame[name] = column.astype(price_dtype)
+    return pd.DataFrame(frame)
+
+
+def to_wide_frame(
+    names: list[str],
+    codes: np.ndarray,
+    dates: np.ndarray,
+    values: np.ndarray,
+    float32: bool = False,
+) -> pd.DataFrame:
+    """组装宽矩阵：行为交易日、列为标的，底层是单个二维 NumPy 数组，缺失值为 NaN。"""
+    unique_dates, rows = np.unique(dates, return_inverse=True)
+    matrix = np.full((len(unique_dates), len(names)), np.nan, dtype=np.float32 if float32 else np.float64)
+    matrix[rows, codes] = values[:, 0]
+    return pd.DataFrame(
+        matrix,
+        index=pd.DatetimeIndex(int_dates_to_datetime64(unique_dates), name="trade_date"),
+        columns=pd.Index(names, name="symbol"),
+        copy=False,
+    )
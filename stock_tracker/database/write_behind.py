@@ -0,0 +1,130 @@
+"""写后台（write-behind）队列：专用写线程合并提交，让抓取与写盘并行。"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+from stock_tracker.utils.instrumentation import get_recorder
+
+if TYPE_CHECKING:
+    from stock_tracker.database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+WriteHandler = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """有界写队列 + 单写线程的组提交。
+
+    submit 在队列满时阻塞调用方（背压）；写线程取到第一项后，在 max_delay 秒内
+    继续收集最多 max_batch 项，合并在同一个事务中提交。单项写入失败只回滚该项，
+    异常保存下来由下一次 submit / flush / close 抛出。
+    """
+
+    def __init__(
+        self,
+        db_manager: "DatabaseManager",
+        max_queue: int = 1000,
+        max_batch: int = 500,
+        max_delay: float = 0.2,
+    ) -> None:
+        self.db_manager = db_manager
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.commits = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue)
+        self._error: BaseException | None = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, handler: WriteHandler, changes: dict[str, dict[str, str]] | None = None) -> None:
+        """提交写操作；入队后调用方不应再修改其引用的数据。"""
+        if self._closed:
+            raise RuntimeError("写后台队列已关闭")
+        self._raise_pending_error()
+        self._queue.put((handler, changes))
+
+    def flush(self) -> None:
+        """阻塞直到已提交的写操作全部提交到数据库。"""
+        self._queue.join()
+        self._raise_pending_error()
+
+    def close(self) -> None:
+        """落盘剩余写操作并停止写线程。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_pending_error()
+
+    def _raise_pending_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("写后台提交失败") from error
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _commit(self, batch: list[tuple[WriteHandler, dict[str, dict[str, str]] | None]]) -> None:
+        """在一个事务中依次执行整组写操作；每项包在 SAVEPOINT 中，失败的项单独回滚，其余照常提交。"""
+        started = time.perf_counter()
+        failed: set[int] = set()
+        try:
+            with self.db_manager.get_connection() as conn:
+                # 显式开启外层事务，否则释放第一个 SAVEPOINT 时就会提交
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                for index, (handler, _) in enumerate(batch):
+                    conn.execute("SAVEPOINT write_item")
+                    try:
+                        handler(conn)
+                    except Exception as exc:
+                        conn.execute("ROLLBACK TO write_item")
+                        failed.add(index)
+                        logger.exception("写后台第 %s/%s 项失败，已单独回滚: %s", index + 1, len(batch), exc)
+                        self._error = exc
+                    conn.execute("RELEASE write_item")
+            self.commits += 1
+            recorder = get_recorder()
+            recorder.observe("db_commit_seconds", time.perf_counter() - started, mode="write_behind")
+            recorder.incr("db_write_behind_items", len(batch) - len(failed))
+        except BaseException as exc:
+            logger.exception("写后台提交 %s 项失败: %s", len(batch), exc)
+            self._error = exc
+            return
+        for index, (_, changes) in enumerate(batch):
+            if index not in failed:
+                self.db_manager._on_committed(changes)
@@ -1,11 +1,13 @@
 """CSV 导出模块，支持分块和 SQL 直出。"""
 
+import csv
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
 
 from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.utils.instrumentation import get_recorder
 
 
 class CSVExporter:
@@ -14,6 +16,8 @@ class CSVExporter:
     def __init__(self, output_path: str) -> None:
         self.output_path = Path(output_path)
         self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows_written = 0
+        self.bytes_written = 0
 
     def export_dataframe(self, df: pd.DataFrame, chunk_size: int = 50000) -> Path:
         """导出 DataFrame 到 CSV（utf-8-sig）。"""
@@ -30,6 +34,8 @@ class CSVExporter:
             first = False
         if len(df) == 0:
             df.to_csv(self.output_path, index=False, encoding="utf-8-sig")
+        self.rows_written = len(df)
+        self.bytes_written = self.output_path.stat().st_size
         return self.output_path
 
     def export_from_query(
@@ -39,16 +45,28 @@ class CSVExporter:
         params: tuple[Any, ...] | None = None,
         chunk_size: int = 50000,
     ) -> Path:
-        """从 SQL 查询直接分块导出 CSV。"""
-        with db_manager.get_connection() as conn:
-            first = True
-            for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunk_size):
-                chunk.to_csv(
-                    self.output_path,
-                    mode="w" if first else "a",
-                    index=False,
-                    header=first,
-                    encoding="utf-8-sig",
-                )
-                first = False
+        """从 SQL 查询流式导出 CSV。
+
+        游标每次只取 chunk_size 行并立即写出，峰值内存与表大小无关；
+        导出完成后 rows_written / bytes_written 记录写出的行数和字节数。
+        """
+        rows_written = 0
+        with get_recorder().stage("export_csv") as stage:
+            with db_manager.get_read_connection() as conn:
+                cursor = conn.execute(query, params or ())
+                with self.output_path.open("w", newline="", encoding="utf-8-sig") as handle:
+                    writer = csv.writer(handle)
+                    writer.writerow([column[0] for column in cursor.description])
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        writer.writerows(rows)
+                        rows_written += len(rows)
+                cursor.close()
+
+            self.rows_written = rows_written
+            self.bytes_written = self.output_path.stat().st_size
+            stage["rows"] = rows_written
+            stage["bytes"] = self.bytes_written
         return self.output_path
@@ -1,8 +1,43 @@
 """Excel 导出模块，支持大数据分块写入。"""
 
+import re
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
 import pandas as pd
+import xlsxwriter
+
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.utils.instrumentation import get_recorder
+
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1_048_576
+
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def _sheet_name(base: str, index: int) -> str:
+    """生成合法工作表名：去掉非法字符，续表追加 _2、_3 后缀，长度不超过 31。"""
+    base = _INVALID_SHEET_CHARS.sub("_", base) or "sheet"
+    suffix = "" if index == 1 else f"_{index}"
+    return base[: 31 - len(suffix)] + suffix
+
+
+def _unique_sheet_name(name: str, used: set[str]) -> str:
+    """在同一工作簿内去重（Excel 工作表名不区分大小写）：重名时追加 (2)、(3) 后缀，并登记到 used。"""
+    candidate, n = name, 1
+    while candidate.lower() in used:
+        n += 1
+        tag = f"({n})"
+        candidate = name[: 31 - len(tag)] + tag
+    used.add(candidate.lower())
+    return candidate
+
+
+def _frame_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[list[list[Any]]]:
+    """按块产出原生 Python 类型的行。"""
+    for i in range(0, len(df), chunk_size):
+        yield df.iloc[i : i + chunk_size].to_dict(orient="split", index=False)["data"]
 
 
 class ExcelExporter:
@@ -11,6 +46,7 @@ class ExcelExporter:
     def __init__(self, output_path: str) -> None:
         self.output_path = Path(output_path)
         self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows_written = 0
 
     def export_positions(self, df: pd.DataFrame, sheet_name: str = "持仓") -> Path:
         """导出持仓到 Excel。"""
@@ -18,18 +54,138 @@ class ExcelExporter:
             df.to_excel(writer, sheet_name=sheet_name, index=False)
         return self.output_path
 
-    def export_prices(self, df: pd.DataFrame, chunk_size: int = 10000) -> Path:
-        """导出股价到 Excel（分块处理）。"""
-        with pd.ExcelWriter(self.output_path, engine="openpyxl") as writer:
-            start_row = 0
-            for i in range(0, len(df), chunk_size):
-                chunk = df.iloc[i : i + chunk_size]
-                chunk.to_excel(
-                    writer,
-                    sheet_name="prices",
-                    index=False,
-                    startrow=start_row,
-                    header=(start_row == 0),
-                )
-                start_row += len(chunk)
+    def export_prices(self, df: pd.DataFrame, chunk_size: int = 10000, split_by: str | None = None) -> Path:
+        """导出股价到 Excel（constant_memory 流式写入，超出单表行数自动续表）。"""
+        return self.export_frame(df, "prices", chunk_size, split_by)
+
+    def export_frame(
+        self,
+        df: pd.DataFrame,
+        sheet_prefix: str,
+        chunk_size: int = 10000,
+        split_by: str | None = None,
+    ) -> Path:
+        """以流式方式把 DataFrame 导出到以 sheet_prefix 命名的工作表。"""
+        self.write_stream(list(df.columns), _frame_chunks(df, chunk_size), sheet_prefix=sheet_prefix, split_by=split_by)
         return self.output_path
+
+    def export_from_query(
+        self,
+        db_manager: DatabaseManager,
+        query: str,
+        params: tuple[Any, ...] | None = None,
+        sheet_prefix: str = "prices",
+        split_by: str | None = None,
+        workbook_per_partition: bool = False,
+        chunk_size: int = 50000,
+    ) -> list[Path]:
+        """从 SQL 查询流式导出 Excel，返回写出的文件列表。
+
+        split_by 为 "symbol" 或 "year" 时按分区分表（或每个分区一个工作簿），
+        此时查询结果必须按该分区排序，例如 ORDER BY symbol, trade_date。
+        """
+        with get_recorder().stage("export_excel") as stage, db_manager.get_read_connection() as conn:
+            cursor = conn.execute(query, params or ())
+            columns = [column[0] for column in cursor.description]
+
+            def chunks() -> Iterator[list[Any]]:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    yield rows
+
+            try:
+                paths = self.write_stream(columns, chunks(), sheet_prefix, split_by, workbook_per_partition)
+            finally:
+                cursor.close()
+            stage["rows"] = self.rows_written
+            stage["bytes"] = sum(path.stat().st_size for path in paths)
+            return paths
+
+    def write_stream(
+        self,
+        columns: Sequence[str],
+        chunks: Iterable[Sequence[Sequence[Any]]],
+        sheet_prefix: str = "prices",
+        split_by: str | None = None,
+        workbook_per_partition: bool = False,
+        max_rows: int = EXCEL_MAX_ROWS,
+    ) -> list[Path]:
+        """把行块按顺序写入 constant_memory 工作簿，内存占用只与单块大小有关。"""
+        partition_of = self._partitioner(columns, split_by)
+        if workbook_per_partition and partition_of is None:
+            raise ValueError("workbook_per_partition 需要同时指定 split_by")
+
+        paths: list[Path] = []
+        seen: set[str | None] = set()
+        sheet_names: set[str] = set()
+        workbook: Any = None
+        worksheet: Any = None
+        partition: str | None = None
+        sheet_index = 0
+        row_index = max_rows
+        self.rows_written = 0
+
+        def open_workbook(path: Path) -> Any:
+            paths.append(path)
+            sheet_names.clear()
+            return xlsxwriter.Workbook(
+                str(path),
+                {
+                    "constant_memory": True,
+                    "default_date_format": "yyyy-mm-dd",
+                    "nan_inf_to_errors": True,
+                },
+            )
+
+        try:
+            if not workbook_per_partition:
+                workbook = open_workbook(self.output_path)
+
+            for chunk in chunks:
+                for row in chunk:
+                    key = partition_of(row) if partition_of else None
+                    if key != partition:
+                        if key in seen:
+                            raise ValueError(f"数据未按分区 {split_by} 排序，分区 {key} 重复出现")
+                        seen.add(key)
+                        partition = key
+                        sheet_index = 0
+                        row_index = max_rows
+                        if workbook_per_partition:
+                            if workbook is not None:
+                                workbook.close()
+                            path = self.output_path.with_name(f"{self.output_path.stem}_{key}{self.output_path.suffix}")
+                            workbook = open_workbook(path)
+                    if row_index >= max_rows:
+                        sheet_index += 1
+                        base = key if key is not None and not workbook_per_partition else sheet_prefix
+                        name = _unique_sheet_name(_sheet_name(base, sheet_index), sheet_names)
+                        worksheet = workbook.add_worksheet(name)
+                        worksheet.write_row(0, 0, columns)
+                        row_index = 1
+                    worksheet.write_row(row_index, 0, row)
+                    row_index += 1
+                    self.rows_written += 1
+
+            if workbook is None:
+                workbook = open_workbook(self.output_path)
+            if worksheet is None:
+                workbook.add_worksheet(_sheet_name(sheet_prefix, 1)).write_row(0, 0, columns)
+        finally:
+            if workbook is not None:
+                workbook.close()
+        return paths
+
+    @staticmethod
+    def _partitioner(columns: Sequence[str], split_by: str | None) -> Callable[[Sequence[Any]], str] | None:
+        if split_by is None:
+            return None
+        if split_by == "symbol":
+            position = list(columns).index("symbol")
+            return lambda row: str(row[position])
+        if split_by == "year":
+            position = list(columns).index("trade_date")
+            return lambda row: str(row[position])[:4]
+        raise ValueError(f"不支持的分区方式: {split_by}")
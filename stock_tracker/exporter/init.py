@@ -2,5 +2,6 @@
 
 from stock_tracker.exporter.csv_exporter import CSVExporter
 from stock_tracker.exporter.excel_exporter import ExcelExporter
+from stock_tracker.exporter.parquet_exporter import ParquetExporter
 
-__all__ = ["ExcelExporter", "CSVExporter"]
+__all__ = ["ExcelExporter", "CSVExporter", "ParquetExporter"]
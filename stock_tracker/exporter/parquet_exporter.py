@@ -0,0 +1,197 @@
+"""Parquet 导出模块，按 symbol / year 分区增量写出数据集。"""
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.database.migrations import PRICE_ROWS_SQL
+from stock_tracker.database.models import PARQUET_TABLES
+from stock_tracker.database.price_query import read_price_bars
+from stock_tracker.utils.helpers import int_to_date_str
+from stock_tracker.utils.instrumentation import get_recorder
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+
+# 计算价格分区指纹时每批读取的标的数
+_SIGNATURE_SYMBOL_BATCH = 200
+
+
+class ParquetExporter:
+    """Parquet 数据集导出器。
+
+    目录结构为 <output_dir>/<table>/symbol=<SYMBOL>/year=<YYYY>/part-0.parquet（hive 分区）。
+    每个分区的行数、日期范围和数值列合计记录在 _manifest.json 中，再次导出时只重写发生变化的分区。
+    """
+
+    def __init__(self, output_dir: str, compression: str = "zstd") -> None:
+        if pa is None:
+            raise RuntimeError("pyarrow 未安装，无法导出 Parquet。")
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+
+    def export_prices(self, db_manager: DatabaseManager) -> dict[str, int]:
+        """增量导出股价数据集。"""
+        return self.export_table(db_manager, "prices")
+
+    def export_positions(self, db_manager: DatabaseManager) -> dict[str, int]:
+        """增量导出持仓数据集。"""
+        return self.export_table(db_manager, "positions")
+
+    def export_table(self, db_manager: DatabaseManager, table: str) -> dict[str, int]:
+        """增量导出指定表，返回写出与跳过的分区数、写出行数和字节数。"""
+        with get_recorder().stage(f"export_parquet_{table}") as stage:
+            stats = self._export_table(db_manager, table)
+            stage["rows"] = stats["rows"]
+            stage["bytes"] = stats["bytes"]
+        return stats
+
+    def _export_table(self, db_manager: DatabaseManager, table: str) -> dict[str, int]:
+        spec = PARQUET_TABLES[table]
+        date_column = spec["date_column"]
+        table_dir = self.output_dir / table
+        table_dir.mkdir(parents=True, exist_ok=True)
+
+        if table == "prices":
+            current = self._price_signatures(db_manager, spec["value_columns"])
+        else:
+            current = self._partition_signatures(db_manager, table, date_column, spec["value_columns"])
+        previous = self._load_manifest(table_dir)
+
+        stats = {"partitions_written": 0, "partitions_skipped": 0, "partitions_removed": 0, "rows": 0, "bytes": 0}
+        for key in previous.keys() - current.keys():
+            symbol, year = key.split("|")
+            shutil.rmtree(self._partition_dir(table_dir, symbol, year), ignore_errors=True)
+            stats["partitions_removed"] += 1
+
+        for key, signature in current.items():
+            if previous.get(key) == signature:
+                stats["partitions_skipped"] += 1
+                continue
+            symbol, year = key.split("|")
+            frame = self._read_partition(db_manager, table, date_column, symbol, year)
+            stats["bytes"] += self._write_partition(table_dir, symbol, year, frame, date_column)
+            stats["partitions_written"] += 1
+            stats["rows"] += len(frame)
+
+        self._save_manifest(table_dir, current)
+        logger.info("Parquet 导出 %s: %s", table, stats)
+        return stats
+
+    @staticmethod
+    def _partition_signatures(
+        db_manager: DatabaseManager,
+        table: str,
+        date_column: str,
+        value_columns: list[str],
+    ) -> dict[str, list[Any]]:
+        """一次分组查询得到每个 (symbol, year) 分区的指纹。"""
+        totals = ", ".join(f"TOTAL({column})" for column in value_columns)
+        query = (
+            f"SELECT symbol, substr({date_column}, 1, 4) AS year, COUNT(*), "
+            f"MIN({date_column}), MAX({date_column}), {totals} "
+            f"FROM {table} GROUP BY symbol, year"
+        )
+        with db_manager.get_read_connection() as conn:
+            rows = conn.execute(query).fetchall()
+        return {f"{row[0]}|{row[1]}": [str(value) for value in row[2:]] for row in rows}
+
+    @staticmethod
+    def _price_signatures(db_manager: DatabaseManager, value_columns: list[str]) -> dict[str, list[Any]]:
+        """按主键顺序分批读取 price_bars，向量化求出每个 (symbol, year) 分区的指纹。
+
+        prices 视图的日期是文本计算列，按年份分组需要对全表排序；price_bars 按 (symbol_id, trade_date)
+        聚簇，同一分区的行天然相邻，按 YYYYMMDD // 10000 切段即可。指纹格式与其他表的 SQL 分组一致。
+        """
+        signatures: dict[str, list[Any]] = {}
+        with db_manager.get_read_connection() as conn:
+            symbols = [row[0] for row in conn.execute("SELECT symbol FROM symbols ORDER BY symbol").fetchall()]
+            for i in range(0, len(symbols), _SIGNATURE_SYMBOL_BATCH):
+                batch = symbols[i : i + _SIGNATURE_SYMBOL_BATCH]
+                names, codes, dates, values = read_price_bars(conn, batch, None, None, value_columns)
+                if not len(dates):
+                    continue
+                keys = codes.astype(np.int64) * 10000 + dates // 10000
+                starts = np.flatnonzero(np.diff(keys, prepend=-1))
+                ends = np.append(starts[1:], len(keys))
+                # 与 SQLite TOTAL() 一致：NULL 不计入合计
+                totals = np.add.reduceat(np.nan_to_num(values), starts, axis=0)
+                for start, end, total in zip(starts.tolist(), ends.tolist(), totals.tolist()):
+                    key = f"{names[codes[start]]}|{dates[start] // 10000}"
+                    signatures[key] = [
+                        str(end - start),
+                        int_to_date_str(dates[start]),
+                        int_to_date_str(dates[end - 1]),
+                        *(str(float(value)) for value in total),
+                    ]
+        return signatures
+
+    @staticmethod
+    def _read_partition(
+        db_manager: DatabaseManager,
+        table: str,
+        date_column: str,
+        symbol: str,
+        year: str,
+    ) -> pd.DataFrame:
+        """读取单个分区的行；价格按 price_bars 主键做范围扫描，不经 prices 视图的文本日期。"""
+        if table == "prices":
+            return db_manager.query_dataframe(
+                f"{PRICE_ROWS_SQL} WHERE s.symbol = ? AND b.trade_date BETWEEN ? AND ? ORDER BY b.trade_date",
+                (symbol, int(year) * 10000, int(year) * 10000 + 9999),
+            )
+        return db_manager.query_dataframe(
+            f"SELECT * FROM {table} WHERE symbol = ? AND {date_column} >= ? AND {date_column} < ? "
+            f"ORDER BY {date_column}",
+            (symbol, f"{year}-01-01", f"{int(year) + 1}-01-01"),
+        )
+
+    @staticmethod
+    def _partition_dir(table_dir: Path, symbol: str, year: str) -> Path:
+        return table_dir / f"symbol={symbol}" / f"year={year}"
+
+    def _write_partition(self, table_dir: Path, symbol: str, year: str, frame: pd.DataFrame, date_column: str) -> int:
+        """写出单个分区文件（先写临时文件再替换），分区列不重复存储。"""
+        frame = frame.drop(columns=["symbol"])
+        frame[date_column] = pd.to_datetime(frame[date_column]).dt.date
+        partition_dir = self._partition_dir(table_dir, symbol, year)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        target = partition_dir / "part-0.parquet"
+        tmp_path = partition_dir / "part-0.parquet.tmp"
+        pq.write_table(
+            pa.Table.from_pandas(frame, preserve_index=False),
+            tmp_path,
+            compression=self.compression,
+        )
+        os.replace(tmp_path, target)
+        return target.stat().st_size
+
+    @staticmethod
+    def _load_manifest(table_dir: Path) -> dict[str, list[Any]]:
+        manifest = table_dir / MANIFEST_NAME
+        if not manifest.exists():
+            return {}
+        return json.loads(manifest.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def _save_manifest(table_dir: Path, signatures: dict[str, list[Any]]) -> None:
+        manifest = table_dir / MANIFEST_NAME
+        tmp_path = manifest.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(signatures, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, manifest)
@@ -0,0 +1,204 @@
+"""合约注册表：把 IB 合约解析结果（conId、主交易所、币种、交易时段）持久化在 symbols_config 中。"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Iterable, Sequence
+
+from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.utils.instrumentation import get_recorder
+
+if TYPE_CHECKING:
+    from stock_tracker.database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_COLUMNS = (
+    "symbol",
+    "exchange",
+    "currency",
+    "is_active",
+    "con_id",
+    "primary_exchange",
+    "trading_hours",
+    "time_zone",
+    "qualified_at",
+)
+
+# 与 SQLite CURRENT_TIMESTAMP 相同的 UTC 文本格式；读出的 datetime 经 str() 后也是该格式，可按字符串比较新旧
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ContractRegistry:
+    """symbols_config 支撑的合约缓存。
+
+    已解析的标的直接用缓存的 conId 与主交易所构造合约，请求时 IB 无需再次匹配；
+    ensure() 为尚未解析的标的并发请求合约详情并一次写回，refresh() 重新解析超过 max_age_days 的条目。
+    不在 symbols_config 中的标的解析后以 is_active = 0 登记，不会进入定时任务。
+    """
+
+    def __init__(self, db_manager: "DatabaseManager", client: IBClient, max_concurrency: int = 8) -> None:
+        self.db_manager = db_manager
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._entries: dict[str, dict[str, Any]] | None = None
+        self._contracts: dict[str, Any] = {}
+        # 本进程内解析失败的标的不再重复请求，直到下一次 refresh()
+        self._failed: set[str] = set()
+
+    def _load(self, reload: bool = False) -> dict[str, dict[str, Any]]:
+        if self._entries is None or reload:
+            with self.db_manager.get_read_connection() as conn:
+                rows = conn.execute(
+                    f"SELECT {', '.join(REGISTRY_COLUMNS)} FROM symbols_config ORDER BY symbol"
+                ).fetchall()
+            self._entries = {row[0]: dict(zip(REGISTRY_COLUMNS, row)) for row in rows}
+        return self._entries
+
+    def get(self, symbol: str) -> dict[str, Any] | None:
+        """返回已解析标的的注册信息，未解析时为 None。"""
+        entry = self._load().get(symbol)
+        return entry if entry and entry["con_id"] else None
+
+    def _request_contract(self, symbol: str) -> Any:
+        """按 symbols_config 中配置的币种与交易所构造待解析合约，未配置时为美股 SMART 路由。"""
+        from ib_insync import Stock
+
+        entry = self._load().get(symbol) or {}
+        exchange = entry.get("exchange") or ""
+        return Stock(
+            symbol,
+            "SMART",
+            entry.get("currency") or "USD",
+            primaryExchange="" if exchange.upper() == "SMART" else exchange,
+        )
+
+    def make_contract(self, symbol: str) -> Any:
+        """构造请求用合约：已解析的标的带 conId 与主交易所，并在内存中复用同一对象。"""
+        contract = self._contracts.get(symbol)
+        if contract is not None:
+            return contract
+        entry = self.get(symbol)
+        if entry is None:
+            return self._request_contract(symbol)
+        from ib_insync import Stock
+
+        contract = Stock(
+            symbol,
+            "SMART",
+            entry["currency"],
+            conId=entry["con_id"],
+            primaryExchange=entry["primary_exchange"] or "",
+        )
+        self._contracts[symbol] = contract
+        return contract
+
+    def _pick(self, symbol: str, details: Sequence[Any]) -> Any | None:
+        """从合约详情中选出与配置匹配的一条：先按币种，再按主交易所，仍有多条时取第一条并告警。"""
+        entry = self._load().get(symbol) or {}
+        candidates = list(details)
+        for field, wanted in (("currency", entry.get("currency")), ("primaryExchange", entry.get("exchange"))):
+            matched = [detail for detail in candidates if wanted and getattr(detail.contract, field, None) == wanted]
+            if matched:
+                candidates = matched
+        if len(candidates) > 1:
+            logger.warning("%s 匹配到 %s 个合约，使用 conId %s", symbol, len(candidates), candidates[0].contract.conId)
+        return candidates[0] if candidates else None
+
+    async def qualify(self, symbols: Iterable[str]) -> int:
+        """并发请求合约详情并批量写回 symbols_config，返回解析成功的标的数。"""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return 0
+        if any(symbol not in self._load() for symbol in symbols):
+            self._load(reload=True)
+        ib = self.client.ib
+        if ib is None:
+            logger.error("IB 未连接，跳过 %s 个标的的合约解析", len(symbols))
+            return 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        qualified_at = _utc_now().strftime(_TIMESTAMP_FORMAT)
+
+        async def qualify_one(symbol: str) -> dict[str, Any] | None:
+            async with semaphore:
+                try:
+                    details = await asyncio.wait_for(ib.reqContractDetailsAsync(self._request_contract(symbol)), 30)
+                except Exception as exc:
+                    logger.error("解析 %s 合约失败: %r", symbol, exc)
+                    return None
+            detail = self._pick(symbol, details)
+            if detail is None:
+                return None
+            contract = detail.contract
+            return {
+                "symbol": symbol,
+                "currency": contract.currency,
+                "con_id": contract.conId,
+                "primary_exchange": contract.primaryExchange or contract.exchange,
+                "trading_hours": detail.tradingHours,
+                "time_zone": detail.timeZoneId,
+                "qualified_at": qualified_at,
+            }
+
+        results = await asyncio.gather(*(qualify_one(symbol) for symbol in symbols))
+        rows = [row for row in results if row is not None]
+        failed = [symbol for symbol, row in zip(symbols, results) if row is None]
+        self._failed.update(failed)
+        if rows:
+            self._save(rows)
+        recorder = get_recorder()
+        recorder.incr("ib_contracts_qualified", len(rows))
+        recorder.incr("ib_contracts_failed", len(failed))
+        if failed:
+            logger.warning("%s 个标的未能解析合约: %s", len(failed), failed[:20])
+        logger.info("解析 %s 个标的合约", len(rows))
+        return len(rows)
+
+    def _save(self, rows: list[dict[str, Any]]) -> None:
+        with self.db_manager.get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO symbols_config (
+                    symbol, currency, is_active, con_id, primary_exchange, trading_hours, time_zone, qualified_at
+                )
+                VALUES (:symbol, :currency, 0, :con_id, :primary_exchange, :trading_hours, :time_zone, :qualified_at)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    currency = excluded.currency,
+                    con_id = excluded.con_id,
+                    primary_exchange = excluded.primary_exchange,
+                    trading_hours = excluded.trading_hours,
+                    time_zone = excluded.time_zone,
+                    qualified_at = excluded.qualified_at
+                """,
+                rows,
+            )
+        self._load(reload=True)
+        for row in rows:
+            self._contracts.pop(row["symbol"], None)
+            self._failed.discard(row["symbol"])
+
+    async def ensure(self, symbols: Iterable[str]) -> int:
+        """解析其中尚未登记 conId 的标的；全部已解析时不发出任何请求。"""
+        pending = [symbol for symbol in dict.fromkeys(symbols) if self.get(symbol) is None]
+        pending = [symbol for symbol in pending if symbol not in self._failed]
+        return await self.qualify(pending) if pending else 0
+
+    def stale_symbols(self, max_age_days: int, now: datetime | None = None) -> list[str]:
+        """返回需要重新解析的标的：启用但未解析的，以及解析时间早于 max_age_days 天前的。"""
+        cutoff = ((now or _utc_now()) - timedelta(days=max_age_days)).strftime(_TIMESTAMP_FORMAT)
+        stale = []
+        for symbol, entry in self._load(reload=True).items():
+            if entry["con_id"] and str(entry["qualified_at"] or "") < cutoff:
+                stale.append(symbol)
+            elif not entry["con_id"] and entry["is_active"]:
+                stale.append(symbol)
+        return stale
+
+    async def refresh(self, max_age_days: int = 30, now: datetime | None = None) -> int:
+        """重新解析过期与未解析的标的，返回解析成功数。"""
+        self._failed.clear()
+        return await self.qualify(self.stale_symbols(max_age_days, now))
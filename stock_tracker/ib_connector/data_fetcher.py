@@ -2,75 +2,365 @@
 
 import asyncio
 import logging
-from datetime import datetime
-from typing import Any
+import math
+import time
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, Sequence, Union
+
+import numpy as np
+import pandas as pd
 
 from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.ib_connector.pacing import PacingLimiter
+from stock_tracker.utils.instrumentation import get_recorder
+
+if TYPE_CHECKING:
+    from stock_tracker.database.db_manager import DatabaseManager
+    from stock_tracker.ib_connector.contracts import ContractRegistry
 
 logger = logging.getLogger(__name__)
 
+HistoricalResult = Union[list[dict[str, Any]], pd.DataFrame]
+
+# 请求区间早于上市日期等无数据情形，IB 以 162 错误而非空列表返回
+_NO_DATA_MESSAGE = "HMDS query returned no data"
+
+
+def is_no_data_error(exc: BaseException) -> bool:
+    """判断异常是否为 IB 的“区间内无历史数据”错误。"""
+    return getattr(exc, "code", None) == 162 and _NO_DATA_MESSAGE in str(exc)
+
+
+def _bar_date(value: Any) -> str:
+    return value.strftime("%Y-%m-%d") if isinstance(value, (date, datetime)) else str(value)
+
+
+def bars_to_rows(symbol: str, bars: Sequence[Any]) -> list[dict[str, Any]]:
+    """把 IB BarData 列表转换为逐行字典。"""
+    return [
+        {
+            "symbol": symbol,
+            "trade_date": _bar_date(bar.date),
+            "open": float(bar.open),
+            "high": float(bar.high),
+            "low": float(bar.low),
+            "close": float(bar.close),
+            "volume": int(bar.volume),
+            "adjusted_close": float(bar.close),
+        }
+        for bar in bars
+    ]
+
+
+def bars_to_frame(symbol: str, bars: Sequence[Any]) -> pd.DataFrame:
+    """把 IB BarData 列表直接转换为带类型的列式 DataFrame，不生成逐行字典。"""
+    count = len(bars)
+    close = np.fromiter((bar.close for bar in bars), dtype=np.float64, count=count)
+    return pd.DataFrame(
+        {
+            "symbol": np.full(count, symbol, dtype=object),
+            "trade_date": np.array([_bar_date(bar.date) for bar in bars], dtype=object),
+            "open": np.fromiter((bar.open for bar in bars), dtype=np.float64, count=count),
+            "high": np.fromiter((bar.high for bar in bars), dtype=np.float64, count=count),
+            "low": np.fromiter((bar.low for bar in bars), dtype=np.float64, count=count),
+            "close": close,
+            "volume": np.fromiter((bar.volume for bar in bars), dtype=np.int64, count=count),
+            "adjusted_close": close.copy(),
+        }
+    )
+
+
+def _bar_epoch(value: Any) -> int:
+    if isinstance(value, datetime):
+        return int((value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp())
+    return int(value)
+
+
+def bars_to_intraday_frame(symbol: str, bars: Sequence[Any]) -> pd.DataFrame:
+    """把分钟级 BarData 列表转换为列式 DataFrame，时间为 UTC epoch 秒。"""
+    count = len(bars)
+    return pd.DataFrame(
+        {
+            "symbol": np.full(count, symbol, dtype=object),
+            "ts": np.fromiter((_bar_epoch(bar.date) for bar in bars), dtype=np.int64, count=count),
+            "open": np.fromiter((bar.open for bar in bars), dtype=np.float64, count=count),
+            "high": np.fromiter((bar.high for bar in bars), dtype=np.float64, count=count),
+            "low": np.fromiter((bar.low for bar in bars), dtype=np.float64, count=count),
+            "close": np.fromiter((bar.close for bar in bars), dtype=np.float64, count=count),
+            "volume": np.fromiter((bar.volume for bar in bars), dtype=np.int64, count=count),
+        }
+    )
+
 
 class IBDataFetcher:
     """负责从 IB 拉取市场数据。"""
 
-    def __init__(self, client: IBClient) -> None:
+    def __init__(
+        self,
+        client: IBClient,
+        pacing: PacingLimiter | None = None,
+        contracts: "ContractRegistry | None" = None,
+    ) -> None:
         self.client = client
+        self.pacing = pacing or PacingLimiter()
+        self.contracts = contracts
 
-    async def get_historical_data(
+    def _make_contract(self, symbol: str) -> Any:
+        """构造合约：有合约注册表时使用缓存的 conId 与主交易所，否则为美股 SMART 路由合约（ib_insync 在此处才导入）。"""
+        if self.contracts is not None:
+            return self.contracts.make_contract(symbol)
+        from ib_insync import Stock
+
+        return Stock(symbol, "SMART", "USD")
+
+    async def _ensure_contracts(self, symbols: Iterable[str]) -> None:
+        """批量解析尚未登记的标的合约；未配置合约注册表时为空操作。"""
+        if self.contracts is not None:
+            await self.contracts.ensure(symbols)
+
+    async def _fetch_bars(
         self,
         symbol: str,
-        duration: str = "10 Y",
-        bar_size: str = "1 day",
-        what_to_show: str = "TRADES",
-    ) -> list[dict[str, Any]]:
-        """获取历史股价，支持自定义时间跨度。"""
-        if not await self.client.ensure_connection() or self.client.ib is None:
-            return []
-
+        duration: str,
+        bar_size: str,
+        what_to_show: str,
+        end: str = "",
+        format_date: int = 1,
+    ) -> list[Any]:
+        """发出单个历史数据请求并返回原始 bar 列表，失败时直接抛出异常。"""
+        ib = self.client.ib
+        if ib is None:
+            raise ConnectionError("IB 未连接，无法请求历史数据")
+        await self._ensure_contracts([symbol])
+        contract = self._make_contract(symbol)
+        recorder = get_recorder()
+        start = time.perf_counter()
         try:
-            contract = self.client.ib.Stock(symbol, "SMART", "USD")
             bars = await asyncio.wait_for(
-                self.client.ib.reqHistoricalDataAsync(
+                ib.reqHistoricalDataAsync(
                     contract,
-                    endDateTime="",
+                    endDateTime=end,
                     durationStr=duration,
                     barSizeSetting=bar_size,
                     whatToShow=what_to_show,
                     useRTH=True,
-                    formatDate=1,
+                    formatDate=format_date,
                 ),
                 timeout=30,
             )
-            payload = [
-                {
-                    "symbol": symbol,
-                    "trade_date": bar.date.strftime("%Y-%m-%d") if isinstance(bar.date, datetime) else str(bar.date),
-                    "open": float(bar.open),
-                    "high": float(bar.high),
-                    "low": float(bar.low),
-                    "close": float(bar.close),
-                    "volume": int(bar.volume),
-                    "adjusted_close": float(bar.close),
-                }
-                for bar in bars
-            ]
-            logger.info("%s 历史数据条数: %s", symbol, len(payload))
-            return payload
+        except Exception as exc:
+            recorder.incr("ib_errors", kind="historical", code=getattr(exc, "code", type(exc).__name__))
+            raise
+        finally:
+            recorder.observe("ib_request_seconds", time.perf_counter() - start, item=symbol, kind="historical")
+        recorder.incr("ib_bars_received", len(bars))
+        return bars
+
+    async def _request_historical(
+        self,
+        symbol: str,
+        duration: str,
+        bar_size: str,
+        what_to_show: str,
+        as_frame: bool = False,
+        end: str = "",
+    ) -> HistoricalResult:
+        """发出单个日线历史数据请求，失败时直接抛出异常；end 为 IB endDateTime，空表示截至当前。"""
+        bars = await self._fetch_bars(symbol, duration, bar_size, what_to_show, end)
+        payload = bars_to_frame(symbol, bars) if as_frame else bars_to_rows(symbol, bars)
+        logger.info("%s 历史数据条数: %s", symbol, len(payload))
+        return payload
+
+    async def get_historical_data(
+        self,
+        symbol: str,
+        duration: str = "10 Y",
+        bar_size: str = "1 day",
+        what_to_show: str = "TRADES",
+    ) -> list[dict[str, Any]]:
+        """获取历史股价，支持自定义时间跨度。"""
+        if not await self.client.ensure_connection() or self.client.ib is None:
+            return []
+
+        try:
+            await self.pacing.acquire((symbol, duration, bar_size, what_to_show))
+            return await self._request_historical(symbol, duration, bar_size, what_to_show)
         except Exception as exc:  # pragma: no cover
             logger.exception("获取 %s 历史数据失败: %s", symbol, exc)
             return []
 
-    async def get_current_price(self, symbol: str) -> float | None:
-        """获取标的当前价格。"""
+    async def get_historical_frame(
+        self,
+        symbol: str,
+        duration: str = "10 Y",
+        bar_size: str = "1 day",
+        what_to_show: str = "TRADES",
+    ) -> pd.DataFrame:
+        """获取历史股价的列式结果（带类型的 DataFrame），可直接传给 save_prices。"""
         if not await self.client.ensure_connection() or self.client.ib is None:
-            return None
+            return bars_to_frame(symbol, [])
 
         try:
-            contract = self.client.ib.Stock(symbol, "SMART", "USD")
-            ticker = self.client.ib.reqMktData(contract, "", False, False)
-            await asyncio.sleep(2)
-            price = ticker.marketPrice()
-            return float(price) if price is not None else None
+            await self.pacing.acquire((symbol, duration, bar_size, what_to_show))
+            return await self._request_historical(symbol, duration, bar_size, what_to_show, as_frame=True)
         except Exception as exc:  # pragma: no cover
-            logger.exception("获取 %s 实时价格失败: %s", symbol, exc)
-            return None
+            logger.exception("获取 %s 历史数据失败: %s", symbol, exc)
+            return bars_to_frame(symbol, [])
+
+    async def get_historical_chunk(
+        self,
+        symbol: str,
+        end: date,
+        duration: str,
+        bar_size: str = "1 day",
+        what_to_show: str = "TRADES",
+    ) -> pd.DataFrame:
+        """获取截至 end 当日收盘、跨度为 duration 的一段历史数据（列式），失败时抛出异常供调用方保留断点。
+
+        区间内无数据的 162 错误视为空结果返回。
+        """
+        end_text = end.strftime("%Y%m%d 23:59:59")
+        await self.pacing.acquire((symbol, duration, end_text, bar_size, what_to_show))
+        try:
+            return await self._request_historical(
+                symbol, duration, bar_size, what_to_show, as_frame=True, end=end_text
+            )
+        except Exception as exc:
+            if not is_no_data_error(exc):
+                raise
+            logger.info("%s 截至 %s 无历史数据", symbol, end)
+            return bars_to_frame(symbol, [])
+
+    async def get_intraday_frame(
+        self,
+        symbol: str,
+        bar_size: str = "1 min",
+        duration: str = "1 D",
+        end: str = "",
+        what_to_show: str = "TRADES",
+    ) -> pd.DataFrame:
+        """获取分钟线（列式，ts 为 UTC epoch 秒），可直接传给 IntradayStore.append；失败时抛出异常。"""
+        await self.pacing.acquire((symbol, duration, end, bar_size, what_to_show))
+        # formatDate=2 时 IB 返回 UTC 时间
+        bars = await self._fetch_bars(symbol, duration, bar_size, what_to_show, end, format_date=2)
+        return bars_to_intraday_frame(symbol, bars)
+
+    async def get_historical_data_many(
+        self,
+        symbols: Iterable[str],
+        duration: str = "10 Y",
+        bar_size: str = "1 day",
+        what_to_show: str = "TRADES",
+        max_concurrency: int = 6,
+        durations: dict[str, str] | None = None,
+        db_manager: "DatabaseManager | None" = None,
+        as_frame: bool = False,
+    ) -> AsyncIterator[tuple[str, HistoricalResult]]:
+        """并发获取多个标的历史股价，按完成顺序逐个产出 (symbol, 数据)。
+
+        durations 可为单个标的指定跨度；传入 db_manager 时记录每个请求的耗时与失败原因；
+        as_frame=True 时产出列式 DataFrame，失败的标的产出空结果。
+        """
+        if not await self.client.ensure_connection() or self.client.ib is None:
+            return
+
+        symbols = list(symbols)
+        await self._ensure_contracts(symbols)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        durations = durations or {}
+
+        async def fetch_one(symbol: str) -> tuple[str, HistoricalResult]:
+            span = durations.get(symbol, duration)
+            async with semaphore:
+                await self.pacing.acquire((symbol, span, bar_size, what_to_show))
+                start = time.perf_counter()
+                try:
+                    data = await self._request_historical(symbol, span, bar_size, what_to_show, as_frame)
+                    status, error = "success", None
+                except Exception as exc:
+                    logger.error("获取 %s 历史数据失败: %r", symbol, exc)
+                    data = bars_to_frame(symbol, []) if as_frame else []
+                    status, error = "failed", repr(exc)
+                latency_ms = (time.perf_counter() - start) * 1000
+            if db_manager is not None:
+                db_manager.log_fetch("historical", symbol, status, error, latency_ms=latency_ms)
+            return symbol, data
+
+        tasks = [asyncio.ensure_future(fetch_one(symbol)) for symbol in symbols]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_current_price(self, symbol: str) -> float | None:
+        """获取标的当前价格。"""
+        prices = await self.get_current_prices([symbol])
+        return prices.get(symbol)
+
+    async def get_current_prices(
+        self,
+        symbols: Iterable[str],
+        max_lines: int = 100,
+        timeout: float = 5.0,
+        poll_interval: float = 0.05,
+    ) -> dict[str, float | None]:
+        """批量获取当前价格。
+
+        同时订阅不超过 max_lines 个行情，某个标的拿到有效价格后立即取消其订阅并补入下一个；
+        所有标的共用一个截止时间，超时未取得价格的返回 None。
+        """
+        queue = list(dict.fromkeys(symbols))
+        prices: dict[str, float | None] = {symbol: None for symbol in queue}
+        if not queue or not await self.client.ensure_connection() or self.client.ib is None:
+            return prices
+
+        await self._ensure_contracts(queue)
+        ib = self.client.ib
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        active: dict[str, tuple[Any, Any]] = {}
+        next_index = 0
+        try:
+            while True:
+                while next_index < len(queue) and len(active) < max_lines:
+                    symbol = queue[next_index]
+                    next_index += 1
+                    try:
+                        contract = self._make_contract(symbol)
+                        active[symbol] = (contract, ib.reqMktData(contract, "", False, False))
+                    except Exception as exc:  # pragma: no cover
+                        logger.error("订阅 %s 行情失败: %r", symbol, exc)
+
+                for symbol, (contract, ticker) in list(active.items()):
+                    price = _valid_price(ticker.marketPrice())
+                    if price is not None:
+                        prices[symbol] = price
+                        ib.cancelMktData(contract)
+                        del active[symbol]
+
+                if (not active and next_index >= len(queue)) or loop.time() >= deadline:
+                    break
+                await asyncio.sleep(poll_interval)
+        finally:
+            for contract, _ in active.values():
+                ib.cancelMktData(contract)
+
+        missing = [symbol for symbol, price in prices.items() if price is None]
+        recorder = get_recorder()
+        recorder.incr("ib_market_data_requests", next_index)
+        recorder.incr("ib_market_data_missing", len(missing))
+        if missing:
+            logger.warning("%s 个标的未在 %.1fs 内取得价格: %s", len(missing), timeout, missing[:20])
+        return prices
+
+
+def _valid_price(value: Any) -> float | None:
+    """过滤 IB 返回的 nan、-1 等无效价格。"""
+    if value is None:
+        return None
+    price = float(value)
+    if math.isnan(price) or price <= 0:
+        return None
+    return price
@@ -4,24 +4,49 @@ import asyncio
 import logging
 from typing import Any
 
-try:
-    from ib_insync import IB
-except ImportError:  # pragma: no cover
-    IB = None  # type: ignore
+logger = logging.getLogger(__name__)
 
 
-logger = logging.getLogger(__name__)
+def _create_ib() -> Any | None:
+    """按需导入 ib_insync 并创建 IB 实例，未安装时返回 None。"""
+    try:
+        from ib_insync import IB
+    except ImportError:  # pragma: no cover
+        return None
+    return IB()
 
 
 class IBClient:
     """对 ib_insync.IB 的轻量封装。"""
 
-    def __init__(self, host: str, port: int, client_id: int, timeout: float = 10.0) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        client_id: int,
+        timeout: float = 10.0,
+        ib: Any | None = None,
+    ) -> None:
+        """ib 可传入兼容 ib_insync.IB 接口的对象（如 SimulatedIB），默认在首次使用时创建真实连接。"""
         self.host = host
         self.port = port
         self.client_id = client_id
         self.timeout = timeout
-        self.ib = IB() if IB else None
+        self._ib = ib
+        self._ib_resolved = ib is not None
+
+    @property
+    def ib(self) -> Any | None:
+        """底层 IB 对象；ib_insync 延迟到首次访问时才导入。"""
+        if not self._ib_resolved:
+            self._ib = _create_ib()
+            self._ib_resolved = True
+        return self._ib
+
+    @ib.setter
+    def ib(self, value: Any | None) -> None:
+        self._ib = value
+        self._ib_resolved = True
 
     async def connect(self) -> bool:
         """连接到 TWS/Gateway，支持最多 3 次重试。"""
@@ -87,3 +112,11 @@ class IBClient:
             )
         logger.info("账户 %s 持仓数量: %s", account or "ALL", len(rows))
         return rows
+
+    async def get_all_positions(self, accounts: list[str] | None = None) -> list[dict[str, Any]]:
+        """一次请求获取所有账户的持仓，可按 accounts 过滤。"""
+        rows = await self.get_positions()
+        if accounts is not None:
+            wanted = set(accounts)
+            rows = [row for row in rows if row["account_id"] in wanted]
+        return rows
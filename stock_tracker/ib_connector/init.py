@@ -1,6 +1,9 @@
 """IB 连接模块导出。"""
 
+from stock_tracker.ib_connector.contracts import ContractRegistry
 from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
 from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.ib_connector.pacing import PacingLimiter
+from stock_tracker.ib_connector.simulator import SimulatedIB, SimulatedIBError
 
-__all__ = ["IBClient", "IBDataFetcher"]
+__all__ = ["ContractRegistry", "IBClient", "IBDataFetcher", "PacingLimiter", "SimulatedIB", "SimulatedIBError"]
@@ -0,0 +1,68 @@
+"""IB 历史数据请求节流器，遵守官方 pacing 规则。"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Hashable
+
+
+class PacingLimiter:
+    """令牌桶节流：每个令牌在消耗 period 秒后归还，且相同请求需间隔 identical_interval 秒。
+
+    默认值对应 IB 规则：10 分钟内不超过 60 个历史数据请求，15 秒内不得重复相同请求。
+    """
+
+    def __init__(
+        self,
+        max_requests: int = 60,
+        period: float = 600.0,
+        identical_interval: float = 15.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_requests = max_requests
+        self.period = period
+        self.identical_interval = identical_interval
+        self._clock = clock
+        self._spent: deque[float] = deque()
+        self._last_seen: dict[Hashable, float] = {}
+        self._lock = asyncio.Lock()
+
+    def _wait_time(self, key: Hashable | None, now: float) -> float:
+        """计算当前请求还需等待的秒数。"""
+        while self._spent and now - self._spent[0] >= self.period:
+            self._spent.popleft()
+
+        wait = 0.0
+        if len(self._spent) >= self.max_requests:
+            wait = self._spent[0] + self.period - now
+        if key is not None and key in self._last_seen:
+            wait = max(wait, self._last_seen[key] + self.identical_interval - now)
+        return wait
+
+    async def acquire(self, key: Hashable | None = None) -> None:
+        """等待直到允许发出请求，并占用一个令牌。
+
+        等待时间在锁内计算，睡眠在锁外进行，醒来后重新检查；一个重复请求的等待不会挡住其他请求。
+        """
+        while True:
+            async with self._lock:
+                now = self._clock()
+                wait = self._wait_time(key, now)
+                if wait <= 0:
+                    self._take(key, now)
+                    return
+            await asyncio.sleep(wait)
+
+    def _take(self, key: Hashable | None, now: float) -> None:
+        """占用一个令牌并记录请求时间。"""
+        self._spent.append(now)
+        if key is not None:
+            self._last_seen[key] = now
+        if len(self._last_seen) > 4 * self.max_requests:
+            self._last_seen = {k: ts for k, ts in self._last_seen.items() if now - ts < self.identical_interval}
+
+    @property
+    def available(self) -> int:
+        """当前窗口内剩余的令牌数量。"""
+        self._wait_time(None, self._clock())
+        return self.max_requests - len(self._spent)
@@ -0,0 +1,106 @@
+"""长连接 IB 会话：在常驻事件循环中复用连接，带心跳与自动重连。"""
+
+import asyncio
+import logging
+
+from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.utils.instrumentation import get_recorder
+
+logger = logging.getLogger(__name__)
+
+
+class IBSession:
+    """管理一个跨任务复用的 IB 连接。
+
+    start() 建立连接并启动心跳协程；心跳每 heartbeat_interval 秒检查一次连接，
+    连接可用时用 reqCurrentTimeAsync 探活，断开或探活失败时按指数退避重连。
+    任务调用 ensure_connected() 获取连接，多个任务并发调用时只会触发一次重连。
+    """
+
+    def __init__(
+        self,
+        client: IBClient,
+        heartbeat_interval: float = 30.0,
+        heartbeat_timeout: float = 10.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.client = client
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self._ever_connected = False
+        self._lock: asyncio.Lock | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._failures = 0
+
+    @property
+    def connected(self) -> bool:
+        """当前连接是否在线。"""
+        return self.client.ib is not None and self.client.ib.isConnected()
+
+    async def start(self) -> bool:
+        """建立连接并启动心跳，返回首次连接是否成功。"""
+        self._lock = asyncio.Lock()
+        connected = await self.ensure_connected()
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop(), name="ib-heartbeat")
+        return connected
+
+    async def stop(self) -> None:
+        """停止心跳并断开连接。"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+        await self.client.disconnect()
+
+    async def ensure_connected(self) -> bool:
+        """返回可用连接；断开时重连，并发调用共享同一次重连。"""
+        if self.connected:
+            return True
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.connected:
+                return True
+            if await self.client.connect():
+                if self._ever_connected:
+                    self.reconnects += 1
+                    get_recorder().incr("ib_reconnects")
+                    logger.info("IB 会话已重连（累计 %s 次）", self.reconnects)
+                self._ever_connected = True
+                self._failures = 0
+                return True
+            self._failures += 1
+            get_recorder().incr("ib_connect_failures")
+            return False
+
+    async def _probe(self) -> bool:
+        """探活：连接在线且能在超时内取回服务器时间。"""
+        if not self.connected:
+            return False
+        ping = getattr(self.client.ib, "reqCurrentTimeAsync", None)
+        if ping is None:
+            return True
+        try:
+            await asyncio.wait_for(ping(), timeout=self.heartbeat_timeout)
+            return True
+        except Exception as exc:
+            logger.warning("IB 心跳失败，断开后重连: %r", exc)
+            if self.client.ib is not None:
+                self.client.ib.disconnect()
+            return False
+
+    def _next_delay(self) -> float:
+        if not self._failures:
+            return self.heartbeat_interval
+        return min(self.max_backoff, 2 ** (self._failures - 1))
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._next_delay())
+            if not await self._probe():
+                await self.ensure_connected()
@@ -0,0 +1,342 @@
+"""进程内模拟 IB 网关，用于离线压测抓取与调度逻辑。
+
+SimulatedIB 实现 IBClient 与 IBDataFetcher 用到的 ib_insync.IB 接口子集，
+按配置注入延迟、抖动、pacing 违规、断线与错误码；同一 seed 下行为可复现。
+"""
+
+import asyncio
+import math
+import random
+import time
+import zlib
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# IB 错误码：行情订阅数超限、历史数据服务错误（含 pacing 违规）、无合约定义、行情未订阅、连接断开
+ERROR_MAX_TICKERS = 101
+ERROR_PACING = 162
+ERROR_NO_SECURITY = 200
+ERROR_NOT_SUBSCRIBED = 354
+ERROR_CONNECTIVITY = 1100
+
+_ERROR_MESSAGES = {
+    ERROR_MAX_TICKERS: "Max number of tickers has been reached",
+    ERROR_PACING: "Historical Market Data Service error message:Historical data request pacing violation",
+    ERROR_NO_SECURITY: "No security definition has been found for the request",
+    ERROR_NOT_SUBSCRIBED: "Requested market data is not subscribed",
+    ERROR_CONNECTIVITY: "Connectivity between IB and Trader Workstation has been lost",
+}
+
+_DURATION_DAYS = {"S": 1 / 86400, "D": 1, "W": 7, "M": 30, "Y": 365}
+_BAR_UNIT_SECONDS = {"sec": 1, "min": 60, "hour": 3600}
+
+# 美股常规交易时段（UTC，忽略夏令时）
+_SESSION_OPEN_SECONDS = 14 * 3600 + 30 * 60
+_SESSION_CLOSE_SECONDS = 21 * 3600
+
+
+class SimulatedIBError(RuntimeError):
+    """模拟网关返回的 IB 错误。"""
+
+    def __init__(self, code: int, message: str | None = None) -> None:
+        self.code = code
+        super().__init__(f"Error {code}: {message or _ERROR_MESSAGES.get(code, '')}")
+
+
+class SimContract(NamedTuple):
+    symbol: str
+    exchange: str = "SMART"
+    currency: str = "USD"
+    conId: int = 0
+    primaryExchange: str = ""
+
+
+class SimContractDetails(NamedTuple):
+    contract: SimContract
+    longName: str
+    timeZoneId: str
+    tradingHours: str
+
+
+class SimPosition(NamedTuple):
+    account: str
+    contract: Any
+    position: float
+    avgCost: float
+
+
+class SimBar(NamedTuple):
+    date: date
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+
+
+class SimTicker:
+    """行情快照，订阅后经过一个延迟周期才有价格。"""
+
+    def __init__(self, contract: Any, ready_at: float, price: float, clock: Callable[[], float]) -> None:
+        self.contract = contract
+        self._ready_at = ready_at
+        self._price = price
+        self._clock = clock
+
+    def marketPrice(self) -> float:
+        return self._price if self._clock() >= self._ready_at else math.nan
+
+
+def _duration_days(duration: str) -> int:
+    value, unit = duration.split()
+    return max(1, math.ceil(int(value) * _DURATION_DAYS[unit.upper()]))
+
+
+def _bar_seconds(bar_size: str) -> int:
+    value, unit = bar_size.split()
+    return int(value) * _BAR_UNIT_SECONDS[unit.lower().rstrip("s")]
+
+
+def _symbol_seed(symbol: str) -> int:
+    return zlib.crc32(symbol.encode("utf-8"))
+
+
+class SimulatedIB:
+    """ib_insync.IB 的模拟实现。
+
+    latency / jitter 为每个请求的基础延迟与均匀抖动（秒）；pacing_limit 个历史请求 / pacing_period 秒
+    超出时返回 162 错误；disconnect_rate 为每个请求后断线的概率；error_rate 为随机返回
+    error_codes 中某个错误码的概率；unknown_symbols 中的标的总是返回 200；
+    listing_dates 为标的上市日期，更早的日线被截掉，整段早于上市日期时与 IB 一样返回 162 无数据错误。
+    """
+
+    def __init__(
+        self,
+        accounts: int = 2,
+        positions_per_account: int = 20,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        pacing_limit: int | None = 60,
+        pacing_period: float = 600.0,
+        disconnect_rate: float = 0.0,
+        error_rate: float = 0.0,
+        error_codes: tuple[int, ...] = (ERROR_NO_SECURITY,),
+        unknown_symbols: set[str] | None = None,
+        listing_dates: dict[str, date] | None = None,
+        market_data_lines: int = 100,
+        seed: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.pacing_limit = pacing_limit
+        self.pacing_period = pacing_period
+        self.disconnect_rate = disconnect_rate
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.unknown_symbols = unknown_symbols or set()
+        self.listing_dates = listing_dates or {}
+        self.market_data_lines = market_data_lines
+        self._rng = random.Random(seed)
+        self._clock = clock
+        self._connected = False
+        self._history_requests: deque[float] = deque()
+        self._tickers: dict[str, SimTicker] = {}
+        self._accounts = [f"DU{i + 1:06d}" for i in range(accounts)]
+        self._positions = [
+            SimPosition(
+                account,
+                SimContract(f"SIM{j:04d}"),
+                float(self._rng.randint(1, 1000)),
+                round(self._rng.uniform(10, 500), 2),
+            )
+            for account in self._accounts
+            for j in range(positions_per_account)
+        ]
+        self.stats = {"requests": 0, "errors": 0, "pacing_violations": 0, "disconnects": 0, "connects": 0}
+
+    async def _respond(self) -> None:
+        """模拟网络往返：延迟、抖动，并按概率断线或返回错误。"""
+        if not self._connected:
+            raise ConnectionError("Not connected")
+        self.stats["requests"] += 1
+        await asyncio.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+        if not self._connected:
+            raise ConnectionError("Socket disconnect")
+        if self.disconnect_rate and self._rng.random() < self.disconnect_rate:
+            self._connected = False
+            self.stats["disconnects"] += 1
+            raise SimulatedIBError(ERROR_CONNECTIVITY)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            raise SimulatedIBError(self._rng.choice(self.error_codes))
+
+    async def connectAsync(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 7497,
+        clientId: int = 1,
+        **kwargs: Any,
+    ) -> "SimulatedIB":
+        await asyncio.sleep(self.latency)
+        self._connected = True
+        self.stats["connects"] += 1
+        return self
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def disconnect(self) -> None:
+        self._connected = False
+        self._tickers.clear()
+
+    async def reqCurrentTimeAsync(self) -> datetime:
+        await self._respond()
+        return datetime.now()
+
+    def managedAccounts(self) -> list[str]:
+        return list(self._accounts) if self._connected else []
+
+    def positions(self, account: str = "") -> list[SimPosition]:
+        return [p for p in self._positions if not account or p.account == account]
+
+    async def reqHistoricalDataAsync(
+        self,
+        contract: Any,
+        endDateTime: Any = "",
+        durationStr: str = "1 D",
+        barSizeSetting: str = "1 day",
+        whatToShow: str = "TRADES",
+        useRTH: bool = True,
+        formatDate: int = 1,
+        **kwargs: Any,
+    ) -> list[SimBar]:
+        now = self._clock()
+        if self.pacing_limit is not None:
+            while self._history_requests and now - self._history_requests[0] >= self.pacing_period:
+                self._history_requests.popleft()
+            if len(self._history_requests) >= self.pacing_limit:
+                self.stats["pacing_violations"] += 1
+                raise SimulatedIBError(ERROR_PACING)
+            self._history_requests.append(now)
+
+        await self._respond()
+        if contract.symbol in self.unknown_symbols:
+            self.stats["errors"] += 1
+            raise SimulatedIBError(ERROR_NO_SECURITY)
+        if barSizeSetting != "1 day":
+            return self.make_intraday_bars(contract.symbol, durationStr, barSizeSetting, endDateTime)
+        bars = self.make_bars(contract.symbol, durationStr, endDateTime)
+        listed = self.listing_dates.get(contract.symbol)
+        if listed is not None:
+            bars = [bar for bar in bars if bar.date >= listed]
+            if not bars:
+                self.stats["errors"] += 1
+                raise SimulatedIBError(
+                    ERROR_PACING,
+                    f"Historical Market Data Service error message:HMDS query returned no data: {contract.symbol}",
+                )
+        return bars
+
+    async def reqContractDetailsAsync(self, contract: Any) -> list[SimContractDetails]:
+        """按标的返回确定性的合约详情（conId 与主交易所由标的名决定）；unknown_symbols 与 IB 一样返回空列表。"""
+        await self._respond()
+        if contract.symbol in self.unknown_symbols:
+            return []
+        con_id = _symbol_seed(contract.symbol) % 900_000_000 + 1
+        days = [date.today() + timedelta(days=i) for i in range(3)]
+        trading_hours = ";".join(
+            f"{day:%Y%m%d}:0930-{day:%Y%m%d}:1600" if day.weekday() < 5 else f"{day:%Y%m%d}:CLOSED" for day in days
+        )
+        qualified = SimContract(
+            contract.symbol,
+            "SMART",
+            contract.currency or "USD",
+            con_id,
+            getattr(contract, "primaryExchange", "") or ("NASDAQ" if con_id % 2 else "NYSE"),
+        )
+        return [SimContractDetails(qualified, f"{contract.symbol} Inc", "US/Eastern", trading_hours)]
+
+    def make_bars(self, symbol: str, duration: str, end: Any = "") -> list[SimBar]:
+        """按标的生成确定性的日线，同一标的与日期总是得到相同价格。
+
+        指定 end 时包含 end 当天，未指定时截至昨天（当天尚未收盘）。
+        """
+        if isinstance(end, datetime):
+            end_date = end.date()
+        elif isinstance(end, date):
+            end_date = end
+        elif end:
+            end_date = datetime.strptime(str(end)[:8], "%Y%m%d").date()
+        else:
+            end_date = date.today() - timedelta(days=1)
+        periods = max(1, _duration_days(duration) * 5 // 7)
+        days = pd.bdate_range(end=end_date, periods=periods)
+        ordinals = np.array([day.toordinal() for day in days], dtype=np.float64)
+        phase = _symbol_seed(symbol) % 1000
+        close = np.round((20 + phase / 10) * np.exp(0.2 * np.sin((ordinals + phase) / 30.0)), 2)
+        return [
+            SimBar(day.date(), value, round(value * 1.01, 2), round(value * 0.99, 2), value, 1000 + int(value) * 10)
+            for day, value in zip(days, close.tolist())
+        ]
+
+    def make_intraday_bars(self, symbol: str, duration: str, bar_size: str, end: Any = "") -> list[SimBar]:
+        """按标的生成确定性的分钟线（时间为 UTC），覆盖 duration 内每个交易日的常规时段。"""
+        if isinstance(end, datetime):
+            end_date = end.date()
+        elif end:
+            end_date = datetime.strptime(str(end)[:8], "%Y%m%d").date()
+        else:
+            end_date = date.today()
+        step = _bar_seconds(bar_size)
+        days = pd.bdate_range(end=end_date, periods=max(1, _duration_days(duration) * 5 // 7))
+        midnights = days.to_numpy().astype("datetime64[s]").astype(np.int64)
+        offsets = np.arange(_SESSION_OPEN_SECONDS, _SESSION_CLOSE_SECONDS, step)
+        ts = (midnights[:, None] + offsets[None, :]).ravel()
+        phase = _symbol_seed(symbol) % 1000
+        close = np.round(
+            (20 + phase / 10) * np.exp(0.2 * np.sin((ts / 86400 + phase) / 30.0)) * (1 + 0.002 * np.sin(ts / 900.0)),
+            2,
+        )
+        return [
+            SimBar(
+                datetime.fromtimestamp(stamp, tz=timezone.utc),
+                value,
+                round(value * 1.001, 2),
+                round(value * 0.999, 2),
+                value,
+                100 + int(stamp // step) % 50 * 10,
+            )
+            for stamp, value in zip(ts.tolist(), close.tolist())
+        ]
+
+    def reqMktData(
+        self,
+        contract: Any,
+        genericTickList: str = "",
+        snapshot: bool = False,
+        regulatorySnapshot: bool = False,
+        **kwargs: Any,
+    ) -> SimTicker:
+        if not self._connected:
+            raise ConnectionError("Not connected")
+        if len(self._tickers) >= self.market_data_lines:
+            raise SimulatedIBError(ERROR_MAX_TICKERS)
+        delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        bars = self.make_bars(contract.symbol, "1 D")
+        ticker = SimTicker(contract, self._clock() + delay, bars[-1].close, self._clock)
+        self._tickers[contract.symbol] = ticker
+        self.stats["requests"] += 1
+        return ticker
+
+    def cancelMktData(self, contract: Any) -> None:
+        self._tickers.pop(contract.symbol, None)
+
+    @property
+    def active_market_data_lines(self) -> int:
+        """当前占用的行情订阅数。"""
+        return len(self._tickers)
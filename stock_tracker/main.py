@@ -1,55 +1,106 @@
-"""主入口文件，提供命令行执行能力。"""
+"""主入口文件，提供命令行执行能力。
+
+数据库、IB 与调度器相关模块（pandas、ib_insync、导出依赖）在选定运行模式后才导入，
+jobs 等只读命令无需加载它们。
+"""
 
 import argparse
 import logging
+from typing import TYPE_CHECKING
 
-from stock_tracker.config.settings import get_settings
-from stock_tracker.database.db_manager import DatabaseManager
-from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
-from stock_tracker.ib_connector.ib_client import IBClient
-from stock_tracker.scheduler.tasks import StockTrackerScheduler
+from stock_tracker.config.settings import Settings, get_settings
 from stock_tracker.utils.logger import setup_logger
 
+if TYPE_CHECKING:
+    from stock_tracker.scheduler.tasks import StockTrackerScheduler
+
 
 def build_parser() -> argparse.ArgumentParser:
     """构建命令行参数解析器。"""
     parser = argparse.ArgumentParser(description="股票记账自动化系统")
     parser.add_argument(
         "--mode",
-        choices=["run", "snapshot", "weekly", "export", "reconnect", "jobs"],
+        choices=["run", "snapshot", "weekly", "backfill", "intraday", "contracts", "export", "reconnect", "jobs"],
         default="run",
         help="运行模式",
     )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        default=None,
+        help="export 模式的导出格式，逗号分隔：excel,csv,parquet（默认取 EXPORT_FORMATS）",
+    )
+    parser.add_argument(
+        "--symbols",
+        default=None,
+        help="backfill 模式的标的，逗号分隔（默认取 symbols_config 中的启用标的）",
+    )
     return parser
 
 
-def main() -> None:
+def build_scheduler(settings: Settings) -> "StockTrackerScheduler":
+    """创建数据库、IB 客户端与调度器。"""
+    from stock_tracker.database.db_manager import DatabaseManager
+    from stock_tracker.ib_connector.contracts import ContractRegistry
+    from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
+    from stock_tracker.ib_connector.ib_client import IBClient
+    from stock_tracker.scheduler.tasks import StockTrackerScheduler
+
+    ib = None
+    if settings.ib_simulated:
+        from stock_tracker.ib_connector.simulator import SimulatedIB
+
+        ib = SimulatedIB()
+
+    db_manager = DatabaseManager(
+        settings.db_path,
+        write_behind=settings.db_write_behind,
+        cache_bytes=settings.db_cache_mb * 1024 * 1024,
+    )
+    ib_client = IBClient(settings.ib_host, settings.ib_port, settings.client_id, ib=ib)
+    fetcher = IBDataFetcher(ib_client, contracts=ContractRegistry(db_manager, ib_client))
+    return StockTrackerScheduler(db_manager, ib_client, fetcher)
+
+
+def main(argv: list[str] | None = None) -> None:
     """程序主函数。"""
+    args = build_parser().parse_args(argv)
     settings = get_settings()
-    setup_logger(settings.log_level)
+    setup_logger(
+        settings.log_level,
+        settings.log_file,
+        log_format=settings.log_format,
+        rate_limit=settings.log_rate_limit,
+        rate_period=settings.log_rate_period,
+        rate_limit_level=settings.log_rate_limit_level,
+    )
     logger = logging.getLogger(__name__)
 
-    db_manager = DatabaseManager(settings.db_path)
-    ib_client = IBClient(settings.ib_host, settings.ib_port, settings.client_id)
-    fetcher = IBDataFetcher(ib_client)
-    scheduler = StockTrackerScheduler(db_manager, ib_client, fetcher)
-    scheduler.setup_tasks()
+    if args.mode == "jobs":
+        from stock_tracker.scheduler.jobs import job_schedule
 
-    args = build_parser().parse_args()
+        for job in job_schedule():
+            logger.info("任务 %s -> 下次执行: %s", job["id"], job["next_run_time"])
+        return
 
+    scheduler = build_scheduler(settings)
     if args.mode == "run":
+        scheduler.setup_tasks()
         scheduler.start()
     elif args.mode == "snapshot":
         scheduler.daily_positions_snapshot()
     elif args.mode == "weekly":
         scheduler.weekly_prices_update()
+    elif args.mode == "backfill":
+        scheduler.price_backfill(args.symbols.split(",") if args.symbols else None)
+    elif args.mode == "intraday":
+        scheduler.intraday_update()
+    elif args.mode == "contracts":
+        scheduler.contract_refresh()
     elif args.mode == "export":
-        scheduler.monthly_export()
+        scheduler.monthly_export(args.formats.split(",") if args.formats else None)
     elif args.mode == "reconnect":
         scheduler.ib_reconnect()
-    elif args.mode == "jobs":
-        for job in scheduler.list_jobs():
-            logger.info("任务 %s -> 下次执行: %s", job["id"], job["next_run_time"])
 
 
 if __name__ == "__main__":
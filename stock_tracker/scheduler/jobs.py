@@ -0,0 +1,38 @@
+"""定时任务的触发时间定义（北京时间），不依赖数据库与 IB，可用于快速列出计划。"""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from apscheduler.triggers.cron import CronTrigger
+
+SCHEDULER_TIMEZONE = "Asia/Shanghai"
+
+# 任务 id -> CronTrigger 参数
+JOB_TRIGGERS: dict[str, dict[str, int | str]] = {
+    "daily_positions_snapshot": {"hour": 4, "minute": 30},
+    "contract_refresh": {"day_of_week": "sun", "hour": 9, "minute": 30},
+    "weekly_prices_update": {"day_of_week": "sun", "hour": 10, "minute": 0},
+    "monthly_export": {"day": 1, "hour": 9, "minute": 0},
+    "ib_reconnect": {"hour": 15, "minute": 5},
+}
+
+
+def make_trigger(job_id: str) -> CronTrigger:
+    """构造任务的 Cron 触发器。"""
+    return CronTrigger(timezone=SCHEDULER_TIMEZONE, **JOB_TRIGGERS[job_id])
+
+
+def job_schedule(now: datetime | None = None) -> list[dict[str, str]]:
+    """不启动调度器，直接计算每个任务的下次执行时间。"""
+    now = now or datetime.now(ZoneInfo(SCHEDULER_TIMEZONE))
+    schedule = []
+    for job_id in JOB_TRIGGERS:
+        trigger = make_trigger(job_id)
+        schedule.append(
+            {
+                "id": job_id,
+                "next_run_time": str(trigger.get_next_fire_time(None, now)),
+                "trigger": str(trigger),
+            }
+        )
+    return schedule
@@ -1,92 +1,456 @@
-"""任务调度模块，定义持仓、股价、导出、重连任务。"""
+"""任务调度模块，定义持仓、股价、合约、导出、重连任务。"""
 
 import asyncio
 import logging
-from datetime import date
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import date, timedelta
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
 
+import pandas as pd
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
 
+from stock_tracker.analytics.adjustments import AdjustmentEngine
+from stock_tracker.analytics.metrics import MetricsEngine
+from stock_tracker.analytics.valuation import PortfolioValuator
 from stock_tracker.config.settings import get_settings
 from stock_tracker.database.db_manager import DatabaseManager
-from stock_tracker.exporter.csv_exporter import CSVExporter
-from stock_tracker.exporter.excel_exporter import ExcelExporter
+from stock_tracker.database.intraday import IntradayStore
+from stock_tracker.database.migrations import PRICE_ROWS_SQL
 from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
 from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.ib_connector.session import IBSession
+from stock_tracker.scheduler.jobs import JOB_TRIGGERS, SCHEDULER_TIMEZONE, make_trigger
+from stock_tracker.utils.helpers import days_to_duration, duration_since, duration_to_days
+from stock_tracker.utils.instrumentation import get_recorder
 
 logger = logging.getLogger(__name__)
 
+EXPORT_FORMATS = ("excel", "csv", "parquet")
+SCHEDULER_MODES = ("blocking", "asyncio")
+
+# 导出查询均按唯一索引或主键的列顺序排序，SQLite 可以边扫描边返回，无需整表排序；
+# 价格按 price_bars 主键中的整数日期排序，prices 视图的文本日期排序需要临时 B 树
+EXPORT_QUERIES = {
+    "positions": "SELECT * FROM positions ORDER BY account_id, symbol, snapshot_date",
+    "prices": f"{PRICE_ROWS_SQL} ORDER BY s.symbol, b.trade_date",
+    "position_events": "SELECT * FROM position_events ORDER BY snapshot_date, account_id, symbol",
+}
+
 
 class StockTrackerScheduler:
     """股票记账调度器。"""
 
-    def __init__(self, db_manager: DatabaseManager, ib_client: IBClient, fetcher: IBDataFetcher) -> None:
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        ib_client: IBClient,
+        fetcher: IBDataFetcher,
+        mode: str | None = None,
+    ) -> None:
+        """mode 为 blocking（每个任务独立事件循环与连接）或 asyncio（常驻事件循环 + 长连接会话）。"""
         self.db_manager = db_manager
         self.ib_client = ib_client
         self.fetcher = fetcher
         self.settings = get_settings()
-        self.scheduler = BlockingScheduler(timezone="Asia/Shanghai")
+        self.valuator = PortfolioValuator(db_manager)
+        self.intraday = IntradayStore(db_manager)
+        self.adjustments = AdjustmentEngine(db_manager)
+        if self.settings.price_adjustment_auto_update:
+            self.adjustments.attach()
+        self.metrics = MetricsEngine(db_manager)
+        if self.settings.metrics_auto_update:
+            self.metrics.attach()
+        self.recorder = get_recorder()
+        self.mode = mode or self.settings.scheduler_mode
+        if self.mode not in SCHEDULER_MODES:
+            raise ValueError(f"不支持的调度模式: {self.mode}")
+        if self.mode == "asyncio":
+            self.session: IBSession | None = IBSession(
+                ib_client, heartbeat_interval=self.settings.ib_heartbeat_interval
+            )
+            self.scheduler = AsyncIOScheduler(timezone=SCHEDULER_TIMEZONE)
+        else:
+            self.session = None
+            self.scheduler = BlockingScheduler(timezone=SCHEDULER_TIMEZONE)
+
+    @asynccontextmanager
+    async def _ib_connection(self) -> AsyncIterator[None]:
+        """任务内使用 IB 连接：长连接模式复用会话，否则本次任务连接、结束时断开。"""
+        if self.session is not None:
+            if not await self.session.ensure_connected():
+                raise ConnectionError("无法连接 IB")
+            yield
+            return
+        if not await self.ib_client.connect():
+            raise ConnectionError("无法连接 IB")
+        try:
+            yield
+        finally:
+            await self.ib_client.disconnect()
+
+    async def _run_async_job(self, job: str, func: Callable[[], Awaitable[Any]]) -> None:
+        """在常驻事件循环中执行任务，异常只记录不抛出。"""
+        with self._instrumented(job):
+            try:
+                await func()
+            except Exception as exc:
+                self.recorder.incr("job_errors", job=job)
+                logger.exception("任务 %s 失败: %s", job, exc)
+
+    @contextmanager
+    def _instrumented(self, job: str) -> Iterator[None]:
+        """记录任务各阶段指标，结束后写入 job_metrics 并刷新 Prometheus 文件。"""
+        try:
+            with self.recorder.job(job, profile=self.settings.job_profile, profile_dir=self.settings.profile_dir):
+                yield
+        finally:
+            try:
+                self.recorder.flush(job, self.db_manager, self.settings.metrics_file or None)
+            except Exception as exc:
+                logger.exception("保存任务 %s 指标失败: %s", job, exc)
 
     def daily_positions_snapshot(self) -> None:
         """每日持仓快照任务。"""
         logger.info("开始获取每日持仓...")
-        try:
-            asyncio.run(self._daily_positions_snapshot_async())
-        except Exception as exc:
-            logger.exception("每日持仓任务失败: %s", exc)
+        with self._instrumented("daily_positions_snapshot"):
+            try:
+                asyncio.run(self._daily_positions_snapshot_async())
+            except Exception as exc:
+                self.recorder.incr("job_errors", job="daily_positions_snapshot")
+                logger.exception("每日持仓任务失败: %s", exc)
 
     async def _daily_positions_snapshot_async(self) -> None:
-        if not await self.ib_client.connect():
-            raise ConnectionError("无法连接 IB")
+        async with self._ib_connection():
+            await self._collect_positions()
 
-        accounts = await self.ib_client.get_accounts()
-        today = date.today().strftime("%Y-%m-%d")
-        all_positions: list[dict] = []
-        for account in accounts:
-            positions = await self.ib_client.get_positions(account)
-            for p in positions:
+    async def _collect_positions(self) -> None:
+        with self.recorder.stage("fetch") as stage:
+            accounts = await self.ib_client.get_accounts()
+            today = date.today().strftime("%Y-%m-%d")
+            all_positions = await self.ib_client.get_all_positions(accounts)
+            for p in all_positions:
                 p["snapshot_date"] = today
-            all_positions.extend(positions)
+            stage["rows"] = len(all_positions)
 
-        if all_positions:
-            self.db_manager.save_positions(all_positions)
+        if self.settings.position_storage == "delta" and accounts:
+            # 增量存储不保存估值列，市值由 PortfolioValuator.value_positions 在读取时计算
+            with self.recorder.stage("write") as stage:
+                self.db_manager.save_position_snapshot(
+                    all_positions, today, keyframe_days=self.settings.position_keyframe_days
+                )
+                self.db_manager.flush()
+                stage["rows"] = len(all_positions)
+            logger.info("增量保存 %s 个账户 %s 条持仓", len(accounts), len(all_positions))
+        elif all_positions:
+            with self.recorder.stage("write") as stage:
+                self.db_manager.save_positions(all_positions)
+                self.db_manager.flush()
+                stage["rows"] = len(all_positions)
             logger.info("保存 %s 条持仓记录", len(all_positions))
-        await self.ib_client.disconnect()
+            quotes = None
+            if self.settings.valuation_live_quotes:
+                with self.recorder.stage("quotes"):
+                    quotes = await self.fetcher.get_current_prices(
+                        [p["symbol"] for p in all_positions],
+                        max_lines=self.settings.max_market_data_lines,
+                    )
+            with self.recorder.stage("valuation") as stage:
+                stage["rows"] = self.valuator.value_snapshot(today, quotes)
+                self.db_manager.flush()
 
-    def weekly_prices_update(self) -> None:
-        """周度股价更新任务。"""
+    def weekly_prices_update(self, full_refresh: bool = False) -> None:
+        """周度股价更新任务，默认只补齐每个标的缺失的区间。"""
         logger.info("开始周度股价更新...")
-        try:
-            asyncio.run(self._weekly_prices_update_async())
-        except Exception as exc:
-            logger.exception("周度股价更新失败: %s", exc)
+        with self._instrumented("weekly_prices_update"):
+            try:
+                asyncio.run(self._weekly_prices_update_async(full_refresh))
+            except Exception as exc:
+                self.recorder.incr("job_errors", job="weekly_prices_update")
+                logger.exception("周度股价更新失败: %s", exc)
 
-    async def _weekly_prices_update_async(self) -> None:
-        if not await self.ib_client.connect():
-            raise ConnectionError("无法连接 IB")
+    def plan_price_durations(self, symbols: list[str], full_refresh: bool = False) -> dict[str, str]:
+        """按每个标的的最新交易日规划请求跨度，新标的做全量回填。"""
+        backfill = self.settings.price_backfill_duration
+        if full_refresh:
+            return {symbol: backfill for symbol in symbols}
+
+        latest = self.db_manager.get_latest_trade_dates()
+        overlap = self.settings.price_update_overlap_days
+        return {
+            symbol: duration_since(latest[symbol], overlap) if symbol in latest else backfill
+            for symbol in symbols
+        }
+
+    async def _weekly_prices_update_async(self, full_refresh: bool = False) -> None:
+        async with self._ib_connection():
+            await self._update_prices(full_refresh)
+
+    async def _update_prices(self, full_refresh: bool) -> None:
+        with self.recorder.stage("plan") as stage:
+            symbols_df = self.db_manager.query_dataframe("SELECT symbol FROM symbols_config WHERE is_active = 1")
+            durations = self.plan_price_durations(symbols_df["symbol"].tolist(), full_refresh)
+            stage["rows"] = len(durations)
+        # fetch 阶段包含等待 IB 与写入的全部时间，write 阶段单独累计写入耗时
+        with self.recorder.stage("fetch") as fetch_stage:
+            async for _, data in self.fetcher.get_historical_data_many(
+                durations,
+                durations=durations,
+                max_concurrency=self.settings.hist_max_concurrency,
+                db_manager=self.db_manager,
+                as_frame=True,
+            ):
+                fetch_stage["rows"] = fetch_stage.get("rows", 0) + len(data)
+                if len(data):
+                    with self.recorder.stage("write") as stage:
+                        self.db_manager.save_prices(data)
+                        stage["rows"] = len(data)
+        with self.recorder.stage("write"):
+            self.db_manager.flush()
+
+    def price_backfill(self, symbols: list[str] | None = None) -> dict[str, int]:
+        """初始历史回填任务，返回每个标的本次导入的行数。
+
+        每个标的从今天起按 backfill_chunk_duration 分段向前请求，直到覆盖 price_backfill_duration；
+        每段数据经暂存表批量合并，并与断点在同一事务中提交，中断后重新执行会从断点继续。
+        回填期间缓存失效与派生指标计算推迟到结束时统一执行一次。
+        """
+        logger.info("开始历史股价回填...")
+        loaded: dict[str, int] = {}
+        with self._instrumented("price_backfill"):
+            try:
+                loaded = asyncio.run(self._price_backfill_async(symbols))
+            except Exception as exc:
+                self.recorder.incr("job_errors", job="price_backfill")
+                logger.exception("历史股价回填失败: %s", exc)
+        return loaded
+
+    def plan_backfill(self, symbols: list[str], today: date | None = None) -> dict[str, dict[str, Any]]:
+        """为每个标的生成起始断点：已完成的跳过，中断的从 next_end 继续，新标的从今天开始。"""
+        today = today or date.today()
+        # 覆盖包含今天在内的 duration 个自然日
+        days = duration_to_days(self.settings.price_backfill_duration)
+        target_start = (today - timedelta(days=days - 1)).isoformat()
+        progress = self.db_manager.get_backfill_progress()
+        plan: dict[str, dict[str, Any]] = {}
+        for symbol in symbols:
+            state = progress.get(symbol)
+            if state is None:
+                plan[symbol] = {
+                    "symbol": symbol,
+                    "target_start": target_start,
+                    "next_end": today.isoformat(),
+                    "status": "running",
+                    "chunks": 0,
+                    "rows": 0,
+                }
+            elif state["status"] != "done" or target_start < state["target_start"]:
+                # 回填跨度加长时，已完成的标的从原断点继续向前
+                plan[symbol] = {**state, "target_start": min(state["target_start"], target_start), "status": "running"}
+        return plan
+
+    async def _price_backfill_async(self, symbols: list[str] | None = None) -> dict[str, int]:
+        async with self._ib_connection():
+            with self.db_manager.deferred_maintenance():
+                return await self._backfill_prices(symbols)
+
+    async def _backfill_prices(self, symbols: list[str] | None) -> dict[str, int]:
+        with self.recorder.stage("plan") as stage:
+            if symbols is None:
+                symbols_df = self.db_manager.query_dataframe("SELECT symbol FROM symbols_config WHERE is_active = 1")
+                symbols = symbols_df["symbol"].tolist()
+            plan = self.plan_backfill(symbols)
+            stage["rows"] = len(plan)
+        logger.info("待回填标的 %s 个（跳过已完成 %s 个）", len(plan), len(symbols) - len(plan))
+
+        chunk_days = duration_to_days(self.settings.backfill_chunk_duration)
+        semaphore = asyncio.Semaphore(self.settings.hist_max_concurrency)
+        loaded = {symbol: 0 for symbol in plan}
+        started = time.perf_counter()
+
+        async def backfill_symbol(checkpoint: dict[str, Any]) -> None:
+            symbol = checkpoint["symbol"]
+            target_start = date.fromisoformat(checkpoint["target_start"])
+            async with semaphore:
+                while checkpoint["status"] == "running":
+                    end = date.fromisoformat(checkpoint["next_end"])
+                    span = min(chunk_days, (end - target_start).days + 1)
+                    try:
+                        with self.recorder.stage("fetch") as stage:
+                            frame = await self.fetcher.get_historical_chunk(symbol, end, days_to_duration(span))
+                            stage["rows"] = len(frame)
+                    except Exception as exc:
+                        self.recorder.incr("backfill_errors")
+                        logger.error("回填 %s 截至 %s 的数据失败，保留断点: %r", symbol, end, exc)
+                        return
+                    next_end = end - timedelta(days=span)
+                    # 返回空数据说明已早于上市日期
+                    done = frame.empty or next_end < target_start
+                    checkpoint = {
+                        **checkpoint,
+                        "next_end": next_end.isoformat(),
+                        "status": "done" if done else "running",
+                        "chunks": checkpoint["chunks"] + 1,
+                        "rows": checkpoint["rows"] + len(frame),
+                    }
+                    with self.recorder.stage("write") as stage:
+                        stage["rows"] = self.db_manager.bulk_load_prices(frame, checkpoint=checkpoint)
+                    loaded[symbol] += len(frame)
 
+        await asyncio.gather(*(backfill_symbol(checkpoint) for checkpoint in plan.values()))
+        self.db_manager.flush()
+        seconds = time.perf_counter() - started
+        total = sum(loaded.values())
+        logger.info(
+            "历史回填完成：%s 个标的 %s 行，%.1f 秒（%.0f 行/秒）",
+            len(loaded),
+            total,
+            seconds,
+            total / max(seconds, 1e-9),
+        )
+        return loaded
+
+    def intraday_update(self) -> int:
+        """分钟线更新任务：抓取启用标的最近 intraday_duration 的分钟线并追加写入，返回写入行数。"""
+        logger.info("开始分钟线更新...")
+        written = 0
+        with self._instrumented("intraday_update"):
+            try:
+                written = asyncio.run(self._intraday_update_async())
+            except Exception as exc:
+                self.recorder.incr("job_errors", job="intraday_update")
+                logger.exception("分钟线更新失败: %s", exc)
+        return written
+
+    async def _intraday_update_async(self) -> int:
+        async with self._ib_connection():
+            return await self._update_intraday()
+
+    async def _update_intraday(self) -> int:
         symbols_df = self.db_manager.query_dataframe("SELECT symbol FROM symbols_config WHERE is_active = 1")
-        for symbol in symbols_df["symbol"].tolist():
-            data = await self.fetcher.get_historical_data(symbol, duration="10 Y")
-            if data:
-                self.db_manager.save_prices(data)
-        await self.ib_client.disconnect()
-
-    def monthly_export(self) -> None:
-        """月度导出任务。"""
+        bar_size = self.settings.intraday_bar_size
+        semaphore = asyncio.Semaphore(self.settings.hist_max_concurrency)
+        written = 0
+
+        async def update_symbol(symbol: str) -> None:
+            nonlocal written
+            async with semaphore:
+                try:
+                    with self.recorder.stage("fetch") as stage:
+                        frame = await self.fetcher.get_intraday_frame(
+                            symbol, bar_size, self.settings.intraday_duration
+                        )
+                        stage["rows"] = len(frame)
+                except Exception as exc:
+                    logger.error("获取 %s 分钟线失败: %r", symbol, exc)
+                    return
+            # 已存在的 bar 由 append 按最新时间戳跳过
+            with self.recorder.stage("write") as stage:
+                appended = self.intraday.append(frame, bar_size)
+                stage["rows"] = appended
+            written += appended
+
+        await asyncio.gather(*(update_symbol(symbol) for symbol in symbols_df["symbol"]))
+        logger.info("分钟线更新完成，新增 %s 行", written)
+        return written
+
+    def contract_refresh(self) -> int:
+        """合约刷新任务：解析新增标的并重新解析超过 contract_refresh_days 天的合约，返回解析成功数。"""
+        logger.info("开始刷新合约注册表...")
+        refreshed = 0
+        with self._instrumented("contract_refresh"):
+            try:
+                refreshed = asyncio.run(self._contract_refresh_async())
+            except Exception as exc:
+                self.recorder.incr("job_errors", job="contract_refresh")
+                logger.exception("合约刷新失败: %s", exc)
+        return refreshed
+
+    async def _contract_refresh_async(self) -> int:
+        if self.fetcher.contracts is None:
+            logger.warning("未配置合约注册表，跳过合约刷新")
+            return 0
+        async with self._ib_connection():
+            return await self.fetcher.contracts.refresh(self.settings.contract_refresh_days)
+
+    def monthly_export(self, formats: list[str] | None = None) -> dict[str, dict[str, int]]:
+        """月度导出任务，所有格式均从数据库流式写出，返回每个输出的行数与字节数。
+
+        formats 可选 excel / csv / parquet，默认取配置 export_formats；
+        Parquet 数据集固定写在导出目录的 parquet/ 下，每次只重写变化的分区。
+        """
+        with self._instrumented("monthly_export"):
+            return self._monthly_export(formats)
+
+    def _monthly_export(self, formats: list[str] | None) -> dict[str, dict[str, int]]:
+        # 导出器依赖 xlsxwriter / pyarrow，只在导出时加载，避免拖慢其他命令的启动
+        from stock_tracker.exporter.csv_exporter import CSVExporter
+        from stock_tracker.exporter.excel_exporter import ExcelExporter
+        from stock_tracker.exporter.parquet_exporter import ParquetExporter
+
         logger.info("开始月度报表导出...")
+        formats = formats or [item.strip() for item in self.settings.export_formats.split(",") if item.strip()]
+        unknown = set(formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"不支持的导出格式: {sorted(unknown)}")
+
+        self.db_manager.flush()
+        position_table = "position_events" if self.settings.position_storage == "delta" else "positions"
+        tables = [position_table, "prices"]
         today = date.today().strftime("%Y-%m-%d")
-        positions_df = self.db_manager.get_positions_dataframe()
-        prices_df = self.db_manager.get_prices_dataframe()
+        export_path = self.settings.export_path
+        chunk_size = self.settings.export_chunk_size
+        summary: dict[str, dict[str, int]] = {}
 
-        excel_exporter = ExcelExporter(str(self.settings.export_path / f"monthly_report_{today}.xlsx"))
-        csv_positions = CSVExporter(str(self.settings.export_path / f"positions_{today}.csv"))
-        csv_prices = CSVExporter(str(self.settings.export_path / f"prices_{today}.csv"))
+        if "excel" in formats:
+            excel_exporter = ExcelExporter(str(export_path / f"monthly_report_{today}.xlsx"))
+            if position_table == "position_events":
+                # 增量模式下 positions 表为空，持仓表改为最近快照日由关键帧与变更重建的完整持仓
+                excel_exporter.export_frame(self._latest_position_snapshot(), "持仓", chunk_size)
+            else:
+                excel_exporter.export_from_query(
+                    self.db_manager, EXPORT_QUERIES[position_table], sheet_prefix="持仓", chunk_size=chunk_size
+                )
+            summary[excel_exporter.output_path.name] = {
+                "rows": excel_exporter.rows_written,
+                "bytes": excel_exporter.output_path.stat().st_size,
+            }
 
-        excel_exporter.export_positions(positions_df, sheet_name="持仓")
-        csv_positions.export_dataframe(positions_df)
-        csv_prices.export_dataframe(prices_df)
-        logger.info("月度报表导出完成")
+        if "csv" in formats:
+            for name in tables:
+                query = EXPORT_QUERIES[name]
+                exporter = CSVExporter(str(export_path / f"{name}_{today}.csv"))
+                exporter.export_from_query(self.db_manager, query, chunk_size=chunk_size)
+                summary[exporter.output_path.name] = {
+                    "rows": exporter.rows_written,
+                    "bytes": exporter.bytes_written,
+                }
+
+        if "parquet" in formats:
+            parquet_exporter = ParquetExporter(str(export_path / "parquet"))
+            for name in tables:
+                stats = parquet_exporter.export_table(self.db_manager, name)
+                summary[f"parquet/{name}"] = stats
+
+        for name, stats in summary.items():
+            logger.info("导出 %s: %s 行, %s 字节", name, stats["rows"], stats["bytes"])
+        logger.info(
+            "月度报表导出完成，共 %s 行, %s 字节",
+            sum(item["rows"] for item in summary.values()),
+            sum(item["bytes"] for item in summary.values()),
+        )
+        return summary
+
+    def _latest_position_snapshot(self) -> pd.DataFrame:
+        """重建最近一个快照日的完整持仓（增量存储模式），尚无快照时为空表。"""
+        latest = self.db_manager.query_dataframe(
+            "SELECT MAX(snapshot_date) AS snapshot_date FROM position_events"
+        )["snapshot_date"].iloc[0]
+        if pd.isna(latest):
+            return pd.DataFrame(columns=["account_id", "symbol", "quantity", "avg_cost", "snapshot_date"])
+        return self.db_manager.get_position_snapshot(latest)
 
     def ib_reconnect(self) -> None:
         """每日 IB 重连任务。"""
@@ -97,35 +461,39 @@ class StockTrackerScheduler:
             logger.exception("IB 重连任务失败: %s", exc)
 
     async def _ib_reconnect_async(self) -> None:
-        connected = await self.ib_client.ensure_connection()
+        if self.session is not None:
+            connected = await self.session.ensure_connected()
+        else:
+            connected = await self.ib_client.ensure_connection()
         logger.info("IB 连接状态: %s", connected)
 
+    def _job_functions(self) -> dict[str, Callable[..., Any]]:
+        """按调度模式返回各任务的入口：asyncio 模式下为协程，导出放到线程池执行避免阻塞事件循环。"""
+        if self.session is None:
+            return {
+                "daily_positions_snapshot": self.daily_positions_snapshot,
+                "weekly_prices_update": self.weekly_prices_update,
+                "contract_refresh": self.contract_refresh,
+                "monthly_export": self.monthly_export,
+                "ib_reconnect": self.ib_reconnect,
+            }
+        return {
+            "daily_positions_snapshot": partial(
+                self._run_async_job, "daily_positions_snapshot", self._daily_positions_snapshot_async
+            ),
+            "weekly_prices_update": partial(
+                self._run_async_job, "weekly_prices_update", self._weekly_prices_update_async
+            ),
+            "contract_refresh": partial(self._run_async_job, "contract_refresh", self._contract_refresh_async),
+            "monthly_export": partial(asyncio.to_thread, self.monthly_export),
+            "ib_reconnect": self._ib_reconnect_async,
+        }
+
     def setup_tasks(self) -> None:
         """配置所有定时任务。"""
-        self.scheduler.add_job(
-            self.daily_positions_snapshot,
-            CronTrigger(hour=4, minute=30),
-            id="daily_positions_snapshot",
-            replace_existing=True,
-        )
-        self.scheduler.add_job(
-            self.weekly_prices_update,
-            CronTrigger(day_of_week="sun", hour=10, minute=0),
-            id="weekly_prices_update",
-            replace_existing=True,
-        )
-        self.scheduler.add_job(
-            self.monthly_export,
-            CronTrigger(day=1, hour=9, minute=0),
-            id="monthly_export",
-            replace_existing=True,
-        )
-        self.scheduler.add_job(
-            self.ib_reconnect,
-            CronTrigger(hour=15, minute=5),
-            id="ib_reconnect",
-            replace_existing=True,
-        )
+        jobs = self._job_functions()
+        for job_id in JOB_TRIGGERS:
+            self.scheduler.add_job(jobs[job_id], make_trigger(job_id), id=job_id, replace_existing=True)
         logger.info("定时任务配置完成")
 
     def list_jobs(self) -> list[dict[str, str]]:
@@ -133,13 +501,33 @@ class StockTrackerScheduler:
         return [
             {
                 "id": job.id,
-                "next_run_time": str(job.next_run_time),
+                "next_run_time": str(getattr(job, "next_run_time", None)),
                 "trigger": str(job.trigger),
             }
             for job in self.scheduler.get_jobs()
         ]
 
     def start(self) -> None:
-        """启动调度器（阻塞式）。"""
-        logger.info("启动调度器")
+        """启动调度器并阻塞当前线程。"""
+        logger.info("启动调度器（%s 模式）", self.mode)
+        if self.session is None:
+            self.scheduler.start()
+            return
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logger.info("调度器已停止")
+
+    async def serve(self, stop_event: asyncio.Event | None = None) -> None:
+        """asyncio 模式主循环：建立长连接会话并运行调度器，直到 stop_event 被设置。"""
+        if self.session is None:
+            raise RuntimeError("serve 仅用于 asyncio 调度模式")
+        stop_event = stop_event or asyncio.Event()
+        if not await self.session.start():
+            logger.warning("IB 首次连接失败，心跳将持续重试")
         self.scheduler.start()
+        try:
+            await stop_event.wait()
+        finally:
+            self.scheduler.shutdown(wait=False)
+            await self.session.stop()
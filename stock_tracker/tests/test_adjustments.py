@@ -0,0 +1,111 @@
+"""公司行动复权测试。"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_tracker.analytics.adjustments import AdjustmentEngine, adjustment_factors
+from stock_tracker.analytics.metrics import MetricsEngine
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.database.write_behind import WriteBehindWriter
+
+
+def _bars(symbol, closes, start="2026-03-02"):
+    dates = pd.bdate_range(start, periods=len(closes)).strftime("%Y-%m-%d")
+    return pd.DataFrame(
+        {
+            "symbol": symbol,
+            "trade_date": dates,
+            "open": closes,
+            "high": closes,
+            "low": closes,
+            "close": closes,
+            "volume": 1,
+            "adjusted_close": closes,
+        }
+    )
+
+
+def test_adjustment_factors_split_and_dividend():
+    """测试拆股与分红因子按除权日向前累乘，且只作用于同一标的。"""
+    codes = np.array([0, 0, 0, 0, 1, 1])
+    dates = np.array([20260302, 20260303, 20260304, 20260305, 20260302, 20260303])
+    close = np.array([100.0, 100.0, 50.0, 50.0, 10.0, 10.0])
+    factors = adjustment_factors(
+        codes,
+        dates,
+        close,
+        np.array([0, 0]),
+        np.array([20260305, 20260304]),
+        np.array(["dividend", "split"]),
+        np.array([1.0, 2.0]),
+    )
+    # 3/5 分红 1 元：前收 50，因子 0.98；3/4 一拆二：再乘 0.5
+    assert factors == pytest.approx([0.49, 0.49, 0.98, 1.0, 1.0, 1.0])
+
+
+def test_engine_rewrites_only_affected_symbol_and_updates_metrics(tmp_path):
+    """测试新增拆股只重算该标的历史、通知指标重算，之后回填的更早 K 线也会自动复权。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    engine = AdjustmentEngine(db).attach()
+    metrics = MetricsEngine(db).attach()
+    db.save_prices(_bars("AAPL", [100.0, 102.0, 51.0, 52.0]))
+    db.save_prices(_bars("MSFT", [20.0, 21.0, 22.0, 23.0]))
+
+    calls = []
+    update = engine.update
+    engine.update = lambda symbols: calls.append(sorted(symbols)) or update(symbols)
+    db.save_corporate_actions([{"symbol": "AAPL", "ex_date": "2026-03-04", "action_type": "split", "value": 2}])
+    assert calls == [["AAPL"]]  # 自身的改写不会再次触发重算
+    prices = db.get_prices(columns=["close", "adjusted_close"])
+    aapl = prices[prices["symbol"] == "AAPL"]
+    msft = prices[prices["symbol"] == "MSFT"]
+    assert aapl["adjusted_close"].tolist() == [50.0, 51.0, 51.0, 52.0]
+    assert (msft["adjusted_close"] == msft["close"]).all()
+    returns = metrics.get_metrics(["AAPL"], columns=["daily_return"])["daily_return"]
+    assert returns.iloc[2] == pytest.approx(0.0)
+
+    db.save_prices(_bars("AAPL", [98.0], start="2026-02-27"))
+    first = db.get_prices(["AAPL"], end="2026-02-27", columns=["adjusted_close"])
+    assert first["adjusted_close"].tolist() == [49.0]
+
+    with pytest.raises(ValueError):
+        db.save_corporate_actions([{"symbol": "AAPL", "ex_date": "2026-03-05", "action_type": "merger", "value": 1}])
+    db.close()
+
+
+def test_engine_rewrites_directly_under_write_behind(tmp_path):
+    """测试写后台模式下监听器在写线程上改写复权价，不经自身的有界队列，队列写满时也不会死锁。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.write_behind = WriteBehindWriter(db, max_queue=1, max_delay=0.01)
+    listening, queue_full = threading.Event(), threading.Event()
+
+    def hold_writer_until_queue_full(changes):
+        # 在复权监听器之前运行：让写线程停在监听器里，等生产者把队列写满
+        if "corporate_actions" in changes:
+            listening.set()
+            queue_full.wait(timeout=5)
+
+    db.add_commit_listener(hold_writer_until_queue_full)
+    engine = AdjustmentEngine(db).attach()
+    db.save_prices(_bars("AAPL", [100.0, 102.0, 51.0, 52.0]))
+    db.flush()
+
+    def produce():
+        db.save_corporate_actions([{"symbol": "AAPL", "ex_date": "2026-03-04", "action_type": "split", "value": 2}])
+        listening.wait(timeout=5)
+        db.save_prices(_bars("MSFT", [20.0]))
+        queue_full.set()
+        db.flush()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    producer.join(timeout=10)
+    assert not producer.is_alive()
+
+    adjusted = db.get_prices(["AAPL"], columns=["adjusted_close"])["adjusted_close"]
+    assert adjusted.tolist() == [50.0, 51.0, 51.0, 52.0]
+    assert engine.update(["AAPL"]) == 0
+    db.close()
@@ -0,0 +1,33 @@
+"""基准测试工具测试。"""
+
+import numpy as np
+
+from stock_tracker.benchmarks.generators import generate_prices
+from stock_tracker.benchmarks.runner import compare, run_suite
+
+
+def test_generate_prices_chunks_cover_all_rows():
+    """测试生成器按块产出且每个标的日期连续。"""
+    chunks = list(generate_prices(1003, 10, chunk_size=250))
+    symbols = np.concatenate([chunk["symbol"] for chunk in chunks])
+    dates = np.concatenate([chunk["trade_date"] for chunk in chunks])
+    assert [len(chunk["close"]) for chunk in chunks] == [250, 250, 250, 250, 3]
+    assert (symbols == "S00001").sum() == 101
+    assert len(set(zip(symbols, dates))) == 1003
+
+
+def test_run_suite_and_compare(tmp_path):
+    """测试小规模基准可运行，且比较结果能标出吞吐下降与延迟上升。"""
+    report = run_suite(str(tmp_path), rows=2000, symbols=20, queries=5, excel_rows=500)
+    results = report["results"]
+    assert results["ingest"]["rows"] == 2000
+    assert results["csv_export"]["rows"] == 2000
+    assert results["excel_export"]["rows"] == 500
+    assert results["point_query"]["p95_ms"] > 0
+    assert results["memory"]["peak_rss_mb"] > 0
+    assert "peak_rss_mb" not in results["ingest"]
+
+    baseline = {"results": {"ingest": {"rows_per_s": 100.0}, "point_query": {"p50_ms": 1.0}}}
+    current = {"results": {"ingest": {"rows_per_s": 80.0}, "point_query": {"p50_ms": 1.05}}}
+    regressions = compare(current, baseline, threshold=0.1)
+    assert [(item["case"], item["metric"]) for item in regressions] == [("ingest", "rows_per_s")]
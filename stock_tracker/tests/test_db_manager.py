@@ -1,7 +1,9 @@
 """数据库模块测试。"""
 
 import time
+from datetime import date
 
+import pandas as pd
 import pytest
 
 from stock_tracker.database.db_manager import DatabaseManager
@@ -57,3 +59,371 @@ class TestDatabaseManager:
         assert elapsed < 1.0
         df = db.get_prices_dataframe("AAPL")
         assert len(df) == 31
+
+    def test_connection_reuse_and_rollback(self, db: DatabaseManager):
+        """测试写连接复用、嵌套提交与异常回滚。"""
+        with db.get_connection() as first:
+            pass
+        with db.get_connection() as second:
+            assert first is second
+
+        with pytest.raises(RuntimeError):
+            with db.get_connection():
+                with db.get_connection() as inner:
+                    inner.execute("INSERT INTO accounts (account_id) VALUES ('DU9')")
+                raise RuntimeError("boom")
+        assert db.query_dataframe("SELECT * FROM accounts").empty
+
+    def test_concurrent_readers_and_close(self, db: DatabaseManager):
+        """测试多线程读写与关闭后的行为。"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def work(i: int) -> int:
+            db.log_fetch("historical", f"S{i}", "success")
+            return len(db.query_dataframe("SELECT * FROM fetch_logs"))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(work, range(40)))
+
+        assert len(db.query_dataframe("SELECT * FROM fetch_logs")) == 40
+        assert db.health_check() is True
+        db.close()
+        with pytest.raises(RuntimeError):
+            db.query_dataframe("SELECT 1")
+
+    def test_save_prices_columnar(self, db: DatabaseManager):
+        """测试列式（DataFrame / NumPy 数组）写入与字典列表结果一致。"""
+        import numpy as np
+        import pandas as pd
+
+        n = 10
+        dates = np.arange("2021-01-01", "2021-01-11", dtype="datetime64[D]")
+        close = np.linspace(100, 109, n)
+        db.save_prices(
+            {
+                "symbol": "MSFT",
+                "trade_date": dates,
+                "open": close,
+                "high": close + 1,
+                "low": close - 1,
+                "close": close,
+                "volume": np.full(n, 1000, dtype=np.int64),
+                "adjusted_close": close,
+            },
+            batch_size=3,
+        )
+        frame = db.get_prices_dataframe("MSFT")
+        assert len(frame) == n
+        assert str(frame.iloc[0]["trade_date"]) == "2021-01-01"
+        assert frame["volume"].tolist() == [1000] * n
+
+        positions = pd.DataFrame(
+            {
+                "account_id": ["DU1", "DU1"],
+                "symbol": ["AAPL", "MSFT"],
+                "quantity": [1.0, 2.0],
+                "avg_cost": [10.0, 20.0],
+                "market_value": [np.nan, np.nan],
+                "unrealized_pnl": [None, None],
+                "snapshot_date": ["2026-02-24", "2026-02-24"],
+            }
+        )
+        db.save_positions(positions)
+        stored = db.get_positions_dataframe("2026-02-24")
+        assert stored["symbol"].tolist() == ["AAPL", "MSFT"]
+        assert stored["market_value"].isna().all()
+
+
+def test_migrate_legacy_prices_table(tmp_path):
+    """测试旧版 prices 表迁移为聚簇存储后数据与查询保持一致。"""
+    import sqlite3
+
+    from stock_tracker.database.migrations import LATEST_VERSION, current_version
+    from stock_tracker.database.models import CREATE_TABLES_SQL, INDEX_SQL
+
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    for sql in CREATE_TABLES_SQL + INDEX_SQL:
+        conn.execute(sql)
+    conn.execute("ALTER TABLE fetch_logs DROP COLUMN latency_ms")
+    conn.executemany(
+        "INSERT INTO prices (symbol, trade_date, open, high, low, close, volume, adjusted_close) "
+        "VALUES (?, ?, 1, 1, 1, ?, 10, ?)",
+        [("MSFT", "2026-01-02", 2.0, 2.0), ("AAPL", "2026-01-02", 3.0, 3.0), ("AAPL", "2026-01-05", 4.0, 4.0)],
+    )
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(str(db_path))
+    with db.get_read_connection() as conn:
+        assert current_version(conn) == LATEST_VERSION
+        kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name IN ('prices', 'price_bars')"))
+        dates = [row[0] for row in conn.execute("SELECT trade_date FROM price_bars ORDER BY trade_date")]
+    assert kinds == {"prices": "view", "price_bars": "table"}
+    assert dates == [20260102, 20260102, 20260105]
+
+    df = db.get_prices_dataframe("AAPL")
+    assert df["trade_date"].tolist() == [date(2026, 1, 2), date(2026, 1, 5)]
+    assert db.get_latest_trade_dates() == {"AAPL": "2026-01-05", "MSFT": "2026-01-02"}
+
+    db.log_fetch("historical", "AAPL", "success", latency_ms=1.5)
+    db.close()
+    assert DatabaseManager(str(db_path)).init_database() == []
+
+
+def test_write_behind_group_commit(tmp_path):
+    """测试写后台模式合并提交，flush 后数据可见。"""
+    db = DatabaseManager(str(tmp_path / "test.db"), write_behind=True)
+    for i in range(50):
+        db.log_fetch("historical", f"S{i}", "success")
+    db.save_prices(
+        [
+            {
+                "symbol": "AAPL",
+                "trade_date": "2026-01-02",
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": 1.0,
+                "volume": 1,
+                "adjusted_close": 1.0,
+            }
+        ]
+    )
+    db.flush()
+
+    assert len(db.query_dataframe("SELECT * FROM fetch_logs")) == 50
+    assert len(db.get_prices_dataframe("AAPL")) == 1
+    assert db.write_behind.commits < 51
+    db.close()
+
+
+def test_write_behind_surfaces_errors(tmp_path):
+    """测试写线程中的失败在 flush 时抛出。"""
+    db = DatabaseManager(str(tmp_path / "test.db"), write_behind=True)
+    db.save_positions([{"account_id": "DU1"}])
+    with pytest.raises(RuntimeError):
+        db.flush()
+    db.close()
+
+
+def test_write_behind_failed_item_keeps_rest_of_group(tmp_path):
+    """测试同一组提交中的单个失败写入只丢弃该项，其余写入照常落盘。"""
+    db = DatabaseManager(str(tmp_path / "test.db"), write_behind=True)
+    db.log_fetch("historical", "AAPL", "success")
+    db.save_positions([{"account_id": "DU1"}])
+    db.log_fetch("historical", "MSFT", "success")
+    with pytest.raises(RuntimeError):
+        db.flush()
+
+    assert db.query_dataframe("SELECT symbol FROM fetch_logs ORDER BY id")["symbol"].tolist() == ["AAPL", "MSFT"]
+    assert db.query_dataframe("SELECT * FROM positions").empty
+    db.close()
+
+
+def test_query_cache_hits_and_invalidation(tmp_path):
+    """测试价格查询缓存命中，并且写入只使受影响标的失效。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+
+    def bar(symbol, close):
+        return {
+            "symbol": symbol,
+            "trade_date": "2026-01-02",
+            "open": close,
+            "high": close,
+            "low": close,
+            "close": close,
+            "volume": 1,
+            "adjusted_close": close,
+        }
+
+    db.save_prices([bar("AAPL", 1.0), bar("MSFT", 1.0)])
+    db.get_prices_dataframe("AAPL")
+    db.get_prices_dataframe("MSFT")
+    db.get_prices_dataframe("AAPL")
+    assert db.cache_stats()["hits"] == 1
+
+    db.save_prices([bar("AAPL", 2.0)])
+    assert db.get_prices_dataframe("AAPL").iloc[0]["close"] == 2.0
+    db.get_prices_dataframe("MSFT")
+    stats = db.cache_stats()
+    assert stats["hits"] == 2
+    assert stats["invalidations"] == 1
+
+
+def test_query_cache_refuses_put_after_concurrent_invalidation():
+    """测试查询期间标签被失效时，读到的旧结果不会写入缓存。"""
+    from stock_tracker.database.cache import QueryCache
+
+    cache = QueryCache()
+    frame = pd.DataFrame({"close": [1.0]})
+    aapl = cache.version([("prices", "AAPL")])
+    msft = cache.version([("prices", "MSFT")])
+    cache.invalidate([("prices", "*"), ("prices", "AAPL")])
+
+    assert cache.put("aapl", frame, [("prices", "AAPL")], aapl) is False
+    assert cache.put("msft", frame, [("prices", "MSFT")], msft) is True
+    assert cache.get("aapl") is None
+    assert cache.get("msft") is not None
+
+
+def test_position_snapshot_delta_roundtrip(tmp_path):
+    """测试增量持仓只记录变化，并能重建任意日期的完整持仓。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+
+    def pos(account, symbol, quantity, avg_cost=10.0):
+        return {"account_id": account, "symbol": symbol, "quantity": quantity, "avg_cost": avg_cost}
+
+    day1 = [pos("DU1", "AAPL", 10), pos("DU1", "MSFT", 5), pos("DU2", "AAPL", 1)]
+    day2 = [pos("DU1", "AAPL", 10), pos("DU1", "MSFT", 8), pos("DU2", "TSLA", 2)]
+    db.save_position_snapshot(day1, "2026-03-02", keyframe_days=3)
+    db.save_position_snapshot(day1, "2026-03-03", keyframe_days=3)
+    db.save_position_snapshot(day2, "2026-03-04", keyframe_days=3)
+    db.save_position_snapshot(day2, "2026-03-04", keyframe_days=3)
+    db.save_position_snapshot(day2, "2026-03-05", keyframe_days=3)
+
+    events = db.query_dataframe("SELECT snapshot_date, change_type, COUNT(*) AS n FROM position_events GROUP BY 1, 2")
+    counts = {(row.snapshot_date, row.change_type): row.n for row in events.itertuples()}
+    assert counts == {
+        ("2026-03-02", "K"): 3,
+        ("2026-03-04", "M"): 1,
+        ("2026-03-04", "O"): 1,
+        ("2026-03-04", "C"): 1,
+        ("2026-03-05", "K"): 3,
+    }
+
+    snapshot = db.get_position_snapshot("2026-03-04")
+    assert list(zip(snapshot["account_id"], snapshot["symbol"], snapshot["quantity"])) == [
+        ("DU1", "AAPL", 10.0),
+        ("DU1", "MSFT", 8.0),
+        ("DU2", "TSLA", 2.0),
+    ]
+    assert db.get_position_snapshot("2026-03-03")["symbol"].tolist() == ["AAPL", "MSFT", "AAPL"]
+    assert db.get_position_snapshot("2026-03-01").empty
+
+    with pytest.raises(ValueError):
+        db.save_position_snapshot(day1, "2026-03-03")
+    db.close()
+
+
+def test_position_snapshot_delta_open_from_empty_and_close_all(tmp_path):
+    """测试空关键帧之后开仓、以及全部平仓时差分与重建正常。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    position = {"account_id": "DU1", "symbol": "AAPL", "quantity": 10, "avg_cost": 100.0}
+    db.save_position_snapshot([], "2026-03-02")
+    db.save_position_snapshot([position], "2026-03-03")
+    db.save_position_snapshot([], "2026-03-04")
+
+    events = db.query_dataframe("SELECT snapshot_date, change_type FROM position_events ORDER BY snapshot_date")
+    assert list(zip(events["snapshot_date"], events["change_type"])) == [("2026-03-03", "O"), ("2026-03-04", "C")]
+    assert db.get_position_snapshot("2026-03-03")["quantity"].tolist() == [10.0]
+    assert db.get_position_snapshot("2026-03-04").empty
+    db.close()
+
+
+def test_bulk_load_prices_merges_and_defers_listeners(tmp_path):
+    """测试批量导入经暂存表合并（覆盖已有行），监听器在回填结束时只通知一次。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+
+    def frame(symbol, days, close):
+        return {
+            "symbol": [symbol] * len(days),
+            "trade_date": [f"2026-01-{day:02d}" for day in days],
+            "open": [close] * len(days),
+            "high": [close] * len(days),
+            "low": [close] * len(days),
+            "close": [close] * len(days),
+            "volume": [10] * len(days),
+            "adjusted_close": [close] * len(days),
+        }
+
+    db.save_prices(frame("AAPL", [5], 1.0))
+    notified = []
+    db.add_commit_listener(notified.append)
+    with db.deferred_maintenance():
+        assert db.bulk_load_prices(frame("AAPL", [5, 6], 2.0)) == 2
+        checkpoint = {
+            "symbol": "MSFT",
+            "target_start": "2026-01-01",
+            "next_end": "2026-01-01",
+            "status": "done",
+            "chunks": 1,
+            "rows": 1,
+        }
+        db.bulk_load_prices(frame("MSFT", [2], 3.0), checkpoint=checkpoint)
+        assert notified == []
+
+    assert notified == [{"prices": {"AAPL": "2026-01-05", "MSFT": "2026-01-02"}}]
+    prices = db.query_dataframe("SELECT symbol, trade_date, close FROM prices ORDER BY symbol, trade_date")
+    assert prices.values.tolist() == [
+        ["AAPL", "2026-01-05", 2.0],
+        ["AAPL", "2026-01-06", 2.0],
+        ["MSFT", "2026-01-02", 3.0],
+    ]
+    assert db.get_backfill_progress()["MSFT"]["status"] == "done"
+
+
+def test_get_prices_long_and_wide(tmp_path):
+    """测试按标的、区间与列投影读取价格，长表为紧凑类型，宽矩阵按交易日 × 标的对齐。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.save_prices(
+        {
+            "symbol": ["AAPL", "AAPL", "AAPL", "MSFT", "MSFT"],
+            "trade_date": ["2026-01-02", "2026-01-05", "2026-01-06", "2026-01-05", "2026-01-06"],
+            "open": 1.0,
+            "high": 1.0,
+            "low": 1.0,
+            "close": [10.0, 11.0, 12.0, 20.0, 21.0],
+            "volume": 100,
+            "adjusted_close": 1.0,
+        }
+    )
+
+    long = db.get_prices(["MSFT", "AAPL"], start="2026-01-05", columns=["close", "volume"], float32=True)
+    assert list(long.columns) == ["symbol", "trade_date", "close", "volume"]
+    assert long["symbol"].dtype == "category"
+    assert long["trade_date"].dtype == "datetime64[ns]"
+    assert long["close"].dtype == "float32"
+    assert long["volume"].dtype == "int64"
+    assert long["symbol"].astype(str).tolist() == ["MSFT", "MSFT", "AAPL", "AAPL"]
+
+    wide = db.get_prices(["AAPL", "MSFT", "NVDA"], end="2026-01-05", columns=["close"], wide=True)
+    assert wide.index.strftime("%Y-%m-%d").tolist() == ["2026-01-02", "2026-01-05"]
+    assert list(wide.columns) == ["AAPL", "MSFT", "NVDA"]
+    assert wide.loc["2026-01-05", "MSFT"] == 20.0
+    assert wide["NVDA"].isna().all() and pd.isna(wide.loc["2026-01-02", "MSFT"])
+
+    db.save_prices(
+        [
+            {
+                "symbol": "MSFT",
+                "trade_date": "2026-01-02",
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": 19.0,
+                "volume": 1,
+                "adjusted_close": 1.0,
+            }
+        ]
+    )
+    assert db.get_prices(["AAPL", "MSFT"], end="2026-01-05", columns=["close"], wide=True).iloc[0, 1] == 19.0
+    with pytest.raises(ValueError):
+        db.get_prices(columns=["close", "open"], wide=True)
+
+
+@pytest.mark.parametrize("copy_on_write", [True, False])
+def test_query_cache_isolates_in_place_mutation(monkeypatch, copy_on_write):
+    """测试调用方原地修改传入或取回的 DataFrame 不会改动缓存条目，无论是否开启写时复制。"""
+    from stock_tracker.database import cache as cache_module
+
+    monkeypatch.setattr(cache_module, "_copy_on_write", lambda: copy_on_write)
+    cache = cache_module.QueryCache()
+    frame = pd.DataFrame({"close": [1.0, 2.0]})
+    cache.put("key", frame, [("prices", "AAPL")])
+    frame.loc[0, "close"] = -1.0
+
+    first = cache.get("key")
+    first.loc[1, "close"] = -2.0
+
+    assert cache.get("key")["close"].tolist() == [1.0, 2.0]
@@ -1,6 +1,8 @@
 """导出模块测试。"""
 
 import pandas as pd
+import pytest
+from openpyxl import load_workbook
 
 from stock_tracker.database.db_manager import DatabaseManager
 from stock_tracker.exporter.csv_exporter import CSVExporter
@@ -45,6 +47,124 @@ def test_csv_export_from_query(tmp_path):
     )
     output = tmp_path / "query.csv"
     exporter = CSVExporter(str(output))
-    exporter.export_from_query(db, "SELECT symbol, quantity FROM positions")
+    exporter.export_from_query(db, "SELECT symbol, quantity FROM positions", chunk_size=1)
     assert output.exists()
     assert "TSLA" in output.read_text(encoding="utf-8-sig")
+    assert exporter.rows_written == 1
+    assert exporter.bytes_written == output.stat().st_size
+
+
+def test_excel_stream_rolls_over_sheets(tmp_path):
+    """测试超过单表行数上限时自动续表。"""
+    output = tmp_path / "prices.xlsx"
+    exporter = ExcelExporter(str(output))
+    chunks = [[["AAPL", f"2026-01-{day:02d}", 1.0] for day in range(1, 6)]]
+    exporter.write_stream(["symbol", "trade_date", "close"], chunks, max_rows=3)
+
+    workbook = load_workbook(output, read_only=True)
+    assert workbook.sheetnames == ["prices", "prices_2", "prices_3"]
+    assert exporter.rows_written == 5
+
+
+def test_excel_stream_deduplicates_sheet_names(tmp_path):
+    """测试清洗后同名的分区与续表名冲突的分区各自得到唯一的工作表名。"""
+    output = tmp_path / "prices.xlsx"
+    exporter = ExcelExporter(str(output))
+    rows = [["A/B", 1.0], ["A_B", 2.0], ["X", 3.0], ["X", 4.0], ["X_2", 5.0]]
+    exporter.write_stream(["symbol", "close"], [rows], split_by="symbol", max_rows=2)
+
+    workbook = load_workbook(output, read_only=True)
+    assert workbook.sheetnames == ["A_B", "A_B(2)", "X", "X_2", "X_2(2)"]
+    assert exporter.rows_written == 5
+
+
+def test_excel_export_from_query_split_by_symbol(tmp_path):
+    """测试 SQL 流式导出按标的分表与按分区分工作簿。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.save_prices(
+        [
+            {
+                "symbol": symbol,
+                "trade_date": "2026-01-02",
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": float("nan"),
+                "volume": 1,
+                "adjusted_close": 1.0,
+            }
+            for symbol in ["AAPL", "MSFT"]
+        ]
+    )
+    query = "SELECT * FROM prices ORDER BY symbol, trade_date"
+
+    output = tmp_path / "split.xlsx"
+    paths = ExcelExporter(str(output)).export_from_query(db, query, split_by="symbol")
+    assert paths == [output]
+    assert load_workbook(output, read_only=True).sheetnames == ["AAPL", "MSFT"]
+
+    paths = ExcelExporter(str(tmp_path / "book.xlsx")).export_from_query(
+        db, query, split_by="symbol", workbook_per_partition=True
+    )
+    assert [path.name for path in paths] == ["book_AAPL.xlsx", "book_MSFT.xlsx"]
+
+
+def _price_rows(symbol, dates, close=1.0):
+    return [
+        {
+            "symbol": symbol,
+            "trade_date": trade_date,
+            "open": close,
+            "high": close,
+            "low": close,
+            "close": close,
+            "volume": 10,
+            "adjusted_close": close,
+        }
+        for trade_date in dates
+    ]
+
+
+def test_parquet_export_incremental_and_read_back(tmp_path):
+    """测试 Parquet 分区导出只重写变化分区，并可按标的与日期读回。"""
+    pytest.importorskip("pyarrow")
+    from stock_tracker.exporter.parquet_exporter import ParquetExporter
+
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.save_prices(_price_rows("AAPL", ["2024-12-30", "2025-01-02"]) + _price_rows("MSFT", ["2025-01-02"]))
+    exporter = ParquetExporter(str(tmp_path / "parquet"))
+
+    first = exporter.export_prices(db)
+    assert first["partitions_written"] == 3
+    assert (tmp_path / "parquet" / "prices" / "symbol=AAPL" / "year=2025" / "part-0.parquet").exists()
+
+    db.save_prices(_price_rows("MSFT", ["2025-01-03"], close=2.0))
+    second = exporter.export_prices(db)
+    assert second["partitions_written"] == 1
+    assert second["partitions_skipped"] == 2
+
+    frame = db.read_parquet(str(tmp_path / "parquet"), symbols=["MSFT"], start="2025-01-03")
+    assert len(frame) == 1
+    assert frame.iloc[0]["close"] == 2.0
+    assert len(db.read_parquet(str(tmp_path / "parquet"))) == 4
+
+
+def test_parquet_price_signatures_match_view_grouping(tmp_path):
+    """测试价格分区指纹按 price_bars 主键顺序计算，与按 prices 视图分组的结果一致。"""
+    pytest.importorskip("pyarrow")
+    from stock_tracker.exporter.parquet_exporter import ParquetExporter
+
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.save_prices(
+        _price_rows("AAPL", ["2024-12-30", "2024-12-31"], close=1.5)
+        + _price_rows("AAPL", ["2025-01-02"], close=2.25)
+        + _price_rows("MSFT", ["2025-01-02", "2025-01-03"])
+    )
+    columns = ["open", "high", "low", "close", "volume", "adjusted_close"]
+
+    signatures = ParquetExporter._price_signatures(db, columns)
+
+    assert signatures == ParquetExporter._partition_signatures(db, "prices", "trade_date", columns)
+    assert signatures["AAPL|2024"][:3] == ["2", "2024-12-30", "2024-12-31"]
+    frame = ParquetExporter._read_partition(db, "prices", "trade_date", "AAPL", "2024")
+    assert frame["trade_date"].tolist() == ["2024-12-30", "2024-12-31"]
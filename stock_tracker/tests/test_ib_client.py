@@ -1,10 +1,17 @@
 """IB 客户端模块测试。"""
 
 import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
 
 import pytest
 
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.ib_connector.contracts import ContractRegistry
+from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
 from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.ib_connector.pacing import PacingLimiter
+from stock_tracker.ib_connector.simulator import SimContract, SimulatedIB, SimulatedIBError
 
 
 class FakeIB:
@@ -38,6 +45,19 @@ class FakeIB:
 
         return [Position()]
 
+    async def reqHistoricalDataAsync(self, contract, **kwargs):
+        if contract.symbol == "BAD":
+            raise RuntimeError("No security definition")
+
+        class Bar:
+            def __init__(self, day):
+                self.date = date(2026, 1, day)
+                self.open = self.high = self.low = self.close = 10.0 + day
+                self.volume = 100
+
+        await asyncio.sleep(0.01)
+        return [Bar(day) for day in range(1, 4)]
+
 
 @pytest.mark.asyncio
 async def test_connect_disconnect():
@@ -73,3 +93,188 @@ async def test_retry_timeout():
     client.ib = TimeoutIB()
     ok = await client.connect()
     assert ok is False
+
+
+@pytest.mark.asyncio
+async def test_get_historical_data_many(tmp_path):
+    """测试并发批量获取历史数据并记录抓取日志。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    client = IBClient("127.0.0.1", 7497, 1)
+    client.ib = FakeIB()
+    await client.connect()
+    fetcher = IBDataFetcher(client)
+
+    results = {}
+    async for symbol, rows in fetcher.get_historical_data_many(
+        ["AAPL", "MSFT", "BAD"], max_concurrency=2, db_manager=db
+    ):
+        results[symbol] = rows
+
+    assert len(results["AAPL"]) == 3
+    assert results["BAD"] == []
+    logs = db.query_dataframe("SELECT symbol, status, latency_ms FROM fetch_logs ORDER BY symbol")
+    assert logs["status"].tolist() == ["success", "failed", "success"]
+    assert logs["latency_ms"].notna().all()
+
+
+@pytest.mark.asyncio
+async def test_pacing_limiter_window_and_identical():
+    """测试节流器的窗口配额和相同请求间隔。"""
+    limiter = PacingLimiter(max_requests=2, period=0.2, identical_interval=0.1)
+    start = time.monotonic()
+    await limiter.acquire("a")
+    await limiter.acquire("b")
+    assert limiter.available == 0
+    await limiter.acquire("c")
+    assert time.monotonic() - start >= 0.19
+
+    limiter = PacingLimiter(max_requests=10, period=1.0, identical_interval=0.1)
+    start = time.monotonic()
+    await limiter.acquire("same")
+    await limiter.acquire("same")
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_pacing_limiter_wait_does_not_block_other_keys():
+    """测试重复请求等待间隔时，其他请求不被节流锁挡住。"""
+    limiter = PacingLimiter(max_requests=10, period=1.0, identical_interval=0.5)
+    await limiter.acquire("same")
+    waiting = asyncio.create_task(limiter.acquire("same"))
+    await asyncio.sleep(0.01)
+
+    start = time.monotonic()
+    await asyncio.wait_for(limiter.acquire("other"), 0.2)
+    assert time.monotonic() - start < 0.1
+    assert not waiting.done()
+    await waiting
+
+
+@pytest.mark.asyncio
+async def test_get_current_prices_batches_and_cancels():
+    """测试批量报价按行情线上限轮转订阅并全部取消。"""
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+            self.polls = 0
+
+        def marketPrice(self):
+            self.polls += 1
+            if self.symbol == "HALT" or self.polls < 2:
+                return float("nan")
+            return 100.0
+
+    class QuoteIB(FakeIB):
+        def __init__(self):
+            super().__init__()
+            self.active = set()
+            self.peak = 0
+
+        def reqMktData(self, contract, *args):
+            self.active.add(contract.symbol)
+            self.peak = max(self.peak, len(self.active))
+            return Ticker(contract.symbol)
+
+        def cancelMktData(self, contract):
+            self.active.remove(contract.symbol)
+
+    client = IBClient("127.0.0.1", 7497, 1)
+    client.ib = QuoteIB()
+    await client.connect()
+    fetcher = IBDataFetcher(client)
+
+    symbols = [f"S{i}" for i in range(10)] + ["HALT"]
+    start = time.monotonic()
+    prices = await fetcher.get_current_prices(symbols, max_lines=4, timeout=0.5, poll_interval=0.01)
+
+    assert time.monotonic() - start < 1.0
+    assert all(prices[f"S{i}"] == 100.0 for i in range(10))
+    assert prices["HALT"] is None
+    assert client.ib.peak <= 4
+    assert client.ib.active == set()
+
+
+@pytest.mark.asyncio
+async def test_get_historical_frame_columnar():
+    """测试历史数据列式结果的类型。"""
+    client = IBClient("127.0.0.1", 7497, 1)
+    client.ib = FakeIB()
+    await client.connect()
+    frame = await IBDataFetcher(client).get_historical_frame("AAPL")
+    assert frame["trade_date"].tolist() == ["2026-01-01", "2026-01-02", "2026-01-03"]
+    assert str(frame["close"].dtype) == "float64"
+    assert str(frame["volume"].dtype) == "int64"
+
+
+@pytest.mark.asyncio
+async def test_simulated_ib_serves_client_and_fetcher():
+    """测试模拟网关可直接作为 IBClient 的后端。"""
+    ib = SimulatedIB(accounts=2, positions_per_account=3, latency=0.001, jitter=0.0, pacing_limit=2)
+    client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+    fetcher = IBDataFetcher(client, pacing=PacingLimiter(identical_interval=0))
+
+    assert await client.connect() is True
+    assert len(await client.get_all_positions(await client.get_accounts())) == 6
+
+    bars = await fetcher.get_historical_data("AAPL", duration="2 W")
+    assert len(bars) == 10
+    assert bars == await fetcher.get_historical_data("AAPL", duration="2 W")
+    with pytest.raises(SimulatedIBError) as exc_info:
+        await fetcher._request_historical("MSFT", "1 D", "1 day", "TRADES")
+    assert exc_info.value.code == 162
+
+    prices = await fetcher.get_current_prices(["AAPL", "MSFT"], max_lines=1, poll_interval=0.001)
+    assert all(price > 0 for price in prices.values())
+    assert ib.active_market_data_lines == 0
+
+
+@pytest.mark.asyncio
+async def test_simulated_ib_disconnect_and_reconnect():
+    """测试模拟断线后 ensure_connection 自动重连。"""
+    ib = SimulatedIB(latency=0.001, jitter=0.0, disconnect_rate=1.0)
+    client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+    await client.connect()
+
+    with pytest.raises(SimulatedIBError):
+        await ib.reqHistoricalDataAsync(SimContract("AAPL"), durationStr="1 D")
+    assert ib.isConnected() is False
+    assert await client.ensure_connection() is True
+    assert ib.stats["connects"] == 2
+
+
+@pytest.mark.asyncio
+async def test_contract_registry_qualifies_once_and_refreshes(tmp_path):
+    """测试合约注册表批量解析新标的并落库，之后请求直接使用缓存的 conId，过期条目定期重新解析。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO symbols_config (symbol, currency) VALUES (?, ?)", [("AAPL", "USD"), ("SAP", "EUR")]
+        )
+    ib = SimulatedIB(latency=0.001, jitter=0.0, pacing_limit=None, unknown_symbols={"BAD"})
+    client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+    registry = ContractRegistry(db, client)
+    fetcher = IBDataFetcher(client, pacing=PacingLimiter(identical_interval=0), contracts=registry)
+    await client.connect()
+
+    results = [item async for item in fetcher.get_historical_data_many(["AAPL", "SAP", "BAD"], duration="1 W")]
+    assert len(results) == 3
+    requests = ib.stats["requests"]
+    assert requests == 3 + 3  # 3 个合约详情 + 3 个历史请求
+    contract = registry.make_contract("SAP")
+    assert contract.conId > 0 and contract.currency == "EUR" and contract.primaryExchange
+    assert registry.make_contract("SAP") is contract
+
+    # 已解析与解析失败的标的都不再重复请求合约详情
+    await fetcher.get_historical_data("AAPL", duration="1 W")
+    await fetcher.get_historical_data("BAD", duration="1 W")
+    assert ib.stats["requests"] == requests + 2
+
+    stored = db.query_dataframe("SELECT symbol, is_active, con_id, trading_hours FROM symbols_config ORDER BY symbol")
+    assert stored["symbol"].tolist() == ["AAPL", "SAP"]
+    assert stored["con_id"].notna().all() and stored["trading_hours"].str.contains("0930-").all()
+    assert registry.stale_symbols(30) == []
+    later = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=31)
+    assert registry.stale_symbols(30, now=later) == ["AAPL", "SAP"]
+    assert await registry.refresh(30, now=later) == 2
+    db.close()
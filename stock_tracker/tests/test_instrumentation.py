@@ -0,0 +1,26 @@
+"""性能埋点模块测试。"""
+
+from stock_tracker.utils.instrumentation import MetricsRecorder
+
+
+def test_histogram_and_slowest_requests(tmp_path):
+    """测试直方图累计分桶、按任务统计最慢请求并可选采集剖析文件。"""
+    recorder = MetricsRecorder(buckets=(0.1, 1.0), slow_top=2)
+    with recorder.job("weekly", profile=True, profile_dir=str(tmp_path)):
+        for symbol, seconds in [("AAPL", 0.05), ("MSFT", 0.5), ("TSLA", 2.0)]:
+            recorder.observe("ib_request_seconds", seconds, item=symbol, kind="historical")
+        recorder.incr("ib_errors", kind="historical", code=162)
+
+    rows = recorder.run_rows("weekly")
+    slowest = [(labels, value) for _, _, stage, _, value, labels in rows if stage == "slowest"]
+    assert slowest == [('{"item": "TSLA"}', 2.0), ('{"item": "MSFT"}', 0.5)]
+    assert any(metric == "peak_alloc_bytes" for _, _, _, metric, _, _ in rows)
+    assert len(list(tmp_path.glob("weekly-*.prof"))) == 1
+
+    text = recorder.render_prometheus()
+    assert 'stock_tracker_ib_request_seconds_bucket{kind="historical",le="0.1"} 1' in text
+    assert 'stock_tracker_ib_request_seconds_bucket{kind="historical",le="+Inf"} 3' in text
+    assert 'stock_tracker_ib_errors_total{code="162",kind="historical"} 1' in text
+
+    recorder.flush("weekly")
+    assert recorder.run_rows("weekly") == []
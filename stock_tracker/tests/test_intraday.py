@@ -0,0 +1,106 @@
+"""分钟线存储测试。"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from stock_tracker.config.settings import Settings
+from stock_tracker.database.db_manager import DatabaseManager
+from stock_tracker.database.intraday import IntradayStore
+from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
+from stock_tracker.ib_connector.ib_client import IBClient
+from stock_tracker.ib_connector.simulator import SimulatedIB
+from stock_tracker.scheduler.tasks import StockTrackerScheduler
+
+# 2026-01-30 与 2026-02-02 两个交易日各 3 根 1 分钟线，跨月份分区
+_DAY1 = int(pd.Timestamp("2026-01-30 14:30", tz="UTC").timestamp())
+_DAY2 = int(pd.Timestamp("2026-02-02 14:30", tz="UTC").timestamp())
+_TS = np.array([_DAY1, _DAY1 + 60, _DAY1 + 120, _DAY2, _DAY2 + 60, _DAY2 + 120])
+
+
+def _bars(symbol, ts, close):
+    close = np.asarray(close, dtype=float)
+    return {
+        "symbol": symbol,
+        "ts": ts,
+        "open": close,
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": np.full(len(ts), 10),
+    }
+
+
+def test_append_only_roundtrip_and_downsample(tmp_path):
+    """测试按月分区追加写入、跳过已存 bar、区间读取、自动合并数据块与聚合到粗周期。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    store = IntradayStore(db, max_blocks=2)
+
+    assert store.append(_bars("AAPL", _TS[:4], [1, 2, 3, 4])) == 4
+    # 与已存数据重叠的部分被跳过，新增的一根写入新数据块
+    assert store.append(_bars("AAPL", _TS[2:5], [9, 9, 5])) == 1
+    assert store.append(_bars("AAPL", _TS[5:], [6])) == 1
+    stats = store.storage_stats()
+    assert stats["rows"] == 6
+    assert stats["blocks"] == 2  # 2 月分区三个数据块已合并为一个
+
+    bars = store.get_bars(["AAPL", "MSFT"], "2026-01-30 14:31", "2026-02-02 14:32")
+    assert bars["close"].tolist() == [2, 3, 4, 5]
+    assert list(bars["symbol"].cat.categories) == ["AAPL", "MSFT"]
+    assert str(bars["timestamp"].dt.tz) == "UTC"
+
+    hourly = store.get_bars(["AAPL"], "2026-01-01", "2026-03-01", bar_size="1 hour")
+    assert hourly["timestamp"].dt.strftime("%m-%d %H:%M").tolist() == ["01-30 14:00", "02-02 14:00"]
+    assert hourly[["open", "high", "low", "close", "volume"]].values.tolist() == [
+        [1, 4, 0, 3, 30],
+        [4, 7, 3, 6, 30],
+    ]
+    assert store.latest_timestamps() == {"AAPL": int(_TS[-1])}
+
+
+def test_append_skips_bar_still_forming(tmp_path):
+    """测试周期尚未结束的 bar 不写入，收完后再次追加时写入，已存的 bar 不会停留在未完成的值。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    store = IntradayStore(db)
+    ts = _TS[:3]
+
+    assert store.append(_bars("AAPL", ts, [1, 2, 3]), now=int(ts[2]) + 30) == 2
+    assert store.latest_timestamps() == {"AAPL": int(ts[1])}
+    assert store.append(_bars("AAPL", ts, [1, 2, 4]), now=int(ts[2]) + 60) == 1
+    assert store.get_bars(["AAPL"], int(ts[0]), int(ts[2]) + 60)["close"].tolist() == [1, 2, 4]
+
+
+def test_get_bars_picks_source_bar_size_per_symbol(tmp_path):
+    """测试不同标的存储周期不同时，各自选择可聚合到目标周期的数据源。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    store = IntradayStore(db)
+    minutes = _DAY1 + 1800 + np.arange(0, 3600, 60)  # 15:00 起一小时
+    store.append(_bars("MSFT", minutes, np.arange(60)), bar_size="1 min")
+    store.append(_bars("AAPL", minutes[::5], np.arange(12)), bar_size="5 mins")
+
+    hourly = store.get_bars(["MSFT", "AAPL"], "2026-01-30", "2026-01-31", bar_size="1 hour")
+    assert hourly["symbol"].tolist() == ["MSFT", "AAPL"]
+    assert hourly["close"].tolist() == [59, 11]
+    assert hourly["volume"].tolist() == [600, 120]
+    five = store.get_bars(["MSFT", "AAPL"], "2026-01-30", "2026-01-31", bar_size="5 mins")
+    assert five["symbol"].value_counts().to_dict() == {"MSFT": 12, "AAPL": 12}
+
+
+def test_intraday_update_job_appends_simulated_bars(tmp_path):
+    """测试分钟线任务从模拟网关抓取并追加写入，重复执行不产生重复数据。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO symbols_config (symbol) VALUES (?)", [("AAPL",), ("MSFT",)])
+    client = IBClient("127.0.0.1", 7497, 1, ib=SimulatedIB(latency=0, jitter=0))
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+    scheduler.settings = Settings(metrics_file="", intraday_bar_size="5 mins")
+
+    # 盘中运行时模拟网关会返回尚未结束的 bar，这些 bar 不写入
+    now = time.time()
+    expected = sum(bar.date.timestamp() + 300 <= now for bar in client.ib.make_intraday_bars("AAPL", "1 D", "5 mins"))
+    assert scheduler.intraday_update() == 2 * expected
+    assert scheduler.intraday_update() == 0
+    latest = scheduler.intraday.latest_timestamps("5 mins")
+    bars = scheduler.intraday.get_bars(["MSFT"], latest["MSFT"] - 3600, latest["MSFT"] + 1, "5 mins")
+    assert len(bars) == 13
@@ -0,0 +1,62 @@
+"""日志管道测试。"""
+
+import json
+import logging
+
+from loguru import logger as loguru_logger
+
+from stock_tracker.utils.logger import RateLimitFilter, setup_logger, stop_logging
+
+
+def test_queue_pipeline_writes_json(tmp_path):
+    """测试标准库与 loguru 日志经队列写入同一文件，并输出 JSON。"""
+    log_file = tmp_path / "app.log"
+    setup_logger("INFO", str(log_file), log_format="json", rate_limit=0)
+    try:
+        logging.getLogger("stock_tracker.test").info("抓取 %s 完成", "AAPL", extra={"rows": 10})
+        loguru_logger.warning("loguru 消息")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("stock_tracker.test").exception("出错")
+    finally:
+        stop_logging()
+
+    records = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert records[0]["message"] == "抓取 AAPL 完成"
+    assert records[0]["rows"] == 10
+    assert records[1]["level"] == "WARNING" and records[1]["message"] == "loguru 消息"
+    assert "ValueError: boom" in records[2]["exc_info"]
+
+
+def test_rate_limit_filter_suppresses_and_reports():
+    """测试同一模板超出速率后被丢弃，窗口结束后注明抑制条数。"""
+    now = [0.0]
+    rate_filter = RateLimitFilter(rate=2, period=60, clock=lambda: now[0])
+
+    def make(symbol: str) -> logging.LogRecord:
+        return logging.LogRecord("fetch", logging.INFO, __file__, 1, "%s 历史数据条数: %s", (symbol, 1), None)
+
+    assert [rate_filter.filter(make(f"S{i}")) for i in range(5)] == [True, True, False, False, False]
+    other = logging.LogRecord("fetch", logging.INFO, __file__, 1, "其他消息", (), None)
+    assert rate_filter.filter(other)
+
+    now[0] = 61.0
+    record = make("S9")
+    assert rate_filter.filter(record)
+    assert record.suppressed == 3
+    assert record.getMessage().startswith("S9 历史数据条数: 1")
+
+
+def test_rate_limit_filter_keeps_errors_by_default():
+    """测试默认只限流 INFO 及以下，逐标的 ERROR 日志不被丢弃；阈值可调到更高级别。"""
+    rate_filter = RateLimitFilter(rate=1, period=60, clock=lambda: 0.0)
+
+    def make(level: int) -> logging.LogRecord:
+        return logging.LogRecord("fetch", level, __file__, 1, "获取 %s 历史数据失败", ("AAPL",), None)
+
+    assert [rate_filter.filter(make(logging.ERROR)) for _ in range(3)] == [True, True, True]
+    assert [rate_filter.filter(make(logging.INFO)) for _ in range(2)] == [True, False]
+
+    strict = RateLimitFilter(rate=1, period=60, max_level=logging.ERROR, clock=lambda: 0.0)
+    assert [strict.filter(make(logging.ERROR)) for _ in range(2)] == [True, False]
@@ -0,0 +1,52 @@
+"""命令行入口测试。"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+HEAVY_MODULES = ("pandas", "numpy", "ib_insync", "xlsxwriter", "openpyxl", "pyarrow")
+# jobs 模式本地约 0.3 秒，单独导入 pandas 约 0.5 秒；预算留足 CI 抖动余量，只拦截数量级的回退
+STARTUP_BUDGET_SECONDS = 2.0
+
+_SCRIPT = """
+import json, sys
+from stock_tracker.main import main
+main(["--mode", "jobs"])
+print("heavy:", json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def test_jobs_mode_skips_heavy_imports(tmp_path):
+    """测试 jobs 模式只计算调度计划，不加载 pandas、ib_insync 与导出依赖。"""
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(heavy=HEAVY_MODULES)],
+        cwd=tmp_path,
+        env={"PYTHONPATH": str(ROOT), "PATH": "", "IB_SIMULATED": "false"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    loaded = next(line for line in result.stdout.splitlines() if line.startswith("heavy:"))
+    assert json.loads(loaded.removeprefix("heavy:")) == []
+    assert "monthly_export" in result.stdout
+
+
+def test_jobs_mode_startup_within_budget(tmp_path):
+    """测试 jobs 模式从启动解释器到打印计划的墙钟时间在预算内（取三次中的最快一次）。"""
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "from stock_tracker.main import main; main(['--mode', 'jobs'])"],
+            cwd=tmp_path,
+            env={"PYTHONPATH": str(ROOT), "PATH": "", "IB_SIMULATED": "false"},
+            capture_output=True,
+            timeout=60,
+            check=True,
+        )
+        timings.append(time.perf_counter() - started)
+    assert min(timings) < STARTUP_BUDGET_SECONDS
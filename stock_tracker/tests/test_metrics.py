@@ -0,0 +1,66 @@
+"""派生指标模块测试。"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_tracker.analytics.metrics import MetricsEngine
+from stock_tracker.database.db_manager import DatabaseManager
+
+
+def _bars(symbol, closes, start="2026-01-01"):
+    dates = pd.bdate_range(start, periods=len(closes)).strftime("%Y-%m-%d")
+    return pd.DataFrame(
+        {
+            "symbol": symbol,
+            "trade_date": dates,
+            "open": closes,
+            "high": closes,
+            "low": closes,
+            "close": closes,
+            "volume": 1,
+            "adjusted_close": closes,
+        }
+    )
+
+
+@pytest.fixture()
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.init_database()
+    yield db
+    db.close()
+
+
+def test_incremental_update_matches_full_rebuild(db):
+    """测试分批写入后增量维护的指标与全量重算一致。"""
+    closes = 100 + np.cumsum(np.random.default_rng(0).normal(size=150))
+    engine = MetricsEngine(db).attach()
+    db.save_prices(_bars("AAPL", closes[:100]))
+    db.save_prices(_bars("AAPL", closes)[100:])
+    incremental = engine.get_metrics(["AAPL"])
+
+    engine.rebuild()
+    full = engine.get_metrics(["AAPL"])
+
+    assert len(incremental) == 150
+    pd.testing.assert_frame_equal(incremental, full)
+    series = pd.Series(closes)
+    assert incremental["ma_20"].iloc[-1] == pytest.approx(series.tail(20).mean())
+    assert incremental["peak_close"].iloc[-1] == pytest.approx(series.max())
+    assert incremental["drawdown"].iloc[-1] == pytest.approx(series.iloc[-1] / series.max() - 1)
+
+
+def test_get_metrics_filters_symbols_dates_and_columns(db):
+    """测试 get_metrics 按标的、起始日期与列筛选，未知列抛出 ValueError。"""
+    engine = MetricsEngine(db).attach()
+    db.save_prices(_bars("AAPL", [10.0, 11.0, 12.1]))
+    db.save_prices(_bars("MSFT", [20.0, 20.0, 10.0]))
+
+    result = engine.get_metrics(["MSFT"], start="2026-01-02", columns=["daily_return", "drawdown"])
+
+    assert list(result.columns) == ["symbol", "trade_date", "daily_return", "drawdown"]
+    assert result["trade_date"].tolist() == ["2026-01-02", "2026-01-05"]
+    assert result["drawdown"].tolist() == pytest.approx([0.0, -0.5])
+    with pytest.raises(ValueError):
+        engine.get_metrics(["MSFT"], columns=["beta"])
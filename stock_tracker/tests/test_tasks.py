@@ -1,9 +1,18 @@
 """任务调度模块测试。"""
 
+import asyncio
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from stock_tracker.config.settings import Settings
 from stock_tracker.database.db_manager import DatabaseManager
 from stock_tracker.ib_connector.data_fetcher import IBDataFetcher
 from stock_tracker.ib_connector.ib_client import IBClient
-from stock_tracker.scheduler.tasks import StockTrackerScheduler
+from stock_tracker.ib_connector.simulator import SimulatedIB
+from stock_tracker.scheduler.tasks import EXPORT_QUERIES, StockTrackerScheduler
+from stock_tracker.utils.helpers import duration_since
 
 
 def test_setup_tasks(tmp_path):
@@ -14,4 +23,235 @@ def test_setup_tasks(tmp_path):
     scheduler = StockTrackerScheduler(db, client, fetcher)
     scheduler.setup_tasks()
     jobs = scheduler.list_jobs()
-    assert len(jobs) == 4
+    assert len(jobs) == 5
+
+
+def test_plan_price_durations_incremental(tmp_path):
+    """测试已有数据的标的只请求缺失区间，新标的全量回填。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    last = (date.today() - timedelta(days=7)).strftime("%Y-%m-%d")
+    db.save_prices(
+        [
+            {
+                "symbol": "AAPL",
+                "trade_date": last,
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": 1.0,
+                "volume": 1,
+                "adjusted_close": 1.0,
+            }
+        ]
+    )
+    client = IBClient("127.0.0.1", 7497, 1)
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+
+    plan = scheduler.plan_price_durations(["AAPL", "MSFT"])
+    assert plan["AAPL"] == f"{7 + scheduler.settings.price_update_overlap_days} D"
+    assert plan["MSFT"] == scheduler.settings.price_backfill_duration
+
+    full = scheduler.plan_price_durations(["AAPL"], full_refresh=True)
+    assert full["AAPL"] == scheduler.settings.price_backfill_duration
+
+
+def test_duration_since_switches_to_years():
+    """测试超过一年的缺口使用年为单位。"""
+    assert duration_since("2020-01-01", 0, today=date(2020, 1, 11)) == "10 D"
+    assert duration_since("2020-01-01", 0, today=date(2021, 12, 1)) == "2 Y"
+
+
+def test_monthly_export_streams_and_reports(tmp_path):
+    """测试月度导出流式写出 CSV 并汇总行数与字节数。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.save_prices(
+        [
+            {
+                "symbol": "AAPL",
+                "trade_date": f"2026-01-{day:02d}",
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": 1.0,
+                "volume": 1,
+                "adjusted_close": 1.0,
+            }
+            for day in range(1, 6)
+        ]
+    )
+    client = IBClient("127.0.0.1", 7497, 1)
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+    scheduler.settings = Settings(
+        export_dir=str(tmp_path / "exports"),
+        export_chunk_size=2,
+        metrics_file=str(tmp_path / "metrics.prom"),
+    )
+
+    summary = scheduler.monthly_export()
+
+    prices = next(stats for name, stats in summary.items() if name.startswith("prices_"))
+    assert prices["rows"] == 5
+    assert prices["bytes"] > 0
+    assert len(list((tmp_path / "exports").glob("*.xlsx"))) == 1
+
+
+def test_monthly_export_rebuilds_positions_in_delta_mode(tmp_path):
+    """测试增量持仓模式下 Excel 持仓表导出由关键帧与变更重建的最新持仓。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+
+    def pos(symbol, quantity):
+        return {"account_id": "DU1", "symbol": symbol, "quantity": quantity, "avg_cost": 10.0}
+
+    db.save_position_snapshot([pos("AAPL", 1), pos("MSFT", 2)], "2026-03-02")
+    db.save_position_snapshot([pos("AAPL", 3)], "2026-03-03")
+    client = IBClient("127.0.0.1", 7497, 1)
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+    scheduler.settings = Settings(
+        export_dir=str(tmp_path / "exports"),
+        export_formats="excel",
+        position_storage="delta",
+        metrics_file="",
+    )
+
+    summary = scheduler.monthly_export()
+
+    report = next((tmp_path / "exports").glob("*.xlsx"))
+    sheet = pd.read_excel(report, sheet_name="持仓")
+    assert summary[report.name]["rows"] == 1
+    assert sheet[["symbol", "quantity", "snapshot_date"]].values.tolist() == [["AAPL", 3, "2026-03-03"]]
+
+
+def test_snapshot_job_records_stage_metrics(tmp_path):
+    """测试任务执行后阶段指标写入 job_metrics 并导出 Prometheus 文件。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    client = IBClient("127.0.0.1", 7497, 1, ib=SimulatedIB(positions_per_account=5, latency=0, jitter=0))
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+    scheduler.settings = Settings(metrics_file=str(tmp_path / "metrics.prom"))
+
+    scheduler.daily_positions_snapshot()
+
+    metrics = db.query_dataframe(
+        "SELECT stage, metric, value FROM job_metrics WHERE job = 'daily_positions_snapshot'"
+    )
+    values = {(row.stage, row.metric): row.value for row in metrics.itertuples()}
+    assert values[("fetch", "rows")] == 10
+    assert values[("write", "rows")] == 10
+    assert values[("total", "duration_seconds")] > 0
+    text = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert 'stock_tracker_stage_rows{job="daily_positions_snapshot",stage="write"} 10' in text
+    assert 'stock_tracker_db_rows_written_total{table="positions"}' in text
+
+
+@pytest.mark.asyncio
+async def test_asyncio_mode_reuses_session_across_concurrent_jobs(tmp_path):
+    """测试 asyncio 模式下并发任务复用同一个 IB 连接，断线后心跳自动重连。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO symbols_config (symbol) VALUES (?)", [("AAPL",), ("MSFT",)])
+    ib = SimulatedIB(positions_per_account=3, latency=0.01, jitter=0)
+    client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client), mode="asyncio")
+    scheduler.settings = Settings(metrics_file="")
+    scheduler.session.heartbeat_interval = 0.05
+    scheduler.setup_tasks()
+    assert len(scheduler.list_jobs()) == 5
+
+    stop = asyncio.Event()
+    serving = asyncio.create_task(scheduler.serve(stop))
+    await asyncio.sleep(0.05)
+    jobs = scheduler._job_functions()
+    await asyncio.gather(jobs["daily_positions_snapshot"](), jobs["weekly_prices_update"]())
+    assert ib.stats["connects"] == 1
+    assert len(db.get_positions_dataframe()) == 6
+    assert set(db.get_latest_trade_dates()) == {"AAPL", "MSFT"}
+
+    ib.disconnect()
+    await asyncio.sleep(0.2)
+    assert ib.isConnected()
+    assert scheduler.session.reconnects == 1
+
+    stop.set()
+    await serving
+    assert not ib.isConnected()
+
+
+def test_price_backfill_chunks_and_resumes(tmp_path):
+    """测试回填按分段抓取并记录断点，重跑时只请求未完成的区间。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    ib = SimulatedIB(latency=0, jitter=0, pacing_limit=None)
+    client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+    scheduler.settings = Settings(metrics_file="", price_backfill_duration="3 Y", backfill_chunk_duration="1 Y")
+
+    # 模拟上次中断：MSFT 已完成最近一年
+    today = date.today()
+    target_start = (today - timedelta(days=3 * 365 - 1)).isoformat()
+    resumed_end = (today - timedelta(days=365)).isoformat()
+    first = ib.make_bars("MSFT", "365 D", today)
+    with db.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO backfill_progress (symbol, target_start, next_end, status, chunks, rows) "
+            "VALUES ('MSFT', ?, ?, 'running', 1, ?)",
+            (target_start, resumed_end, len(first)),
+        )
+
+    loaded = scheduler.price_backfill(["AAPL", "MSFT"])
+
+    assert ib.stats["requests"] == 3 + 2
+    progress = db.get_backfill_progress()
+    assert {state["status"] for state in progress.values()} == {"done"}
+    assert progress["AAPL"]["chunks"] == 3
+    assert loaded["AAPL"] == progress["AAPL"]["rows"] == db.query_dataframe(
+        "SELECT COUNT(*) AS n FROM prices WHERE symbol = 'AAPL'"
+    )["n"][0]
+    assert loaded["MSFT"] == progress["MSFT"]["rows"] - len(first)
+
+    assert scheduler.price_backfill(["AAPL", "MSFT"]) == {}
+    assert ib.stats["requests"] == 5
+
+
+def test_price_backfill_stops_at_listing_date(tmp_path):
+    """测试早于上市日期的分段返回 162 无数据错误时，标的按完成处理而不是停在断点。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    today = date.today()
+    ib = SimulatedIB(latency=0, jitter=0, pacing_limit=None, listing_dates={"NEWCO": today - timedelta(days=500)})
+    client = IBClient("127.0.0.1", 7497, 1, ib=ib)
+    scheduler = StockTrackerScheduler(db, client, IBDataFetcher(client))
+    scheduler.settings = Settings(metrics_file="", price_backfill_duration="5 Y", backfill_chunk_duration="1 Y")
+
+    loaded = scheduler.price_backfill(["NEWCO"])
+
+    progress = db.get_backfill_progress()["NEWCO"]
+    assert progress["status"] == "done"
+    assert progress["chunks"] == 3
+    assert ib.stats["requests"] == 3
+    assert loaded["NEWCO"] == progress["rows"] > 0
+    assert scheduler.price_backfill(["NEWCO"]) == {}
+
+
+def test_price_export_query_follows_primary_key(tmp_path):
+    """测试价格导出查询按主键顺序读取，无需临时 B 树排序，结果与 prices 视图一致。"""
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    rows = [
+        {
+            "symbol": symbol,
+            "trade_date": day,
+            "open": 1.0,
+            "high": 1.0,
+            "low": 1.0,
+            "close": 1.0,
+            "volume": 1,
+            "adjusted_close": 1.0,
+        }
+        for symbol in ("MSFT", "AAPL")
+        for day in ("2026-01-03", "2026-01-02")
+    ]
+    db.save_prices(rows)
+
+    with db.get_read_connection() as conn:
+        plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {EXPORT_QUERIES['prices']}"))
+    assert "TEMP B-TREE" not in plan
+    pd.testing.assert_frame_equal(
+        db.query_dataframe(EXPORT_QUERIES["prices"]),
+        db.query_dataframe("SELECT * FROM prices ORDER BY symbol, trade_date"),
+    )
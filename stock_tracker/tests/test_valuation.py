@@ -0,0 +1,94 @@
+"""持仓估值模块测试。"""
+
+import pandas as pd
+import pytest
+
+from stock_tracker.analytics.valuation import PortfolioValuator
+from stock_tracker.database.db_manager import DatabaseManager
+
+
+def _bar(symbol, trade_date, close):
+    return {
+        "symbol": symbol,
+        "trade_date": trade_date,
+        "open": close,
+        "high": close,
+        "low": close,
+        "close": close,
+        "volume": 1,
+        "adjusted_close": close,
+    }
+
+
+def _position(account, symbol, snapshot_date, quantity=10.0, avg_cost=100.0):
+    return {
+        "account_id": account,
+        "symbol": symbol,
+        "quantity": quantity,
+        "avg_cost": avg_cost,
+        "market_value": None,
+        "unrealized_pnl": None,
+        "snapshot_date": snapshot_date,
+    }
+
+
+@pytest.fixture()
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.save_prices(
+        [
+            _bar("AAPL", "2026-01-02", 110.0),
+            _bar("AAPL", "2026-01-05", 120.0),
+            _bar("MSFT", "2026-01-02", 90.0),
+        ]
+    )
+    db.save_positions(
+        [
+            _position("DU1", "AAPL", "2026-01-03"),
+            _position("DU2", "AAPL", "2026-01-05", quantity=-5.0),
+            _position("DU1", "MSFT", "2026-01-05"),
+            _position("DU1", "NOPX", "2026-01-05"),
+        ]
+    )
+    return db
+
+
+def test_revalue_uses_asof_close(db: DatabaseManager):
+    """测试每条持仓使用快照日当天或之前最近的收盘价。"""
+    assert PortfolioValuator(db).revalue() == 4
+
+    df = db.get_positions_dataframe().set_index(["account_id", "symbol", "snapshot_date"])
+    by_key = {(a, s, str(d)): row for (a, s, d), row in df.iterrows()}
+    assert by_key[("DU1", "AAPL", "2026-01-03")]["market_value"] == 1100.0
+    assert by_key[("DU1", "AAPL", "2026-01-03")]["unrealized_pnl"] == 100.0
+    assert by_key[("DU2", "AAPL", "2026-01-05")]["market_value"] == -600.0
+    assert by_key[("DU1", "MSFT", "2026-01-05")]["unrealized_pnl"] == -100.0
+    assert pd.isna(by_key[("DU1", "NOPX", "2026-01-05")]["market_value"])
+
+
+def test_value_snapshot_prefers_live_quotes(db: DatabaseManager):
+    """测试单日估值时实时报价优先，且只更新该日快照。"""
+    assert PortfolioValuator(db).value_snapshot("2026-01-05", quotes={"AAPL": 130.0, "MSFT": None}) == 3
+
+    df = db.get_positions_dataframe("2026-01-05").set_index(["account_id", "symbol"])
+    assert df.loc[("DU2", "AAPL"), "market_value"] == -650.0
+    assert df.loc[("DU1", "MSFT"), "market_value"] == 900.0
+    assert db.get_positions_dataframe("2026-01-03")["market_value"].isna().all()
+
+
+def test_value_positions_for_reconstructed_snapshot(db: DatabaseManager):
+    """测试增量持仓重建结果在读取时估值。"""
+    db.save_position_snapshot(
+        [
+            {"account_id": "DU1", "symbol": "AAPL", "quantity": 2.0, "avg_cost": 100.0},
+            {"account_id": "DU1", "symbol": "NOPX", "quantity": 1.0, "avg_cost": 1.0},
+        ],
+        "2026-01-04",
+    )
+    frame = db.get_position_snapshot("2026-01-06")
+    valued = PortfolioValuator(db).value_positions(frame, "2026-01-06").set_index("symbol")
+
+    assert valued.loc["AAPL", "market_value"] == 240.0
+    assert valued.loc["AAPL", "unrealized_pnl"] == 40.0
+    assert pd.isna(valued.loc["NOPX", "market_value"])
+    assert "market_value" not in frame
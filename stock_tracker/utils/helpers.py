@@ -1,5 +1,6 @@
 """通用辅助函数。"""
 
+import math
 from datetime import date, datetime
 from typing import Any
 
@@ -16,3 +17,37 @@ def to_date_str(value: Any) -> str:
 def chunked(seq: list[Any], size: int) -> list[list[Any]]:
     """将列表按给定大小分块。"""
     return [seq[i : i + size] for i in range(0, len(seq), size)]
+
+
+_DURATION_UNIT_DAYS = {"D": 1, "W": 7, "M": 30, "Y": 365}
+
+
+def duration_to_days(duration: str) -> int:
+    """将 IB durationStr（如 "10 Y"、"30 D"）换算为自然日天数。"""
+    value, unit = duration.split()
+    return int(value) * _DURATION_UNIT_DAYS[unit.upper()]
+
+
+def days_to_duration(days: int) -> str:
+    """将天数换算为 IB durationStr：一年以内用天，超过一年按年向上取整。"""
+    if days <= 365:
+        return f"{max(days, 1)} D"
+    return f"{math.ceil(days / 365)} Y"
+
+
+def duration_since(last_date: str, overlap_days: int = 5, today: date | None = None) -> str:
+    """根据最近交易日计算需补齐的 IB durationStr，附带少量重叠天数以覆盖修订。"""
+    today = today or date.today()
+    last = datetime.strptime(last_date[:10], "%Y-%m-%d").date()
+    return days_to_duration(max((today - last).days, 0) + overlap_days)
+
+
+def date_to_int(value: Any) -> int:
+    """将日期转换为 YYYYMMDD 整数（prices 存储格式）。"""
+    return int(to_date_str(value)[:10].replace("-", ""))
+
+
+def int_to_date_str(value: int) -> str:
+    """将 YYYYMMDD 整数还原为 YYYY-MM-DD 字符串。"""
+    value = int(value)
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
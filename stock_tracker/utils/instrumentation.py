@@ -0,0 +1,246 @@
+"""任务级性能埋点：阶段耗时、计数器与延迟直方图，落库到 job_metrics 并导出 Prometheus 文本。"""
+
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from heapq import heappush, heappushpop
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+if TYPE_CHECKING:
+    from stock_tracker.database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_PREFIX = "stock_tracker_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+# 当前线程 / 协程所属的任务名，asyncio 任务会继承
+_current_job: ContextVar[str | None] = ContextVar("stock_tracker_job", default=None)
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: LabelKey = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    escaped = (name + '="' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for name, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+class _RunState:
+    """单次任务执行期间累计的指标，flush 时写入 job_metrics。"""
+
+    def __init__(self, job: str, slow_top: int) -> None:
+        self.job = job
+        self.run_id = f"{job}-{datetime.now():%Y%m%dT%H%M%S%f}"
+        self.slow_top = slow_top
+        self.stages: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.counters: dict[tuple[str, LabelKey], float] = defaultdict(float)
+        self.histograms: dict[tuple[str, LabelKey], list[float]] = {}
+        self.slowest: list[tuple[float, str, str]] = []
+
+
+class MetricsRecorder:
+    """线程安全的指标记录器。
+
+    计数器与直方图在进程生命周期内累计，用于 Prometheus 导出；在 job() 上下文内记录的
+    数据另外按任务单次执行累计，flush 时写入 SQLite。
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, slow_top: int = 20) -> None:
+        self.buckets = buckets
+        self.slow_top = slow_top
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, LabelKey], float] = defaultdict(float)
+        self._histograms: dict[tuple[str, LabelKey], list[float]] = {}
+        self._stage_gauges: dict[tuple[str, str, str], float] = {}
+        self._runs: dict[str, _RunState] = {}
+
+    def _run(self) -> _RunState | None:
+        job = _current_job.get()
+        return self._runs.get(job) if job else None
+
+    @contextmanager
+    def job(self, name: str, profile: bool = False, profile_dir: str = "logs/profiles") -> Iterator[str]:
+        """标记一次任务执行，产出 run_id；profile=True 时同时采集 cProfile 与 tracemalloc。"""
+        with self._lock:
+            run = self._runs[name] = _RunState(name, self.slow_top)
+        token = _current_job.set(name)
+        profiler = cProfile.Profile() if profile else None
+        if profiler is not None:
+            tracemalloc.start()
+            profiler.enable()
+        try:
+            with self.stage("total"):
+                yield run.run_id
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                path = Path(profile_dir) / f"{run.run_id}.prof"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(str(path))
+                with self._lock:
+                    run.stages["total"]["peak_alloc_bytes"] = peak
+                logger.info("任务 %s 性能剖析已保存: %s，Python 分配峰值 %.1f MB", name, path, peak / 1024 / 1024)
+            _current_job.reset(token)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict[str, float]]:
+        """记录当前任务某一阶段的耗时；调用方可在产出的字典中填写 rows / bytes。"""
+        info: dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info["duration_seconds"] = time.perf_counter() - started
+            job = _current_job.get() or "adhoc"
+            with self._lock:
+                run = self._runs.get(job)
+                for field, value in info.items():
+                    self._stage_gauges[(job, name, field)] = value
+                    if run is not None:
+                        run.stages[name][field] += value
+                if run is not None:
+                    run.stages[name]["calls"] += 1
+
+    def incr(self, name: str, value: float = 1, **labels: Any) -> None:
+        """计数器累加。"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] += value
+            run = self._run()
+            if run is not None:
+                run.counters[key] += value
+
+    def observe(self, name: str, seconds: float, item: str | None = None, **labels: Any) -> None:
+        """记录一次耗时到直方图；item（如标的代码）用于统计本次任务中最慢的请求。"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0.0] * (len(self.buckets) + 3)
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+            run = self._run()
+            if run is None:
+                return
+            stats = run.histograms.setdefault(key, [0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if item is not None:
+                entry = (seconds, name, item)
+                if len(run.slowest) < run.slow_top:
+                    heappush(run.slowest, entry)
+                else:
+                    heappushpop(run.slowest, entry)
+
+    def run_rows(self, job: str) -> list[tuple[str, str, str, str, float, str]]:
+        """把某任务本次执行的指标展开为 job_metrics 行：(run_id, job, stage, metric, value, labels)。"""
+        with self._lock:
+            run = self._runs.get(job)
+            if run is None:
+                return []
+            rows = [
+                (run.run_id, job, stage, field, value, "{}")
+                for stage, fields in run.stages.items()
+                for field, value in fields.items()
+            ]
+            rows += [
+                (run.run_id, job, "", name, value, json.dumps(dict(labels), ensure_ascii=False))
+                for (name, labels), value in run.counters.items()
+            ]
+            for (name, labels), (count, total, peak) in run.histograms.items():
+                encoded = json.dumps(dict(labels), ensure_ascii=False)
+                rows += [
+                    (run.run_id, job, "", f"{name}_count", count, encoded),
+                    (run.run_id, job, "", f"{name}_sum", total, encoded),
+                    (run.run_id, job, "", f"{name}_max", peak, encoded),
+                ]
+            rows += [
+                (run.run_id, job, "slowest", name, seconds, json.dumps({"item": item}, ensure_ascii=False))
+                for seconds, name, item in sorted(run.slowest, reverse=True)
+            ]
+        return rows
+
+    def render_prometheus(self) -> str:
+        """按 Prometheus 文本格式输出累计指标。"""
+        lines: list[str] = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                metric = f"{PROMETHEUS_PREFIX}{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                metric = f"{PROMETHEUS_PREFIX}{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram, labels), values in sorted(self._histograms.items()):
+                    if histogram != name:
+                        continue
+                    cumulative = 0.0
+                    for bound, count in zip((*self.buckets, "+Inf"), values[:-2]):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(labels, (('le', str(bound)),))} {cumulative:g}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {values[-2]:g}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {values[-1]:g}")
+
+            fields = sorted({field for _, _, field in self._stage_gauges})
+            for field in fields:
+                metric = f"{PROMETHEUS_PREFIX}stage_{field}"
+                lines.append(f"# TYPE {metric} gauge")
+                for (job, stage, name), value in sorted(self._stage_gauges.items()):
+                    if name == field:
+                        lines.append(f"{metric}{_format_labels((('job', job), ('stage', stage)))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self, job: str, db_manager: "DatabaseManager | None" = None, prom_path: str | None = None) -> int:
+        """把任务本次执行的指标写入 job_metrics，并刷新 Prometheus 文件。返回写入行数。"""
+        rows = self.run_rows(job)
+        if db_manager is not None and rows:
+            db_manager.save_job_metrics(rows)
+        if prom_path:
+            path = Path(prom_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._runs.pop(job, None)
+        return len(rows)
+
+    def reset(self) -> None:
+        """清空全部指标。"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._stage_gauges.clear()
+            self._runs.clear()
+
+
+@lru_cache(maxsize=1)
+def get_recorder() -> MetricsRecorder:
+    """获取进程级单例记录器。"""
+    return MetricsRecorder()
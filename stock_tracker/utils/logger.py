@@ -1,37 +1,190 @@
-"""日志工具模块，统一 logging 与 loguru 配置。"""
+"""日志工具模块，统一 logging 与 loguru 配置。
 
+所有日志（包括 loguru）先进入内存队列，由后台 QueueListener 线程负责格式化、轮转与文件写入，
+调用方不会阻塞在磁盘 I/O 上。
+"""
+
+import atexit
+import copy
+import json
 import logging
+import queue
 import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Callable
 
 from loguru import logger as loguru_logger
 
+LOG_FORMATS = ("text", "json")
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
 
-def setup_logger(log_level: str = "INFO", log_file: str = "logs/stock_tracker.log") -> logging.Logger:
-    """初始化日志系统。"""
-    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+# LogRecord 的内置属性，其余属性视为 extra 字段输出到 JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_queue_handler: QueueHandler | None = None
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON，附带 extra 字段与异常堆栈。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """按 (logger, 级别, 消息模板) 限流：每 period 秒最多放行 rate 条。
+
+    逐标的打印的日志共用同一模板，超出部分直接丢弃，窗口结束后的第一条附带被抑制的条数。
+    只限流 max_level（默认 INFO）及以下级别，WARNING 与 ERROR 等告警日志全部保留。
+    """
+
+    def __init__(
+        self,
+        rate: int = 20,
+        period: float = 60.0,
+        max_level: int = logging.INFO,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.max_level = max_level
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._windows: dict[tuple[str, int, str], list[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = self._clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = int(window[2]) if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                    record.msg = f"{record.msg}（前 {self.period:g}s 内抑制 {suppressed} 条同类日志）"
+                return True
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """入队前只做消息插值与异常文本渲染，格式化留给后台线程。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper(), logging.INFO),
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler(log_file, encoding="utf-8"),
-        ],
+
+def _forward_loguru(message: Any) -> None:
+    """loguru sink：把记录转交给同名标准库 logger，进入同一队列。"""
+    record = message.record
+    target = logging.getLogger(record["name"] or "loguru")
+    level = record["level"].no
+    if not target.isEnabledFor(level):
+        return
+    exception = record["exception"]
+    target.handle(
+        target.makeRecord(
+            target.name,
+            level,
+            record["file"].path,
+            record["line"],
+            record["message"],
+            (),
+            (exception.type, exception.value, exception.traceback) if exception else None,
+            func=record["function"],
+            extra={key: value for key, value in record["extra"].items() if key not in _RECORD_ATTRS} or None,
+        )
     )
 
+
+def stop_logging() -> None:
+    """停止后台写日志线程（会先写完队列中的日志）并移除队列处理器。"""
+    global _queue_handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def setup_logger(
+    log_level: str = "INFO",
+    log_file: str = "logs/stock_tracker.log",
+    log_format: str = "text",
+    rate_limit: int = 20,
+    rate_period: float = 60.0,
+    rate_limit_level: str = "INFO",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 30,
+) -> logging.Logger:
+    """初始化日志系统，重复调用会替换上一次的配置。
+
+    log_format 为 text 或 json；rate_limit 为每个消息模板每 rate_period 秒最多输出的条数，0 表示不限流；
+    rate_limit_level 为受限流的最高级别，更高级别的日志不限流。
+    """
+    global _queue_handler, _listener
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"不支持的日志格式: {log_format}")
+    stop_logging()
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    level = getattr(logging, log_level.upper(), logging.INFO)
+
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers: list[logging.Handler] = [
+        logging.StreamHandler(sys.stdout),
+        RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _queue_handler = _NonBlockingQueueHandler(log_queue)
+    if rate_limit > 0:
+        max_level = getattr(logging, rate_limit_level.upper(), logging.INFO)
+        _queue_handler.addFilter(RateLimitFilter(rate_limit, rate_period, max_level))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+
     loguru_logger.remove()
-    loguru_logger.add(
-        sys.stdout,
-        level=log_level.upper(),
-        format="{time:YYYY-MM-DD HH:mm:ss} - {level} - {message}",
-    )
-    loguru_logger.add(
-        log_file,
-        rotation="10 MB",
-        retention="30 days",
-        level=log_level.upper(),
-        encoding="utf-8",
-    )
+    loguru_logger.add(_forward_loguru, level=log_level.upper(), format="{message}")
 
     return logging.getLogger("stock_tracker")
+
+
+atexit.register(stop_logging)